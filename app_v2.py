@@ -11,16 +11,22 @@ Features:
 - API key authentication
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from functools import wraps
+import json
 import os
+import threading
+import time
 
 # Import I-O model infrastructure
 from io_model_factory import IOModelFactory, create_io_model
 from risk_calculator_v2 import MultiTierRiskCalculator
 from climate_api_client import ClimateRiskAPIClient
 from country_code_mapper import normalize_country_code, is_valid_for_model, country_name_to_code, sector_name_to_code
+from cache_manager import (
+    get_assessment_flights, get_assessment_from_cache, get_cache_key, save_assessment_to_cache
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -45,6 +51,111 @@ def get_risk_calculator(model_type: str = 'oecd') -> MultiTierRiskCalculator:
         _model_cache[model_type] = MultiTierRiskCalculator(io_model)
     return _model_cache[model_type]
 
+# Items evaluated together per chunk when /api/batch streams NDJSON
+BATCH_STREAM_CHUNK_SIZE = 100
+
+# Smallest number of uncached batch items worth sharding over worker processes
+PARALLEL_BATCH_MIN_ITEMS = 1000
+
+# Assessments truncated by a time budget that are being finished in the background
+_background_completions = set()
+_background_lock = threading.Lock()
+
+def _assessment_cache_variant(skip_climate: bool, include_split: bool = False) -> str:
+    """Cache variant for assessments computed with different output options"""
+    flags = []
+    if skip_climate:
+        flags.append('no_climate')
+    if include_split:
+        flags.append('split')
+    return '+'.join(flags)
+
+def json_flag(data: dict, name: str) -> bool:
+    """Boolean option of a JSON body: true for true or "true" only (bool("false") would be true)"""
+    return str(data.get(name, False)).lower() == 'true'
+
+def complete_assessment_in_background(
+    model_type: str,
+    country_code: str,
+    sector_code: str,
+    skip_climate: bool,
+    include_split: bool = False
+):
+    """
+    Finish a budget-truncated assessment in a background thread and cache it,
+    so the next request for the same node gets the complete result.
+    """
+    key = (model_type, country_code, sector_code, skip_climate, include_split)
+    with _background_lock:
+        if key in _background_completions:
+            return
+        _background_completions.add(key)
+    
+    def run():
+        try:
+            calculator = get_risk_calculator(model_type)
+            version = calculator.cache_version()
+            result = calculator.assess_risk(
+                country_code, sector_code, skip_climate=skip_climate, include_split=include_split
+            )
+            if result and 'error' not in result:
+                result['cache_hit'] = False
+                save_assessment_to_cache(
+                    country_code, sector_code, model_type, result,
+                    _assessment_cache_variant(skip_climate, include_split), version
+                )
+        except Exception as e:
+            print(f"Background completion failed for {country_code}_{sector_code}: {e}")
+        finally:
+            with _background_lock:
+                _background_completions.discard(key)
+    
+    threading.Thread(target=run, daemon=True).start()
+
+def resolve_country_sector(country_input: str, sector_input: str):
+    """Convert country/sector names to codes (inputs that are not names are treated as codes)"""
+    # Convert country name to code if needed
+    try:
+        # Try to convert name to code (e.g., "United States" -> "USA")
+        country_code = country_name_to_code(country_input)
+    except ValueError:
+        # If not a name, assume it's already a code
+        country_code = country_input.upper()
+    
+    # Convert sector name to code if needed
+    try:
+        # Try to convert name to code (e.g., "Food products, beverages and tobacco" -> "C10T12")
+        sector_code = sector_name_to_code(sector_input)
+    except ValueError:
+        # If not a name, assume it's already a code
+        sector_code = sector_input.upper()
+    
+    return country_code, sector_code
+
+def resolve_batch_items(items):
+    """
+    Resolve the country/sector names or codes of batch items to code pairs.
+    
+    Each distinct input string is resolved once. Items without a country or
+    sector resolve to None.
+    """
+    countries = {}
+    sectors = {}
+    targets = []
+    for item in items:
+        country_input = str(item.get('country') or '') if isinstance(item, dict) else ''
+        sector_input = str(item.get('sector') or '') if isinstance(item, dict) else ''
+        if not country_input or not sector_input:
+            targets.append(None)
+            continue
+        
+        if country_input not in countries or sector_input not in sectors:
+            country_code, sector_code = resolve_country_sector(country_input, sector_input)
+            countries.setdefault(country_input, country_code)
+            sectors.setdefault(sector_input, sector_code)
+        targets.append((countries[country_input], sectors[sector_input]))
+    return targets
+
 def require_api_key(f):
     """Decorator to require API key authentication"""
     @wraps(f)
@@ -69,6 +180,62 @@ def require_api_key(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def parse_score_overrides(overrides):
+    """
+    Validate scenario risk score overrides.
+    
+    Accepts {'countries': {country: {risk_type: score}}, 'sectors': {sector: {...}}}
+    (or the same as a JSON string) with names or codes as keys. Firm splits
+    resolve to their parent country, whose scores they share.
+    
+    Returns:
+        Tuple of (normalised overrides or None, error message or None)
+    """
+    from country_codes import get_country_code
+    from risk_calculator_v2 import RISK_TYPES
+    
+    if overrides is None or overrides == '':
+        return None, None
+    if isinstance(overrides, str):
+        try:
+            overrides = json.loads(overrides)
+        except ValueError:
+            return None, 'overrides must be valid JSON'
+    if not isinstance(overrides, dict) or not set(overrides) <= {'countries', 'sectors'}:
+        return None, "overrides must be an object with 'countries' and/or 'sectors'"
+    
+    normalised = {'countries': {}, 'sectors': {}}
+    for kind, entries in overrides.items():
+        if not isinstance(entries, dict):
+            return None, f"overrides.{kind} must map codes to {{risk_type: score}}"
+        for key, scores in entries.items():
+            if kind == 'countries':
+                try:
+                    code = country_name_to_code(key)
+                except ValueError:
+                    code = str(key).upper()
+                try:
+                    code = get_country_code(code)
+                except KeyError:
+                    pass
+            else:
+                try:
+                    code = sector_name_to_code(key)
+                except ValueError:
+                    code = str(key).upper()
+            if not isinstance(scores, dict) or not scores:
+                return None, f"overrides.{kind}.{key} must map risk types to scores"
+            for risk_type, score in scores.items():
+                if risk_type not in RISK_TYPES:
+                    return None, f"Unknown risk type '{risk_type}' in overrides (available: {', '.join(RISK_TYPES)})"
+                if isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 5:
+                    return None, f"Override score for {key}.{risk_type} must be a number from 1 to 5"
+            normalised[kind].setdefault(code, {}).update({r: float(v) for r, v in scores.items()})
+    
+    if not normalised['countries'] and not normalised['sectors']:
+        return None, None
+    return normalised, None
+
 @app.route('/')
 def home():
     """API home endpoint with documentation"""
@@ -87,10 +254,24 @@ def home():
             'health': '/api/health',
             'models': '/api/models',
             'countries': '/api/countries?model={oecd|exiobase}',
+            'country_profile': '/api/countries/{CODE}/profile?include_names={true|false}',
             'sectors': '/api/sectors?model={oecd|exiobase}',
-            'assess': '/api/assess?country={CODE}&sector={CODE}&model={oecd|exiobase}',
+            'assess': '/api/assess?country={CODE}&sector={CODE}&model={oecd|exiobase}&budget_ms={optional}',
             'batch': '/api/batch (POST)',
-            'compare': '/api/compare?country={CODE}&sector={CODE}'
+            'portfolio': '/api/portfolio (POST)',
+            'bulk_jobs': '/api/jobs/assessments (POST, GET /{job_id}, GET /{job_id}/results, POST /{job_id}/cancel)',
+            'compare': '/api/compare?country={CODE}&sector={CODE}',
+            'customers': '/api/customers?country={CODE}&sector={CODE}&min_coefficient={0.01}&top_n={N}',
+            'paths': '/api/paths?country={CODE}&sector={CODE}&k={N}&depth={N}&risk_type={TYPE|mean}',
+            'subgraph': '/api/subgraph?country={CODE}&sector={CODE}&depth={N}&max_nodes={N}&min_coefficient={X}',
+            'attribution': '/api/attribution?country={CODE}&sector={CODE}&top_n={N}',
+            'uncertainty': '/api/uncertainty?country={CODE}&sector={CODE}&samples={N}&distribution={normal|uniform|triangular}',
+            'country_disruption_sweep': '/api/sweep/country-disruption (POST)',
+            'risk_score_revision': '/api/risk-data/scores (POST)',
+            'watchlists': '/api/watchlists (POST, GET, GET /{id}, DELETE /{id})',
+            'sourcing_mix': '/api/recommend/sourcing-mix (POST)',
+            'hotspots': '/api/hotspots?risk_type={TYPE|mean}&measure={total|direct|indirect}&region={R,...}&category={C,...}&extended={include|exclude|only}&offset={N}&limit={N}',
+            'sector_ranking': '/api/rank/sector/{SECTOR}?weights={type:w,...}&exclude={CODES}&order={asc|desc}&limit={N}'
         },
         'features': [
             'Dual I-O model support (OECD ICIO + EXIOBASE)',
@@ -187,6 +368,44 @@ def get_countries():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/countries/<country_input>/profile')
+@require_api_key
+def get_country_profile(country_input):
+    """Direct, indirect and total risk of every sector of a country (ETag-cacheable)"""
+    model_type = request.args.get('model', 'oecd').lower()
+    include_names = request.args.get('include_names', 'false').lower() == 'true'
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    try:
+        country_code = country_name_to_code(country_input)
+    except ValueError:
+        country_code = country_input.upper()
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.country_profile(country_code, include_names=include_names)
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        # The ETag hashes the body, so it changes exactly when the profile does
+        response = jsonify(result)
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({
+            'error': 'Country profile failed',
+            'message': str(e),
+            'country': country_input,
+            'model': model_type
+        }), 500
+
 @app.route('/api/sectors')
 @require_api_key
 def get_sectors():
@@ -219,12 +438,37 @@ def assess_risk():
     sector_input = request.args.get('sector', '')  # Can be name or code
     model_type = request.args.get('model', 'oecd').lower()
     skip_climate = request.args.get('skip_climate', 'false').lower() == 'true'
+    budget_ms = request.args.get('budget_ms')
+    include_split = request.args.get('include_split', 'false').lower() == 'true'
     
     if not country_input or not sector_input:
         return jsonify({
             'error': 'Missing required parameters',
             'required': ['country', 'sector'],
-            'optional': ['model (default: oecd)', 'skip_climate (default: false)']
+            'optional': ['model (default: oecd)', 'skip_climate (default: false)', 'budget_ms',
+                         'include_split (default: false)',
+                         'overrides (JSON: {"countries": {"VNM": {"political": 4.5}}})']
+        }), 400
+    
+    score_overrides, overrides_error = parse_score_overrides(request.args.get('overrides'))
+    if overrides_error:
+        return jsonify({'error': 'Invalid overrides', 'message': overrides_error}), 400
+    
+    if budget_ms is not None:
+        try:
+            budget_ms = float(budget_ms)
+            if budget_ms <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'error': 'Invalid budget_ms',
+                'message': 'budget_ms must be a positive number of milliseconds'
+            }), 400
+    
+    if score_overrides and budget_ms is not None:
+        return jsonify({
+            'error': 'Invalid parameter combination',
+            'message': 'budget_ms cannot be combined with overrides (scenario results are always complete)'
         }), 400
     
     if not IOModelFactory.validate_model_type(model_type):
@@ -233,43 +477,72 @@ def assess_risk():
             'available_models': list(IOModelFactory.MODELS.keys())
         }), 400
     
-    # Convert country name to code if needed
-    try:
-        # Try to convert name to code (e.g., "United States" -> "USA")
-        country_code = country_name_to_code(country_input)
-    except ValueError:
-        # If not a name, assume it's already a code
-        country_code = country_input.upper()
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
     
-    # Convert sector name to code if needed
-    try:
-        # Try to convert name to code (e.g., "Food products, beverages and tobacco" -> "C10T12")
-        sector_code = sector_name_to_code(sector_input)
-    except ValueError:
-        # If not a name, assume it's already a code
-        sector_code = sector_input.upper()
+    cache_variant = _assessment_cache_variant(skip_climate, include_split)
     
     try:
+        if score_overrides:
+            # Scenario results are never read from or written to the shared cache
+            calculator = get_risk_calculator(model_type)
+            result = calculator.assess_risk(
+                country_code, sector_code, skip_climate=skip_climate, include_split=include_split,
+                score_overrides=score_overrides
+            )
+            if result and 'error' in result:
+                return jsonify(result), 404
+            result['cache_hit'] = False
+            return jsonify(result)
+        
+        # Check cache first (only complete assessments are cached)
         calculator = get_risk_calculator(model_type)
-        result = calculator.assess_risk(country_code, sector_code, skip_climate=skip_climate)
+        version = calculator.cache_version()
+        cached_result = get_assessment_from_cache(country_code, sector_code, model_type, cache_variant, version)
+        if cached_result is not None:
+            # Copy: the cache hands out its own object, shared with other requests
+            return jsonify(dict(cached_result, cache_hit=True))
+        
+        def compute():
+            result = calculator.assess_risk(
+                country_code, sector_code, skip_climate=skip_climate, budget_ms=budget_ms,
+                include_split=include_split
+            )
+            if result and 'error' in result:
+                return result
+            
+            result['cache_hit'] = False
+            if not result['complete']:
+                # Partial (anytime) result - finish it off the request thread
+                complete_assessment_in_background(
+                    model_type, country_code, sector_code, skip_climate, include_split
+                )
+            else:
+                save_assessment_to_cache(country_code, sector_code, model_type, result, cache_variant, version)
+            return result
+        
+        # Concurrent requests for the same assessment share one computation
+        flight_key = (get_cache_key(country_code, sector_code, model_type, cache_variant, version), budget_ms)
+        result, coalesced = get_assessment_flights().do(flight_key, compute)
         
         if result and 'error' in result:
             return jsonify(result), 404
+        if coalesced:
+            result = dict(result, coalesced=True)
         
         return jsonify(result)
     except Exception as e:
         return jsonify({
             'error': 'Assessment failed',
             'message': str(e),
-            'country': country,
-            'sector': sector,
+            'country': country_input,
+            'sector': sector_input,
             'model': model_type
         }), 500
 
 @app.route('/api/batch', methods=['POST'])
 @require_api_key
 def batch_assess():
-    """Batch assessment for multiple country-sectors"""
+    """Batch assessment for multiple country-sectors (evaluated together, duplicates once)"""
     data = request.get_json()
     
     if not data or 'assessments' not in data:
@@ -282,12 +555,16 @@ def batch_assess():
                 ]
             },
             'optional': {
-                'model': 'oecd (default) or exiobase'
+                'model': 'oecd (default) or exiobase',
+                'skip_climate': 'false (default) or true',
+                'workers': 'worker processes for large batches (default: 1)',
+                'overrides': {'countries': {'VNM': {'political': 4.5}}}
             }
         }), 400
     
     assessments = data.get('assessments', [])
     model_type = data.get('model', 'oecd').lower()
+    skip_climate = json_flag(data, 'skip_climate')
     
     if not IOModelFactory.validate_model_type(model_type):
         return jsonify({
@@ -296,26 +573,45 @@ def batch_assess():
         }), 400
     
     try:
+        workers = int(data.get('workers', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers must be an integer'}), 400
+    
+    score_overrides, overrides_error = parse_score_overrides(data.get('overrides'))
+    if overrides_error:
+        return jsonify({'error': 'Invalid overrides', 'message': overrides_error}), 400
+    
+    try:
+        start = time.monotonic()
         calculator = get_risk_calculator(model_type)
-        results = []
         
-        for item in assessments:
-            country = item.get('country', '').upper()
-            sector = item.get('sector', '').upper()
-            
-            if not country or not sector:
-                results.append({
-                    'error': 'Missing country or sector',
-                    'item': item
-                })
-                continue
-            
-            result = calculator.assess_risk(country, sector)
-            results.append(result)
+        if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+            return Response(
+                stream_batch_results(calculator, assessments, model_type, skip_climate, start, score_overrides),
+                mimetype='application/x-ndjson'
+            )
+        
+        targets = resolve_batch_items(assessments)
+        by_target, cache_hits = assess_batch_targets(
+            calculator, targets, model_type, skip_climate, workers, score_overrides
+        )
+        
+        results = [
+            by_target[target] if target is not None else {
+                'error': 'Missing country or sector',
+                'item': item
+            }
+            for item, target in zip(assessments, targets)
+        ]
+        elapsed = time.monotonic() - start
         
         return jsonify({
             'model': model_type,
             'count': len(results),
+            'unique_items': len(by_target),
+            'cache_hits': cache_hits,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'items_per_second': round(len(results) / elapsed, 1) if elapsed > 0 else None,
             'results': results
         })
     except Exception as e:
@@ -324,113 +620,921 @@ def batch_assess():
             'message': str(e)
         }), 500
 
-@app.route('/api/compare')
+def assess_batch_targets(
+    calculator: MultiTierRiskCalculator,
+    targets,
+    model_type: str,
+    skip_climate: bool,
+    workers: int = 1,
+    score_overrides=None
+):
+    """
+    Assess the distinct (country, sector) targets of a batch.
+    
+    Cached assessments are reused; the rest are evaluated together by
+    calculator.assess_batch() (sharded over worker processes for large
+    batches when workers > 1) and cached. Scenario batches (score_overrides)
+    bypass the cache in both directions and always run in-process.
+    
+    Returns:
+        Tuple of (results by target, number of cache hits)
+    """
+    cache_variant = _assessment_cache_variant(skip_climate)
+    version = calculator.cache_version()
+    by_target = {}
+    uncached = []
+    for target in dict.fromkeys(t for t in targets if t is not None):
+        cached_result = (
+            None if score_overrides else get_assessment_from_cache(*target, model_type, cache_variant, version)
+        )
+        if cached_result is not None:
+            by_target[target] = dict(cached_result, cache_hit=True)
+        else:
+            uncached.append(target)
+    cache_hits = len(by_target)
+    
+    if score_overrides:
+        evaluated = calculator.assess_batch(uncached, skip_climate=skip_climate, score_overrides=score_overrides)
+    elif workers > 1 and len(uncached) >= PARALLEL_BATCH_MIN_ITEMS:
+        from parallel_backend import get_process_backend
+        with get_process_backend(calculator) as backend:
+            evaluated = backend.assess_batch(uncached, skip_climate=skip_climate, shards=workers)
+    else:
+        evaluated = calculator.assess_batch(uncached, skip_climate=skip_climate)
+    
+    for target, result in zip(uncached, evaluated):
+        if 'error' not in result:
+            result['cache_hit'] = False
+            if not score_overrides:
+                save_assessment_to_cache(*target, model_type, result, cache_variant, version)
+        by_target[target] = result
+    
+    return by_target, cache_hits
+
+def stream_batch_results(
+    calculator: MultiTierRiskCalculator,
+    assessments,
+    model_type: str,
+    skip_climate: bool,
+    start: float,
+    score_overrides=None
+):
+    """
+    Generate a batch response as NDJSON: one result per line, in request order,
+    followed by a summary line.
+    
+    Items are processed in chunks of BATCH_STREAM_CHUNK_SIZE so only one
+    chunk of results is held in memory at a time; the first lines are sent
+    as soon as the first chunk is done. Chunks are always evaluated
+    in-process: one chunk is far below PARALLEL_BATCH_MIN_ITEMS, so the
+    request's `workers` does not apply to streamed batches.
+    """
+    count = 0
+    cache_hits = 0
+    for offset in range(0, len(assessments), BATCH_STREAM_CHUNK_SIZE):
+        chunk = assessments[offset:offset + BATCH_STREAM_CHUNK_SIZE]
+        try:
+            targets = resolve_batch_items(chunk)
+            by_target, chunk_hits = assess_batch_targets(
+                calculator, targets, model_type, skip_climate, score_overrides=score_overrides
+            )
+        except Exception as e:
+            # Headers are already sent: report the failure in-band and stop
+            yield app.json.dumps({'error': 'Batch assessment failed', 'message': str(e), 'index': offset}) + '\n'
+            return
+        cache_hits += chunk_hits
+        
+        for item, target in zip(chunk, targets):
+            result = by_target[target] if target is not None else {
+                'error': 'Missing country or sector',
+                'item': item
+            }
+            count += 1
+            yield app.json.dumps(result) + '\n'
+    
+    elapsed = time.monotonic() - start
+    yield app.json.dumps({
+        'summary': {
+            'model': model_type,
+            'count': count,
+            'cache_hits': cache_hits,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'items_per_second': round(count / elapsed, 1) if elapsed > 0 else None
+        }
+    }) + '\n'
+
+@app.route('/api/portfolio', methods=['POST'])
 @require_api_key
-def compare_models():
-    """Compare risk assessment results from both models"""
-    country = request.args.get('country', '').upper()
-    sector = request.args.get('sector', '').upper()
+def assess_portfolio():
+    """Spend-weighted risk and expected loss of a portfolio of country-sector holdings"""
+    data = request.get_json(silent=True)
     
-    if not country or not sector:
+    if not data or not isinstance(data.get('holdings'), list):
         return jsonify({
-            'error': 'Missing required parameters',
-            'required': ['country', 'sector']
+            'error': 'Invalid request',
+            'required': {
+                'holdings': [
+                    {'country': 'CHN', 'sector': 'C26', 'amount': 250000},
+                    {'country': 'USA', 'sector': 'C10T12', 'amount': 100000}
+                ]
+            },
+            'optional': {
+                'model': 'oecd (default) or exiobase',
+                'top_n': 'top contributors returned (default: 10)',
+                'overrides': {'countries': {'VNM': {'political': 4.5}}}
+            }
+        }), 400
+    
+    model_type = data.get('model', 'oecd').lower()
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
         }), 400
     
     try:
-        # Get results from both models
-        oecd_calc = get_risk_calculator('oecd')
-        oecd_result = oecd_calc.assess_risk(country, sector)
+        top_n = int(data.get('top_n', 10))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_n must be an integer'}), 400
+    
+    score_overrides, overrides_error = parse_score_overrides(data.get('overrides'))
+    if overrides_error:
+        return jsonify({'error': 'Invalid overrides', 'message': overrides_error}), 400
+    
+    lines = data['holdings']
+    holdings = []
+    line_numbers = []
+    invalid_lines = []
+    for i, (line, target) in enumerate(zip(lines, resolve_batch_items(lines))):
+        try:
+            amount = float(line.get('amount'))
+            if target is None or not amount >= 0:
+                raise ValueError
+        except (AttributeError, TypeError, ValueError):
+            invalid_lines.append(i)
+            continue
+        holdings.append((target[0], target[1], amount))
+        line_numbers.append(i)
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.assess_portfolio(
+            holdings, top_n=max(top_n, 1), score_overrides=score_overrides, line_numbers=line_numbers
+        )
         
-        # EXIOBASE not fully implemented yet
-        exiobase_result = {
-            'status': 'not_available',
-            'message': 'EXIOBASE coefficient matrix pending'
-        }
+        if 'error' in result:
+            result['invalid_lines'] = invalid_lines[:20]
+            return jsonify(result), 400
         
-        return jsonify({
-            'country': country,
-            'sector': sector,
-            'oecd': oecd_result,
-            'exiobase': exiobase_result,
-            'comparison': {
-                'note': 'Full comparison available when EXIOBASE coefficients are loaded'
-            }
-        })
+        result['holdings']['lines'] = len(lines)
+        result['invalid_lines'] = invalid_lines[:20]
+        result['invalid_line_count'] = len(invalid_lines)
+        return jsonify(result)
     except Exception as e:
         return jsonify({
-            'error': 'Comparison failed',
-            'message': str(e)
+            'error': 'Portfolio assessment failed',
+            'message': str(e),
+            'model': model_type
         }), 500
 
-@app.route('/api/cache/stats')
+@app.route('/api/attribution')
 @require_api_key
-def cache_stats():
-    """Get expected loss cache statistics"""
-    from expected_loss_cache import get_cache
+def attribute_risk():
+    """Decompose a country-sector's indirect risk by origin country, origin sector and tier"""
+    country_input = request.args.get('country', '')
+    sector_input = request.args.get('sector', '')
+    model_type = request.args.get('model', 'oecd').lower()
+    
+    if not country_input or not sector_input:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector'],
+            'optional': ['model (default: oecd)', 'top_n (default: 10)']
+        }), 400
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
     
     try:
-        cache = get_cache()
-        stats = cache.get_cache_stats()
-        return jsonify(stats)
+        top_n = int(request.args.get('top_n', 10))
+    except ValueError:
+        return jsonify({'error': 'top_n must be an integer'}), 400
+    
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.attribute_indirect_risk(country_code, sector_code, top_n=max(top_n, 1))
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
     except Exception as e:
         return jsonify({
-            'error': 'Failed to get cache stats',
-            'message': str(e)
+            'error': 'Attribution failed',
+            'message': str(e),
+            'country': country_input,
+            'sector': sector_input,
+            'model': model_type
         }), 500
 
-@app.route('/api/cache/refresh', methods=['POST'])
+@app.route('/api/customers')
 @require_api_key
-def refresh_cache():
-    """Start a background cache refresh job
+def get_customers():
+    """Buyers that depend on a country-sector, e.g. every buyer sourcing over 1% of its inputs from THA_C26"""
+    country_input = request.args.get('country', '')
+    sector_input = request.args.get('sector', '')
+    model_type = request.args.get('model', 'oecd').lower()
     
-    This will re-fetch Climate API data for all 85 OECD countries in the background.
-    Takes approximately 15-20 minutes to complete.
-    Returns immediately with a job ID that can be used to check progress.
+    if not country_input or not sector_input:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector'],
+            'optional': ['model (default: oecd)', 'top_n (default: 20)', 'min_coefficient (default: 0)']
+        }), 400
     
-    Query parameters:
-        force: If 'true', refresh all countries even if already cached
-    """
-    from cache_job_manager import get_job_manager
-    import uuid
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
     
-    force_refresh = request.args.get('force', 'false').lower() == 'true'
+    try:
+        top_n = int(request.args.get('top_n', 20))
+        min_coefficient = float(request.args.get('min_coefficient', 0.0))
+    except ValueError:
+        return jsonify({'error': 'top_n must be an integer and min_coefficient a number'}), 400
+    
+    if not 1 <= top_n <= 1000:
+        return jsonify({'error': 'top_n must be between 1 and 1000'}), 400
+    if min_coefficient < 0:
+        return jsonify({'error': 'min_coefficient must not be negative'}), 400
+    
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
     
     try:
-        # Get OECD model to get list of countries
-        io_model = IOModelFactory.create_model('oecd')
-        countries = io_model.get_countries()
-        country_names = [c.name for c in countries]
-        
-        # Start background job
-        job_manager = get_job_manager()
-        job_id = str(uuid.uuid4())
-        
-        job_status = job_manager.start_job(job_id, country_names, force_refresh)
+        calculator = get_risk_calculator(model_type)
+        result = calculator.get_customers(country_code, sector_code, top_n=top_n, min_coefficient=min_coefficient)
         
-        if job_status.get('error'):
-            return jsonify(job_status), 409  # Conflict - job already running
+        if 'error' in result:
+            return jsonify(result), 404
         
-        return jsonify({
-            'status': 'started',
-            'message': 'Cache refresh job started in background',
-            'job': job_status,
-            'check_status_url': f'/api/cache/jobs/{job_id}'
-        }), 202  # Accepted
+        return jsonify(result)
     except Exception as e:
         return jsonify({
-            'error': 'Failed to start cache refresh job',
-            'message': str(e)
+            'error': 'Customer lookup failed',
+            'message': str(e),
+            'country': country_input,
+            'sector': sector_input,
+            'model': model_type
         }), 500
 
-@app.route('/api/cache/jobs/<job_id>')
+@app.route('/api/paths')
 @require_api_key
-def get_cache_job_status(job_id):
-    """Get status of a cache refresh job"""
-    from cache_job_manager import get_job_manager
+def explain_paths():
+    """The k highest-contributing supply paths to a country-sector"""
+    from risk_calculator_v2 import RISK_TYPES
     
-    job_manager = get_job_manager()
-    job_status = job_manager.get_job_status(job_id)
+    country_input = request.args.get('country', '')
+    sector_input = request.args.get('sector', '')
+    model_type = request.args.get('model', 'oecd').lower()
+    risk_type = request.args.get('risk_type', 'mean')
+    
+    if not country_input or not sector_input:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector'],
+            'optional': ['model (default: oecd)', 'k (default: 10)', 'depth (default: 3)',
+                         f"risk_type (mean, {', '.join(RISK_TYPES)}; default: mean)"]
+        }), 400
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    if risk_type != 'mean' and risk_type not in RISK_TYPES:
+        return jsonify({'error': 'Invalid risk type', 'available': ['mean'] + RISK_TYPES}), 400
+    
+    try:
+        k = int(request.args.get('k', 10))
+        depth = request.args.get('depth')
+        depth = int(depth) if depth is not None else None
+    except ValueError:
+        return jsonify({'error': 'k and depth must be integers'}), 400
+    
+    if not 1 <= k <= 1000:
+        return jsonify({'error': 'k must be between 1 and 1000'}), 400
+    if depth is not None and depth < 1:
+        return jsonify({'error': 'depth must be at least 1'}), 400
+    
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.explain_paths(country_code, sector_code, k=k, max_depth=depth, risk_type=risk_type)
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Path explanation failed',
+            'message': str(e),
+            'country': country_input,
+            'sector': sector_input,
+            'model': model_type
+        }), 500
+
+@app.route('/api/subgraph')
+@require_api_key
+def supply_subgraph():
+    """Compact upstream supply network of a country-sector (node table + edge arrays) for visualization"""
+    country_input = request.args.get('country', '')
+    sector_input = request.args.get('sector', '')
+    model_type = request.args.get('model', 'oecd').lower()
+    include_names = request.args.get('include_names', 'false').lower() == 'true'
+    
+    if not country_input or not sector_input:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector'],
+            'optional': ['model (default: oecd)', 'depth (default: 3)', 'max_nodes (default: 200)',
+                         'min_coefficient (default: 0)', 'include_names (default: false)']
+        }), 400
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    try:
+        depth = request.args.get('depth')
+        depth = int(depth) if depth is not None else None
+        max_nodes = int(request.args.get('max_nodes', 200))
+        min_coefficient = float(request.args.get('min_coefficient', 0.0))
+    except ValueError:
+        return jsonify({'error': 'depth and max_nodes must be integers and min_coefficient a number'}), 400
+    
+    if depth is not None and not 1 <= depth <= 6:
+        return jsonify({'error': 'depth must be between 1 and 6'}), 400
+    if not 1 <= max_nodes <= 5000:
+        return jsonify({'error': 'max_nodes must be between 1 and 5000'}), 400
+    if min_coefficient < 0:
+        return jsonify({'error': 'min_coefficient must not be negative'}), 400
+    
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.supply_subgraph(
+            country_code, sector_code,
+            depth=depth,
+            max_nodes=max_nodes,
+            min_coefficient=min_coefficient,
+            include_names=include_names
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Subgraph export failed',
+            'message': str(e),
+            'country': country_input,
+            'sector': sector_input,
+            'model': model_type
+        }), 500
+
+@app.route('/api/rank/sector/<sector_input>')
+@require_api_key
+def rank_sector_countries(sector_input):
+    """Rank all countries for a sector by (weighted) total risk, for alternative sourcing"""
+    from risk_calculator_v2 import RISK_TYPES
+    
+    model_type = request.args.get('model', 'oecd').lower()
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    try:
+        weights = None
+        if request.args.get('weights'):
+            # e.g. weights=climate:2,political:1
+            weights = {}
+            for part in request.args['weights'].split(','):
+                risk_type, _, value = part.partition(':')
+                weights[risk_type.strip()] = float(value)
+        max_score = request.args.get('max_score')
+        max_score = float(max_score) if max_score is not None else None
+        limit = int(request.args.get('limit', 0)) or None
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'weights must look like climate:2,political:1; max_score a number; limit an integer'
+        }), 400
+    
+    if weights is not None and (
+        any(risk_type not in RISK_TYPES for risk_type in weights)
+        or any(value < 0 for value in weights.values()) or sum(weights.values()) <= 0
+    ):
+        return jsonify({
+            'error': 'Invalid weights',
+            'message': 'weights must be non-negative with a positive sum',
+            'available': RISK_TYPES
+        }), 400
+    
+    order = request.args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    
+    try:
+        sector_code = sector_name_to_code(sector_input)
+    except ValueError:
+        sector_code = sector_input.upper()
+    
+    exclude = [code.strip() for code in request.args.get('exclude', '').split(',') if code.strip()]
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.rank_sector_countries(
+            sector_code,
+            weights=weights,
+            include_extended=request.args.get('include_extended', 'false').lower() == 'true',
+            include_rest_of_world=request.args.get('include_rest_of_world', 'false').lower() == 'true',
+            exclude_countries=exclude,
+            max_score=max_score,
+            descending=order == 'desc',
+            limit=limit
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Sector ranking failed',
+            'message': str(e),
+            'sector': sector_input,
+            'model': model_type
+        }), 500
+
+@app.route('/api/recommend/sourcing-mix', methods=['POST'])
+@require_api_key
+def recommend_sourcing_mix():
+    """Lowest-risk mix of supplier countries for a sector a buyer purchases, under share constraints"""
+    from risk_calculator_v2 import RISK_TYPES
+    
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('country') or not data.get('sector') or not data.get('input_sector'):
+        return jsonify({
+            'error': 'Invalid request',
+            'required': {'country': 'USA', 'sector': 'C29', 'input_sector': 'C26'},
+            'optional': {
+                'model': 'oecd (default) or exiobase',
+                'weights': {'climate': 2, 'political': 1},
+                'max_share': '0.4 (default)',
+                'country_caps': {'CHN': 0.1},
+                'exclude': ['RUS'],
+                'include_extended': 'false (default)',
+                'include_rest_of_world': 'false (default)'
+            }
+        }), 400
+    
+    model_type = str(data.get('model', 'oecd')).lower()
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    def to_country_code(country) -> str:
+        try:
+            return country_name_to_code(str(country))
+        except ValueError:
+            return str(country).upper()
+    
+    weights = data.get('weights')
+    try:
+        max_share = float(data.get('max_share', 0.4))
+        if weights is not None:
+            weights = {str(risk_type): float(value) for risk_type, value in weights.items()}
+        caps = {to_country_code(country): float(cap) for country, cap in (data.get('country_caps') or {}).items()}
+        excluded = [to_country_code(country) for country in data.get('exclude') or []]
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'max_share must be a number; weights and country_caps objects of numbers; exclude a list'
+        }), 400
+    
+    if not 0 < max_share <= 1 or not all(0 <= cap <= 1 for cap in caps.values()):
+        return jsonify({'error': 'max_share must be in (0, 1] and country caps in [0, 1]'}), 400
+    if weights is not None and (
+        any(risk_type not in RISK_TYPES for risk_type in weights)
+        or any(value < 0 for value in weights.values()) or sum(weights.values()) <= 0
+    ):
+        return jsonify({
+            'error': 'Invalid weights',
+            'message': 'weights must be non-negative with a positive sum',
+            'available': RISK_TYPES
+        }), 400
+    
+    country_code, sector_code = resolve_country_sector(str(data['country']), str(data['sector']))
+    try:
+        input_sector = sector_name_to_code(str(data['input_sector']))
+    except ValueError:
+        input_sector = str(data['input_sector']).upper()
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.recommend_sourcing_mix(
+            country_code, sector_code, input_sector,
+            weights=weights,
+            max_share=max_share,
+            country_caps=caps,
+            exclude_countries=excluded,
+            include_extended=json_flag(data, 'include_extended'),
+            include_rest_of_world=json_flag(data, 'include_rest_of_world')
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 422 if 'capacity' in result else 404
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Sourcing mix recommendation failed',
+            'message': str(e),
+            'country': data.get('country'),
+            'sector': data.get('sector'),
+            'model': model_type
+        }), 500
+
+@app.route('/api/hotspots')
+@require_api_key
+def risk_hotspots():
+    """Country-sectors with the highest risk globally, from precomputed sorted indexes"""
+    model_type = request.args.get('model', 'oecd').lower()
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    
+    if offset < 0 or not 1 <= limit <= 1000:
+        return jsonify({'error': 'offset must be >= 0 and limit between 1 and 1000'}), 400
+    
+    def listed(name):
+        return [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.get_hotspot_index().query(
+            risk_type=request.args.get('risk_type', 'mean'),
+            measure=request.args.get('measure', 'total').lower(),
+            regions=listed('region'),
+            categories=listed('category'),
+            extended=request.args.get('extended', 'include').lower(),
+            offset=offset,
+            limit=limit
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 400
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Hotspot query failed',
+            'message': str(e),
+            'model': model_type
+        }), 500
+
+@app.route('/api/uncertainty')
+@require_api_key
+def assess_uncertainty():
+    """Monte Carlo confidence intervals for a country-sector's direct, indirect and total risk"""
+    from risk_uncertainty import DISTRIBUTIONS, MAX_SAMPLES
+    
+    country_input = request.args.get('country', '')
+    sector_input = request.args.get('sector', '')
+    model_type = request.args.get('model', 'oecd').lower()
+    distribution = request.args.get('distribution', 'normal').lower()
+    
+    if not country_input or not sector_input:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector'],
+            'optional': ['model (default: oecd)', 'samples (default: 1000)',
+                         f"distribution ({', '.join(DISTRIBUTIONS)}; default: normal)",
+                         'country_spread (default: 0.3)', 'sector_spread (default: 0.2)',
+                         'percentiles (default: 5,25,50,75,95)', 'seed']
+        }), 400
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    if distribution not in DISTRIBUTIONS:
+        return jsonify({'error': 'Invalid distribution', 'available': DISTRIBUTIONS}), 400
+    
+    try:
+        samples = int(request.args.get('samples', 1000))
+        country_spread = float(request.args.get('country_spread', 0.3))
+        sector_spread = float(request.args.get('sector_spread', 0.2))
+        percentiles = None
+        if request.args.get('percentiles'):
+            percentiles = [float(p) for p in request.args['percentiles'].split(',')]
+        seed = request.args.get('seed')
+        seed = int(seed) if seed is not None else None
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'samples and seed must be integers; spreads and percentiles numbers'
+        }), 400
+    
+    if not 1 <= samples <= MAX_SAMPLES:
+        return jsonify({'error': f'samples must be between 1 and {MAX_SAMPLES}'}), 400
+    if country_spread < 0 or sector_spread < 0:
+        return jsonify({'error': 'spreads must not be negative'}), 400
+    if percentiles is not None and not all(0 <= p <= 100 for p in percentiles):
+        return jsonify({'error': 'percentiles must be between 0 and 100'}), 400
+    
+    country_code, sector_code = resolve_country_sector(country_input, sector_input)
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.assess_uncertainty(
+            country_code, sector_code,
+            samples=samples,
+            distribution=distribution,
+            country_spread=country_spread,
+            sector_spread=sector_spread,
+            percentiles=percentiles,
+            seed=seed
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Uncertainty assessment failed',
+            'message': str(e),
+            'country': country_input,
+            'sector': sector_input,
+            'model': model_type
+        }), 500
+
+@app.route('/api/sweep/country-disruption', methods=['POST'])
+@require_api_key
+def country_disruption_sweep():
+    """Change in total risk of all buyers when countries' exports are removed or shocked"""
+    from risk_calculator_v2 import RISK_TYPES
+    
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('countries'):
+        return jsonify({
+            'error': 'Invalid request',
+            'required': {'countries': ['CHN', 'RUS']},
+            'optional': {
+                'factor': '0.0 (default, exports removed) .. 1.0 (unchanged)',
+                'top_n': 'most affected nodes per country (default: 20)',
+                'rank_by': "'total' (default) or a risk type",
+                'workers': 'worker processes for multi-country sweeps (default: 1)',
+                'model': 'oecd (default) or exiobase'
+            }
+        }), 400
+    
+    model_type = data.get('model', 'oecd').lower()
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    try:
+        factor = float(data.get('factor', 0.0))
+        top_n = int(data.get('top_n', 20))
+        workers = int(data.get('workers', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'factor must be a number, top_n and workers integers'}), 400
+    
+    if factor < 0:
+        return jsonify({'error': 'factor must not be negative'}), 400
+    
+    rank_by = data.get('rank_by', 'total')
+    if rank_by != 'total' and rank_by not in RISK_TYPES:
+        return jsonify({
+            'error': 'Invalid rank_by',
+            'available': ['total'] + RISK_TYPES
+        }), 400
+    
+    countries = data['countries']
+    if isinstance(countries, str):
+        countries = [countries]
+    country_codes = []
+    for country_input in countries:
+        try:
+            country_codes.append(country_name_to_code(country_input))
+        except ValueError:
+            country_codes.append(str(country_input).upper())
+    
+    try:
+        calculator = get_risk_calculator(model_type)
+        result = calculator.assess_country_disruption(
+            country_codes,
+            factor=factor,
+            top_n=max(top_n, 1),
+            rank_by=rank_by,
+            workers=max(workers, 1)
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            'error': 'Disruption sweep failed',
+            'message': str(e),
+            'model': model_type
+        }), 500
+
+@app.route('/api/compare')
+@require_api_key
+def compare_models():
+    """Compare risk assessment results from both models"""
+    country = request.args.get('country', '').upper()
+    sector = request.args.get('sector', '').upper()
+    
+    if not country or not sector:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['country', 'sector']
+        }), 400
+    
+    try:
+        # Get results from both models
+        oecd_calc = get_risk_calculator('oecd')
+        oecd_result = oecd_calc.assess_risk(country, sector)
+        
+        # EXIOBASE not fully implemented yet
+        exiobase_result = {
+            'status': 'not_available',
+            'message': 'EXIOBASE coefficient matrix pending'
+        }
+        
+        return jsonify({
+            'country': country,
+            'sector': sector,
+            'oecd': oecd_result,
+            'exiobase': exiobase_result,
+            'comparison': {
+                'note': 'Full comparison available when EXIOBASE coefficients are loaded'
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'error': 'Comparison failed',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/cache/stats')
+@require_api_key
+def cache_stats():
+    """Get expected loss, assessment and subtree cache statistics, and assessment coalescing counters"""
+    from expected_loss_cache import get_cache
+    from cache_manager import get_cache_stats, get_subtree_cache
+    
+    try:
+        cache = get_cache()
+        stats = cache.get_cache_stats()
+        stats['assessment_cache'] = get_cache_stats()
+        stats['subtree_cache'] = get_subtree_cache().get_stats()
+        stats['coalescing'] = get_assessment_flights().get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({
+            'error': 'Failed to get cache stats',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/cache/refresh', methods=['POST'])
+@require_api_key
+def refresh_cache():
+    """Start a background cache refresh job
+    
+    This will re-fetch Climate API data for all 85 OECD countries in the background.
+    Takes approximately 15-20 minutes to complete.
+    Returns immediately with a job ID that can be used to check progress.
+    When it completes, only the cached assessments that depend on countries
+    whose data changed are invalidated.
+    
+    Query parameters:
+        force: If 'true', refresh all countries even if already cached
+    """
+    from cache_job_manager import get_job_manager
+    from incremental_refresh import apply_climate_update
+    import uuid
+    
+    force_refresh = request.args.get('force', 'false').lower() == 'true'
+    
+    try:
+        # Get OECD model to get list of countries
+        io_model = IOModelFactory.create_model('oecd')
+        countries = io_model.get_countries()
+        country_names = [c.name for c in countries]
+        
+        # Start background job
+        job_manager = get_job_manager()
+        job_id = str(uuid.uuid4())
+        
+        job_status = job_manager.start_job(
+            job_id, country_names, force_refresh,
+            on_complete=lambda changed: apply_climate_update(dict(_model_cache), changed)
+        )
+        
+        if job_status.get('error'):
+            return jsonify(job_status), 409  # Conflict - job already running
+        
+        return jsonify({
+            'status': 'started',
+            'message': 'Cache refresh job started in background',
+            'job': job_status,
+            'check_status_url': f'/api/cache/jobs/{job_id}'
+        }), 202  # Accepted
+    except Exception as e:
+        return jsonify({
+            'error': 'Failed to start cache refresh job',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/risk-data/scores', methods=['POST'])
+@require_api_key
+def revise_risk_scores():
+    """Revise country/sector risk scores and recompute only the nodes that depend on them"""
+    from incremental_refresh import apply_risk_score_update
+    
+    data = request.get_json(silent=True)
+    revisions, revisions_error = parse_score_overrides(data)
+    if revisions_error or not revisions:
+        return jsonify({
+            'error': 'Invalid request',
+            'message': revisions_error or 'No score revisions given',
+            'example': {'countries': {'VNM': {'political': 4.5}}, 'sectors': {'C26': {'climate': 3.2}}}
+        }), 400
+    
+    # Risk data is keyed by risk-data sector codes
+    from sector_code_mapper import get_risk_sector_for_oecd
+    sector_scores = {}
+    for code, scores in revisions['sectors'].items():
+        try:
+            code = get_risk_sector_for_oecd(code)
+        except ValueError:
+            pass
+        sector_scores.setdefault(code, {}).update(scores)
+    
+    try:
+        start = time.monotonic()
+        report = apply_risk_score_update(dict(_model_cache), revisions['countries'], sector_scores)
+        report['elapsed_ms'] = round((time.monotonic() - start) * 1000, 1)
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({
+            'error': 'Risk score revision failed',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/cache/jobs/<job_id>')
+@require_api_key
+def get_cache_job_status(job_id):
+    """Get status of a cache refresh job"""
+    from cache_job_manager import get_job_manager
+    
+    job_manager = get_job_manager()
+    job_status = job_manager.get_job_status(job_id)
     
     if not job_status:
         return jsonify({
@@ -449,6 +1553,237 @@ def list_cache_jobs():
     job_manager = get_job_manager()
     return jsonify(job_manager.get_all_jobs())
 
+@app.route('/api/jobs/assessments', methods=['POST'])
+@require_api_key
+def submit_bulk_assessment_job():
+    """Start a background job assessing many country-sectors for several parameter sets
+    
+    Returns immediately with a job ID. Results are written to disk and can be
+    downloaded from /api/jobs/assessments/<job_id>/results once completed.
+    """
+    from bulk_job_manager import get_bulk_job_manager
+    import uuid
+    
+    data = request.get_json(silent=True) or {}
+    model_type = data.get('model', 'oecd').lower()
+    parameter_sets = data.get('parameter_sets', [{}])
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    if not isinstance(parameter_sets, list) or not parameter_sets:
+        return jsonify({
+            'error': 'Invalid parameter_sets',
+            'example': [{}, {'max_tiers': 2}, {'tier_weights': [1.0, 0.5, 0.25]}]
+        }), 400
+    for parameters in parameter_sets:
+        if not isinstance(parameters, dict) or set(parameters) - {'max_tiers', 'tier_weights'}:
+            return jsonify({'error': 'Parameter sets may only set max_tiers and tier_weights'}), 400
+        max_tiers = parameters.get('max_tiers', 3)
+        tier_weights = parameters.get('tier_weights', [1.0, 0.4, 0.16])
+        if not isinstance(max_tiers, int) or not 1 <= max_tiers <= 3:
+            return jsonify({'error': 'max_tiers must be 1, 2 or 3'}), 400
+        if (not isinstance(tier_weights, list) or len(tier_weights) != 3
+                or not all(isinstance(w, (int, float)) and w >= 0 for w in tier_weights)):
+            return jsonify({'error': 'tier_weights must be a list of 3 non-negative numbers'}), 400
+    
+    targets = None
+    if data.get('targets') is not None:
+        targets = [t for t in resolve_batch_items(data['targets']) if t is not None]
+        if not targets:
+            return jsonify({'error': 'targets must be a list of {country, sector} items'}), 400
+    
+    try:
+        job_id = str(uuid.uuid4())
+        job_status = get_bulk_job_manager().start_job(
+            job_id, get_risk_calculator(model_type), parameter_sets, targets
+        )
+        
+        if job_status.get('error'):
+            return jsonify(job_status), 429  # Too many pending jobs
+        
+        return jsonify({
+            'status': 'queued',
+            'message': 'Bulk assessment job submitted',
+            'job': job_status,
+            'check_status_url': f'/api/jobs/assessments/{job_id}',
+            'results_url': f'/api/jobs/assessments/{job_id}/results'
+        }), 202  # Accepted
+    except Exception as e:
+        return jsonify({
+            'error': 'Failed to start bulk assessment job',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/jobs/assessments')
+@require_api_key
+def list_bulk_assessment_jobs():
+    """List all bulk assessment jobs"""
+    from bulk_job_manager import get_bulk_job_manager
+    
+    return jsonify(get_bulk_job_manager().get_all_jobs())
+
+@app.route('/api/jobs/assessments/<job_id>')
+@require_api_key
+def get_bulk_assessment_job(job_id):
+    """Get status and progress of a bulk assessment job"""
+    from bulk_job_manager import get_bulk_job_manager
+    
+    job_status = get_bulk_job_manager().get_job_status(job_id)
+    if not job_status:
+        return jsonify({
+            'error': 'Job not found',
+            'job_id': job_id
+        }), 404
+    
+    return jsonify(job_status)
+
+@app.route('/api/jobs/assessments/<job_id>/results')
+@require_api_key
+def download_bulk_assessment_results(job_id):
+    """Download the results of a completed bulk assessment job (gzip-compressed CSV)"""
+    from bulk_job_manager import get_bulk_job_manager
+    from flask import send_file
+    
+    job_status = get_bulk_job_manager().get_job_status(job_id)
+    if not job_status:
+        return jsonify({
+            'error': 'Job not found',
+            'job_id': job_id
+        }), 404
+    
+    if job_status['status'] != 'completed':
+        return jsonify({
+            'error': 'Results not available',
+            'status': job_status['status']
+        }), 409
+    
+    return send_file(
+        os.path.abspath(job_status['result_file']),
+        mimetype='application/gzip',
+        as_attachment=True,
+        download_name=f'bulk_assessment_{job_id}.csv.gz'
+    )
+
+@app.route('/api/jobs/assessments/<job_id>/cancel', methods=['POST'])
+@require_api_key
+def cancel_bulk_assessment_job(job_id):
+    """Cancel a queued or running bulk assessment job"""
+    from bulk_job_manager import get_bulk_job_manager
+    
+    manager = get_bulk_job_manager()
+    if not manager.cancel_job(job_id):
+        job_status = manager.get_job_status(job_id)
+        return jsonify({
+            'error': 'Job not found' if not job_status else 'Job is not queued or running',
+            'job_id': job_id
+        }), 404 if not job_status else 409
+    
+    return jsonify(manager.get_job_status(job_id))
+
+@app.route('/api/watchlists', methods=['POST'])
+@require_api_key
+def create_watchlist():
+    """Watch country-sectors and get their total risk changes POSTed to a webhook after refreshes"""
+    from watchlist_manager import get_watchlist_manager, webhook_url_error, MAX_WATCHLIST_NODES
+    import uuid
+    
+    data = request.get_json(silent=True) or {}
+    model_type = str(data.get('model', 'oecd')).lower()
+    nodes = data.get('nodes')
+    webhook_url = data.get('webhook_url')
+    
+    if not isinstance(nodes, list) or not nodes:
+        return jsonify({
+            'error': 'Invalid request',
+            'required': {'nodes': [{'country': 'THA', 'sector': 'C26'}, {'country': 'VNM', 'sector': 'C13T15'}]},
+            'optional': {
+                'name': 'Electronics suppliers',
+                'threshold': '0.1 (default; smallest reported change in any risk type)',
+                'webhook_url': 'https://example.com/hooks/risk',
+                'model': 'oecd (default) or exiobase'
+            }
+        }), 400
+    
+    if not IOModelFactory.validate_model_type(model_type):
+        return jsonify({
+            'error': 'Invalid model type',
+            'available_models': list(IOModelFactory.MODELS.keys())
+        }), 400
+    
+    if len(nodes) > MAX_WATCHLIST_NODES:
+        return jsonify({'error': f'A watchlist may hold at most {MAX_WATCHLIST_NODES} nodes'}), 400
+    
+    try:
+        threshold = float(data.get('threshold', 0.1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'threshold must be a number'}), 400
+    if threshold < 0:
+        return jsonify({'error': 'threshold must not be negative'}), 400
+    
+    webhook_error = webhook_url_error(webhook_url) if webhook_url is not None else None
+    if webhook_error:
+        return jsonify({'error': 'Invalid webhook_url', 'message': webhook_error}), 400
+    
+    targets = resolve_batch_items(nodes)
+    if None in targets:
+        return jsonify({'error': 'nodes must be a list of {country, sector} items'}), 400
+    
+    try:
+        watchlist = get_watchlist_manager().create(
+            str(uuid.uuid4()),
+            get_risk_calculator(model_type),
+            model_type,
+            targets,
+            threshold=threshold,
+            webhook_url=webhook_url,
+            name=data.get('name')
+        )
+        
+        if 'error' in watchlist:
+            return jsonify(watchlist), 404
+        
+        return jsonify(watchlist), 201
+    except Exception as e:
+        return jsonify({
+            'error': 'Failed to create watchlist',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/watchlists')
+@require_api_key
+def list_watchlists():
+    """List all watchlists"""
+    from watchlist_manager import get_watchlist_manager
+    
+    return jsonify({'watchlists': get_watchlist_manager().list()})
+
+@app.route('/api/watchlists/<watchlist_id>')
+@require_api_key
+def get_watchlist(watchlist_id):
+    """Get a watchlist with the baseline total risk of its nodes"""
+    from watchlist_manager import get_watchlist_manager
+    
+    watchlist = get_watchlist_manager().get(watchlist_id, include_nodes=True)
+    if not watchlist:
+        return jsonify({'error': 'Watchlist not found', 'watchlist_id': watchlist_id}), 404
+    
+    return jsonify(watchlist)
+
+@app.route('/api/watchlists/<watchlist_id>', methods=['DELETE'])
+@require_api_key
+def delete_watchlist(watchlist_id):
+    """Delete a watchlist"""
+    from watchlist_manager import get_watchlist_manager
+    
+    if not get_watchlist_manager().delete(watchlist_id):
+        return jsonify({'error': 'Watchlist not found', 'watchlist_id': watchlist_id}), 404
+    
+    return jsonify({'status': 'deleted', 'watchlist_id': watchlist_id})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,77 @@
+"""Benchmark the Process-Pool Execution Backend
+
+Times a multi-country disruption sweep and a batch assessment of every node
+with 1 to N worker processes and prints the speedup over the in-process run.
+
+Usage:
+    python benchmark_parallel.py [--data-path DIR] [--max-workers N] [--countries N] [--repeat N]
+
+Options:
+    --data-path: Directory with oecd_icio_coefficients_full.csv.gz (default: repo root)
+    --max-workers: Largest worker count to try (default: number of CPU cores)
+    --countries: Countries per sweep (default: 16)
+    --repeat: Timed runs per configuration, best is reported (default: 3)
+"""
+import argparse
+import os
+import time
+
+from oecd_icio_model import OECDICIOModel
+from parallel_backend import ProcessPoolBackend
+from disruption_sweep import sweep_country_disruptions
+from risk_calculator_v2 import MultiTierRiskCalculator
+
+
+def best_time(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark process-pool sweeps and batches')
+    parser.add_argument('--data-path', default=None)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--countries', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("Process-Pool Backend Benchmark")
+    print("=" * 60)
+    
+    print("\n[1/3] Building supply network...")
+    calculator = MultiTierRiskCalculator(OECDICIOModel(data_path=args.data_path))
+    network = calculator.get_supply_network()
+    network.baseline_indirect()
+    countries = sorted(set(network.home_countries))[:args.countries]
+    targets = [node for i, node in enumerate(network.nodes) if network.valid[i]]
+    print(f"  {network.node_count} nodes, {len(countries)} countries per sweep, {len(targets)} batch targets")
+    
+    print("\n[2/3] In-process baseline...")
+    sweep_base = best_time(lambda: sweep_country_disruptions(network, countries), args.repeat)
+    batch_base = best_time(lambda: calculator.assess_batch(targets, skip_climate=True), args.repeat)
+    print(f"  sweep: {sweep_base:.3f}s  batch: {batch_base:.3f}s")
+    
+    print("\n[3/3] Process pool...")
+    print(f"\n  {'workers':>7}  {'sweep (s)':>10}  {'speedup':>8}  {'batch (s)':>10}  {'speedup':>8}")
+    for workers in range(1, args.max_workers + 1):
+        backend = ProcessPoolBackend(calculator, workers)
+        try:
+            # Warm up: start and attach every worker before timing
+            backend.sweep_country_disruptions(countries[:1] * workers)
+            sweep_time = best_time(lambda: backend.sweep_country_disruptions(countries), args.repeat)
+            batch_time = best_time(lambda: backend.assess_batch(targets, skip_climate=True), args.repeat)
+        finally:
+            backend.shutdown()
+        print(f"  {workers:>7}  {sweep_time:>10.3f}  {sweep_base / sweep_time:>7.2f}x"
+              f"  {batch_time:>10.3f}  {batch_base / batch_time:>7.2f}x")
+    
+    print("\n" + "=" * 60)
+
+
+if __name__ == '__main__':
+    main()
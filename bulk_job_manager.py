@@ -0,0 +1,240 @@
+"""Background Job Manager for Bulk Assessments
+
+Runs assessments of many country-sectors (by default every node of the model)
+for one or more parameter sets in background threads, following the pattern of
+CacheJobManager. Results are written to a gzip-compressed CSV file on disk that
+can be downloaded once the job has completed.
+
+At most MAX_CONCURRENT_BULK_JOBS jobs run at a time; further jobs wait in the
+'queued' state so bulk work cannot starve interactive requests.
+"""
+import csv
+import gzip
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from risk_calculator_v2 import MultiTierRiskCalculator, RISK_TYPES
+
+
+BULK_JOB_DIR = os.environ.get('BULK_JOB_DIR', 'bulk_job_results')
+MAX_CONCURRENT_BULK_JOBS = int(os.environ.get('MAX_CONCURRENT_BULK_JOBS', 1))
+MAX_PENDING_BULK_JOBS = 10  # Queued + running
+BULK_JOB_CHUNK_SIZE = 500  # Rows written (and cancellation checked) per step
+
+RESULT_COLUMNS = (
+    ['parameter_set', 'country', 'sector']
+    + [f'direct_{risk_type}' for risk_type in RISK_TYPES]
+    + [f'indirect_{risk_type}' for risk_type in RISK_TYPES]
+    + [f'total_{risk_type}' for risk_type in RISK_TYPES]
+)
+
+
+class BulkJobManager:
+    """Manages background bulk assessment jobs"""
+    
+    def __init__(self, result_dir: str = BULK_JOB_DIR, max_concurrent: int = MAX_CONCURRENT_BULK_JOBS):
+        self.jobs: Dict[str, Dict] = {}
+        self.result_dir = result_dir
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max(max_concurrent, 1))
+    
+    def start_job(
+        self,
+        job_id: str,
+        calculator: MultiTierRiskCalculator,
+        parameter_sets: List[Dict],
+        targets: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict:
+        """Queue a bulk assessment job
+        
+        Args:
+            job_id: Unique identifier for the job
+            calculator: Calculator of the model to assess (its I-O model is shared)
+            parameter_sets: List of {'max_tiers': 1-3, 'tier_weights': [...]} overrides
+                            ({} uses the calculator's own settings)
+            targets: (country, sector) pairs to assess (default: every node)
+        
+        Returns:
+            Job status dictionary
+        """
+        with self.lock:
+            pending = [j for j in self.jobs.values() if j['status'] in ('queued', 'running')]
+            if len(pending) >= MAX_PENDING_BULK_JOBS:
+                return {
+                    'error': 'Too many bulk jobs pending',
+                    'pending_jobs': [j['job_id'] for j in pending]
+                }
+            
+            node_count = len(targets) if targets is not None else None
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'submitted_at': datetime.utcnow().isoformat(),
+                'started_at': None,
+                'completed_at': None,
+                'model': calculator.io_model.name,
+                'parameter_sets': parameter_sets,
+                'progress': {
+                    'total': node_count * len(parameter_sets) if node_count is not None else None,
+                    'processed': 0,
+                    'written': 0,
+                    'skipped': 0,
+                    'current_parameter_set': None
+                },
+                'result_file': None,
+                'columns': RESULT_COLUMNS,
+                'error': None
+            }
+            
+            thread = threading.Thread(
+                target=self._run_bulk_job,
+                args=(job_id, calculator, parameter_sets, targets),
+                daemon=True
+            )
+            thread.start()
+            
+            return dict(self.jobs[job_id])
+    
+    def _calculator_for(self, calculator: MultiTierRiskCalculator, parameters: Dict) -> MultiTierRiskCalculator:
+        """Calculator for one parameter set (the given one if nothing is overridden)"""
+        max_tiers = parameters.get('max_tiers', calculator.max_tiers)
+        tier_weights = parameters.get('tier_weights', calculator.tier_weights)
+        if max_tiers == calculator.max_tiers and list(tier_weights) == calculator.tier_weights:
+            return calculator
+        
+        variant = MultiTierRiskCalculator(calculator.io_model, max_tiers=max_tiers)
+        variant.tier_weights = list(tier_weights)
+        return variant
+    
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self.lock:
+            return self.jobs[job_id]['status'] == 'cancelled'
+    
+    def _run_bulk_job(
+        self,
+        job_id: str,
+        calculator: MultiTierRiskCalculator,
+        parameter_sets: List[Dict],
+        targets: Optional[List[Tuple[str, str]]]
+    ):
+        """Run a bulk assessment job in a background thread (waits for a free slot)"""
+        with self.slots:
+            with self.lock:
+                job = self.jobs[job_id]
+                if job['status'] == 'cancelled':
+                    return
+                job['status'] = 'running'
+                job['started_at'] = datetime.utcnow().isoformat()
+            
+            os.makedirs(self.result_dir, exist_ok=True)
+            result_path = os.path.join(self.result_dir, f'{job_id}.csv.gz')
+            partial_path = result_path + '.part'
+            
+            try:
+                with gzip.open(partial_path, 'wt', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(RESULT_COLUMNS)
+                    
+                    for set_index, parameters in enumerate(parameter_sets):
+                        with self.lock:
+                            job['progress']['current_parameter_set'] = set_index
+                        
+                        if not self._write_parameter_set(
+                            job_id, writer, set_index, self._calculator_for(calculator, parameters), targets
+                        ):
+                            break
+                
+                with self.lock:
+                    if job['status'] == 'cancelled':
+                        os.remove(partial_path)
+                        return
+                    os.replace(partial_path, result_path)
+                    job['status'] = 'completed'
+                    job['completed_at'] = datetime.utcnow().isoformat()
+                    job['result_file'] = result_path
+                    job['progress']['current_parameter_set'] = None
+            
+            except Exception as e:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                with self.lock:
+                    job['status'] = 'failed'
+                    job['completed_at'] = datetime.utcnow().isoformat()
+                    job['error'] = str(e)
+    
+    def _write_parameter_set(
+        self,
+        job_id: str,
+        writer,
+        set_index: int,
+        calculator: MultiTierRiskCalculator,
+        targets: Optional[List[Tuple[str, str]]]
+    ) -> bool:
+        """Assess all targets for one parameter set; returns False if the job was cancelled"""
+        network = calculator.get_supply_network()
+        direct = network.direct[:network.node_count]
+        indirect = network.baseline_indirect()
+        total = network.total_risk(indirect)
+        
+        if targets is None:
+            positions = list(range(network.node_count))
+        else:
+            positions = [network.node_position(country, sector) for country, sector in targets]
+        
+        with self.lock:
+            progress = self.jobs[job_id]['progress']
+            if progress['total'] is None:
+                progress['total'] = len(positions) * len(self.jobs[job_id]['parameter_sets'])
+        
+        for offset in range(0, len(positions), BULK_JOB_CHUNK_SIZE):
+            if self._is_cancelled(job_id):
+                return False
+            
+            chunk = positions[offset:offset + BULK_JOB_CHUNK_SIZE]
+            rows = [
+                [set_index, *network.nodes[i]] + direct[i].tolist() + indirect[i].tolist() + total[i].tolist()
+                for i in chunk if i is not None and network.valid[i]
+            ]
+            writer.writerows(rows)
+            
+            with self.lock:
+                progress['processed'] += len(chunk)
+                progress['written'] += len(rows)
+                progress['skipped'] += len(chunk) - len(rows)
+        
+        return True
+    
+    def get_job_status(self, job_id: str) -> Optional[Dict]:
+        """Get status of a specific job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job, progress=dict(job['progress'])) if job else None
+    
+    def get_all_jobs(self) -> Dict:
+        """Get status of all jobs"""
+        with self.lock:
+            return {
+                'jobs': [dict(job, progress=dict(job['progress'])) for job in self.jobs.values()]
+            }
+    
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a queued or running job (the worker stops at its next chunk)"""
+        with self.lock:
+            if job_id in self.jobs and self.jobs[job_id]['status'] in ('queued', 'running'):
+                self.jobs[job_id]['status'] = 'cancelled'
+                self.jobs[job_id]['completed_at'] = datetime.utcnow().isoformat()
+                return True
+            return False
+
+
+# Global job manager instance
+_bulk_job_manager = None
+
+def get_bulk_job_manager() -> BulkJobManager:
+    """Get or create global bulk job manager instance"""
+    global _bulk_job_manager
+    if _bulk_job_manager is None:
+        _bulk_job_manager = BulkJobManager()
+    return _bulk_job_manager
@@ -5,7 +5,7 @@ Uses threading to run cache population in the background while returning immedia
 """
 import threading
 import time
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
 
 
@@ -17,13 +17,21 @@ class CacheJobManager:
         self.current_job_id: Optional[str] = None
         self.lock = threading.Lock()
     
-    def start_job(self, job_id: str, country_list: list, force_refresh: bool = False) -> Dict:
+    def start_job(
+        self,
+        job_id: str,
+        country_list: list,
+        force_refresh: bool = False,
+        on_complete: Optional[Callable[[List[str]], Dict]] = None
+    ) -> Dict:
         """Start a cache refresh job in the background
         
         Args:
             job_id: Unique identifier for the job
             country_list: List of country names to process
             force_refresh: If True, refresh all countries even if cached
+            on_complete: Called with the countries whose data changed; its
+                         report is stored in the job results as 'incremental'
         
         Returns:
             Job status dictionary
@@ -60,19 +68,21 @@ class CacheJobManager:
             # Start background thread
             thread = threading.Thread(
                 target=self._run_cache_refresh,
-                args=(job_id, country_list, force_refresh),
+                args=(job_id, country_list, force_refresh, on_complete),
                 daemon=True
             )
             thread.start()
             
             return self.jobs[job_id]
     
-    def _run_cache_refresh(self, job_id: str, country_list: list, force_refresh: bool):
+    def _run_cache_refresh(self, job_id: str, country_list: list, force_refresh: bool, on_complete=None):
         """Run cache refresh in background thread"""
         from expected_loss_cache import get_cache
         
         try:
             cache = get_cache()
+            previous = dict(cache.cache)
+            changed_countries = []
             
             # Clear cache if force refresh
             if force_refresh:
@@ -93,6 +103,9 @@ class CacheJobManager:
                 # Fetch and cache
                 result = cache.populate_country(country_name)
                 
+                if result == 'success' and cache.cache.get(country_name) != previous.get(country_name):
+                    changed_countries.append(country_name)
+                
                 with self.lock:
                     if result == 'success':
                         self.jobs[job_id]['progress']['success'] += 1
@@ -104,6 +117,9 @@ class CacheJobManager:
             # Save cache
             cache.save_cache()
             
+            # Invalidate only what depends on the countries that changed
+            incremental = on_complete(changed_countries) if on_complete and changed_countries else None
+            
             # Mark job as completed
             with self.lock:
                 self.jobs[job_id]['status'] = 'completed'
@@ -112,7 +128,9 @@ class CacheJobManager:
                     'total': self.jobs[job_id]['progress']['total'],
                     'success': self.jobs[job_id]['progress']['success'],
                     'failed': self.jobs[job_id]['progress']['failed'],
-                    'skipped': self.jobs[job_id]['progress']['skipped']
+                    'skipped': self.jobs[job_id]['progress']['skipped'],
+                    'changed_countries': changed_countries,
+                    'incremental': incremental
                 }
                 self.jobs[job_id]['progress']['current_country'] = None
                 
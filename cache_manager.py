@@ -2,95 +2,399 @@
 Cache Manager for Supply Chain Risk API
 
 Implements in-memory LRU caching to optimize performance of:
-- Risk assessments (multi-tier calculations)
+- Risk assessments (multi-tier calculations), bounded by entries, bytes and TTL,
+  backed by a persistent cache shared across workers (shared_cache)
+- Supplier subtree results shared across assessments
+- Coalescing of concurrent identical assessments (single flight)
 - Coefficient lookups
 - Supplier queries
 
 Target: Reduce assessment time from 2-5s to <500ms for cached results
 """
 
+from collections import Counter, OrderedDict
 from functools import lru_cache, wraps
 from typing import Dict, Any, Tuple, Optional
 import hashlib
 import json
+import os
+import threading
 import time
 
-# Cache statistics
-cache_stats = {
-    'hits': 0,
-    'misses': 0,
-    'total_requests': 0,
-    'cache_size': 0
-}
-
-# In-memory cache for risk assessments
-# Key: (country, sector, model) -> Value: assessment result
-assessment_cache: Dict[str, Tuple[Any, float]] = {}
+from shared_cache import SharedCacheBackend, create_shared_backend
 
 # Cache TTL (time-to-live) in seconds
 ASSESSMENT_CACHE_TTL = 3600  # 1 hour
 MAX_CACHE_SIZE = 1000  # Maximum number of cached assessments
+MAX_CACHE_BYTES = int(os.environ.get('ASSESSMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Approximate bound
+# Persistent tier shared across workers: sqlite:path, redis://host:port/db or 'none'
+# (default: Heroku's REDIS_URL if set, else a SQLite file in the working directory)
+ASSESSMENT_CACHE_BACKEND = os.environ.get(
+    'ASSESSMENT_CACHE_BACKEND', os.environ.get('REDIS_URL') or 'sqlite:assessment_cache.db'
+)
+# Keys carry the data version (see get_cache_key), so the shared tier can keep entries longer
+SHARED_CACHE_TTL = int(os.environ.get('SHARED_CACHE_TTL', 24 * 3600))
+SHARED_CACHE_SYNC_INTERVAL = 1.0  # Seconds between counter flushes / invalidation checks per worker
+MAX_SUBTREE_CACHE_SIZE = 50000  # Maximum number of cached supplier subtrees (~30 MB)
+
+
+def get_cache_key(country: str, sector: str, model: str, variant: str = '', version: str = '') -> str:
+    """Generate cache key for assessment
+    
+    `variant` distinguishes assessments of the same node computed with
+    different options (e.g. with and without Climate API data). `version`
+    identifies the inputs they were computed from (calculator.cache_version():
+    model name and version, methodology parameters, risk-score data hash), so
+    an entry is never read after any of them changes, including across restarts.
+    """
+    key = f"{model}@{version}:{country}:{sector}" if version else f"{model}:{country}:{sector}"
+    if variant:
+        key = f"{key}:{variant}"
+    return key
 
 
-def get_cache_key(country: str, sector: str, model: str) -> str:
-    """Generate cache key for assessment"""
-    return f"{model}:{country}:{sector}"
+def estimate_size(result: Any) -> int:
+    """Approximate size of a cached result in bytes (its JSON length)"""
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(repr(result))
 
 
-def get_assessment_from_cache(country: str, sector: str, model: str) -> Optional[Any]:
+class AssessmentCache:
     """
-    Retrieve assessment from cache if available and not expired
+    Thread-safe LRU cache of assessment results with a TTL and a byte bound.
     
-    Returns:
-        Assessment result if found and valid, None otherwise
+    Entries live in an OrderedDict in recency order, so get, put and evict
+    are O(1). Expiry is checked when an entry is read. Besides the entry
+    count, the total approximate size of the results (see estimate_size) is
+    bounded, since one assessment with supplier details can be 20x another.
+    
+    With a shared backend (see shared_cache), this in-process cache is the
+    first tier: misses fall through to the backend, and puts and
+    invalidations are written to both. Backend entries live for shared_ttl
+    and survive restarts. Hit/miss counts are added to the
+    backend's counters (at most every SHARED_CACHE_SYNC_INTERVAL seconds), so
+    statistics cover all workers. At each sync the backend's invalidation
+    generation is read; if another worker invalidated entries since, the
+    in-process tier is dropped.
     """
-    global cache_stats
     
-    cache_key = get_cache_key(country, sector, model)
-    cache_stats['total_requests'] += 1
+    def __init__(
+        self,
+        max_size: int = MAX_CACHE_SIZE,
+        max_bytes: int = MAX_CACHE_BYTES,
+        ttl: float = ASSESSMENT_CACHE_TTL,
+        shared: Optional[SharedCacheBackend] = None,
+        shared_ttl: float = SHARED_CACHE_TTL
+    ):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()  # result, expiry, bytes
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.last_shared_error = None
+        self._pending = Counter()  # Counter deltas not yet added to the backend
+        self._next_sync = 0.0
+        self._generation = None
+        self._shared_counters: Dict[str, int] = {}
+        self._sync_shared(force=True)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached result (marking it recently used), or None if missing or expired"""
+        self._sync_shared()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count('hits')
+                return entry[0]
+            if self.shared is None:
+                self._count('misses')
+                return None
+        
+        value = self._shared_call(self.shared.get, key)
+        if value is not None:
+            expires_at, result = json.loads(value)
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                with self._lock:
+                    self._store(key, result, time.monotonic() + min(remaining, self.ttl), len(value))
+                    self._count('hits', 'shared_hits')
+                return result
+        with self._lock:
+            self._count('misses')
+        return None
+    
+    def put(self, key: str, result: Any):
+        """Store a result, evicting least recently used entries beyond the size and byte bounds"""
+        if self.shared is None:
+            with self._lock:
+                self._store(key, result, time.monotonic() + self.ttl, estimate_size(result))
+            return
+        
+        value = json.dumps([time.time() + self.shared_ttl, result], default=str)
+        with self._lock:
+            self._store(key, result, time.monotonic() + self.ttl, len(value))
+        self._shared_call(self.shared.put, key, value, self.shared_ttl)
+    
+    def _count(self, *names: str):
+        """Increment hit/miss counters (caller holds the lock)"""
+        for name in names:
+            setattr(self, name, getattr(self, name) + 1)
+            if self.shared is not None:
+                self._pending[name] += 1
+    
+    def _store(self, key: str, result: Any, expiry: float, size: int):
+        """Insert one entry and evict beyond the bounds (caller holds the lock)"""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (result, expiry, size)
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.max_size or self.bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+    
+    def _remove(self, key: str):
+        """Drop one entry (caller holds the lock)"""
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+    
+    def _shared_call(self, method, *args):
+        """Call a backend method; errors are counted, never raised (the backend is only a cache)"""
+        try:
+            return method(*args)
+        except Exception as e:
+            with self._lock:
+                self.shared_errors += 1
+                self.last_shared_error = str(e)
+            return None
+    
+    def _sync_shared(self, force: bool = False):
+        """Add pending counts to the backend and drop this tier if entries were invalidated elsewhere"""
+        if self.shared is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            self._next_sync = now + SHARED_CACHE_SYNC_INTERVAL
+            pending, self._pending = self._pending, Counter()
+        
+        if pending:
+            self._shared_call(self.shared.add_counters, dict(pending))
+        counters = self._shared_call(self.shared.counters)
+        if counters is None:
+            return
+        with self._lock:
+            generation = counters.get('generation', 0)
+            if generation != self._generation:  # Also if unknown so far (backend unreachable at start)
+                self._entries.clear()
+                self.bytes = 0
+            self._generation = generation
+            self._shared_counters = counters
+    
+    def _bump_generation(self):
+        """Signal an invalidation to the other workers"""
+        self._shared_call(self.shared.add_counters, {'generation': 1})
+        counters = self._shared_call(self.shared.counters)
+        with self._lock:
+            # If no other worker invalidated meanwhile, this tier is already up to date
+            if counters is not None and self._generation is not None:
+                if counters.get('generation', 0) == self._generation + 1:
+                    self._generation += 1
     
-    if cache_key in assessment_cache:
-        result, timestamp = assessment_cache[cache_key]
+    def invalidate(self, predicate, prefix: str = '') -> int:
+        """
+        Drop the entries whose key matches predicate(key); returns the number removed
         
-        # Check if cache entry is still valid
-        if time.time() - timestamp < ASSESSMENT_CACHE_TTL:
-            cache_stats['hits'] += 1
-            return result
-        else:
-            # Remove expired entry
-            del assessment_cache[cache_key]
+        `prefix` narrows the keys read from a shared backend (all its keys starting with it).
+        """
+        with self._lock:
+            stale = {key for key in self._entries if predicate(key)}
+            for key in stale:
+                self._remove(key)
+        if self.shared is not None:
+            shared_stale = [key for key in self._shared_call(self.shared.keys, prefix) or [] if predicate(key)]
+            self._shared_call(self.shared.delete, shared_stale)
+            self._bump_generation()
+            stale.update(shared_stale)
+        return len(stale)
     
-    cache_stats['misses'] += 1
-    return None
+    def rekey(self, rename) -> int:
+        """
+        Move in-process entries to rename(key) where that is not None; returns the number moved
+        
+        Recency order is kept. The shared backend is not touched.
+        """
+        with self._lock:
+            entries = OrderedDict()
+            moved = 0
+            for key, entry in self._entries.items():
+                new_key = rename(key)
+                if new_key is not None:
+                    key = new_key
+                    moved += 1
+                if key in entries:
+                    self.bytes -= entries.pop(key)[2]
+                entries[key] = entry
+            self._entries = entries
+            return moved
+    
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+        if self.shared is not None:
+            self._shared_call(self.shared.clear)
+            self._bump_generation()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get assessment cache statistics (of this process, plus all workers if shared)"""
+        self._sync_shared(force=True)
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'total_requests': total,
+                'hit_rate_percent': round(self.hits / total * 100, 2) if total > 0 else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'cache_size': len(self._entries),
+                'max_cache_size': self.max_size,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl
+            }
+            if self.shared is None:
+                return stats
+            
+            counters = self._shared_counters
+            shared_total = counters.get('hits', 0) + counters.get('misses', 0)
+            stats['shared_hits'] = self.shared_hits
+            stats['shared'] = {
+                'backend': self.shared.name,
+                'ttl_seconds': self.shared_ttl,
+                'hits': counters.get('hits', 0),
+                'misses': counters.get('misses', 0),
+                'shared_hits': counters.get('shared_hits', 0),
+                'total_requests': shared_total,
+                'hit_rate_percent': (
+                    round(counters.get('hits', 0) / shared_total * 100, 2) if shared_total > 0 else 0
+                ),
+                'generation': counters.get('generation', 0),
+                'errors': self.shared_errors,
+                'last_error': self.last_shared_error
+            }
+        stats['shared']['entries'] = self._shared_call(self.shared.entry_count)
+        return stats
+
+
+# Global assessment cache shared by all request threads in this process
+_assessment_cache = None
+
+def get_assessment_cache() -> AssessmentCache:
+    """Get or create the global assessment cache"""
+    global _assessment_cache
+    if _assessment_cache is None:
+        try:
+            shared = create_shared_backend(ASSESSMENT_CACHE_BACKEND)
+        except Exception as e:
+            # The shared tier is only a cache: a bad URL or unreachable file must not fail requests
+            print(f"[AssessmentCache] Shared backend unavailable, using the in-process tier only: {e}")
+            shared = None
+        _assessment_cache = AssessmentCache(shared=shared)
+    return _assessment_cache
+
+
+def get_assessment_from_cache(
+    country: str, sector: str, model: str, variant: str = '', version: str = ''
+) -> Optional[Any]:
+    """
+    Retrieve assessment from cache if available and not expired
+    
+    Returns:
+        Assessment result if found and valid, None otherwise
+    """
+    return get_assessment_cache().get(get_cache_key(country, sector, model, variant, version))
 
 
-def save_assessment_to_cache(country: str, sector: str, model: str, result: Any):
+def save_assessment_to_cache(
+    country: str, sector: str, model: str, result: Any, variant: str = '', version: str = ''
+):
     """
     Save assessment result to cache
     
-    Implements LRU eviction if cache is full
+    Evicts least recently used entries if the cache is full
+    """
+    get_assessment_cache().put(get_cache_key(country, sector, model, variant, version), result)
+
+
+def clear_cache():
+    """Clear all cached assessments"""
+    get_assessment_cache().clear()
+
+
+def invalidate_assessments(model: str, nodes, variants=None) -> int:
     """
-    global cache_stats
+    Remove cached assessments of some country-sectors (of every data version)
+    
+    Args:
+        model: Model key (e.g. 'oecd')
+        nodes: Iterable of (country, sector)
+        variants: Only these cache variants (default: all)
     
-    cache_key = get_cache_key(country, sector, model)
+    Returns:
+        Number of removed entries
+    """
+    targets = {f"{country}:{sector}" for country, sector in nodes}
     
-    # If cache is full, remove oldest entry (simple FIFO for now)
-    if len(assessment_cache) >= MAX_CACHE_SIZE:
-        # Find and remove oldest entry
-        oldest_key = min(assessment_cache.keys(), 
-                        key=lambda k: assessment_cache[k][1])
-        del assessment_cache[oldest_key]
+    def stale(cache_key: str) -> bool:
+        parts = cache_key.split(':', 3)
+        if parts[0].split('@', 1)[0] != model or f"{parts[1]}:{parts[2]}" not in targets:
+            return False
+        return variants is None or (parts[3] if len(parts) > 3 else '') in variants
     
-    # Save to cache with current timestamp
-    assessment_cache[cache_key] = (result, time.time())
-    cache_stats['cache_size'] = len(assessment_cache)
+    return get_assessment_cache().invalidate(stale, prefix=model)
 
 
-def clear_cache():
-    """Clear all cached assessments"""
-    global cache_stats
-    assessment_cache.clear()
-    cache_stats['cache_size'] = 0
+def carry_forward_assessments(model: str, old_version: str, new_version: str) -> int:
+    """
+    Re-key a model's in-process assessments from one data version to the next
+    
+    For use after an incremental refresh has invalidated every entry the
+    change affects: the remaining ones are still valid under the new version.
+    
+    Returns:
+        Number of entries moved
+    """
+    if old_version == new_version:
+        return 0
+    old_prefix, new_prefix = f"{model}@{old_version}:", f"{model}@{new_version}:"
+    
+    def rename(cache_key: str) -> Optional[str]:
+        return new_prefix + cache_key[len(old_prefix):] if cache_key.startswith(old_prefix) else None
+    
+    return get_assessment_cache().rekey(rename)
 
 
 def get_cache_stats() -> Dict[str, Any]:
@@ -100,18 +404,166 @@ def get_cache_stats() -> Dict[str, Any]:
     Returns:
         Dictionary with cache performance metrics
     """
-    total = cache_stats['total_requests']
-    hit_rate = (cache_stats['hits'] / total * 100) if total > 0 else 0
+    return get_assessment_cache().get_stats()
+
+
+class SubtreeCache:
+    """
+    Process-wide LRU cache of supplier subtree results.
+    
+    Different targets share large parts of their upstream trees (e.g. every
+    electronics target reaches CHN/KOR/TWN C26 at tier 2), so the indirect
+    risk of a supplier subtree is cached by
+    (model, node, tier, remaining depth, parameter set, excluded ancestors)
+    and reused across requests.
+    """
+    
+    def __init__(self, max_size: int = MAX_SUBTREE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple, Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, float]]:
+        """Return a cached subtree result (marking it recently used), or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+    
+    def put(self, key: Tuple, result: Dict[str, float]):
+        """Store a subtree result, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate_nodes(self, model_name: str, node_ids) -> int:
+        """Drop the cached subtrees of some nodes of a model; returns the number removed"""
+        node_ids = set(node_ids)
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model_name and key[2] in node_ids]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+    
+    def clear(self):
+        """Drop all cached subtrees (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get subtree cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate_percent': round(self.hits / total * 100, 2) if total > 0 else 0,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+
+# Global subtree cache shared by all calculators in this process
+_subtree_cache = None
+
+def get_subtree_cache() -> SubtreeCache:
+    """Get or create the global subtree cache"""
+    global _subtree_cache
+    if _subtree_cache is None:
+        _subtree_cache = SubtreeCache(MAX_SUBTREE_CACHE_SIZE)
+    return _subtree_cache
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key.
+    
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it runs (followers) wait for it and share its result, or its
+    exception. On a cold cache, a dashboard requesting the same node from many
+    clients at once then runs the assessment once instead of once per client.
+    The leader's function should store its result in the cache, so callers
+    arriving after it finished are cache hits.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        self.max_followers = 0  # Most callers that shared one call
     
-    return {
-        'hits': cache_stats['hits'],
-        'misses': cache_stats['misses'],
-        'total_requests': total,
-        'hit_rate_percent': round(hit_rate, 2),
-        'cache_size': cache_stats['cache_size'],
-        'max_cache_size': MAX_CACHE_SIZE,
-        'ttl_seconds': ASSESSMENT_CACHE_TTL
-    }
+    def do(self, key, fn) -> Tuple[Any, bool]:
+        """
+        Run fn() once for all concurrent callers with this key.
+        
+        Returns:
+            Tuple of (result, whether it was shared from another caller's call)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'followers': 0, 'result': None, 'error': None}
+                self.leaders += 1
+            else:
+                call['followers'] += 1
+                self.followers += 1
+        
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        
+        try:
+            call['result'] = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.errors += call['error'] is not None
+                self.max_followers = max(self.max_followers, call['followers'])
+            call['done'].set()
+        return call['result'], False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                'computations': self.leaders,
+                'coalesced_requests': self.followers,
+                'coalesced_percent': round(self.followers / total * 100, 2) if total > 0 else 0,
+                'max_coalesced_per_computation': self.max_followers,
+                'failed_computations': self.errors,
+                'in_flight': len(self._calls)
+            }
+
+
+# Global coalescer of concurrent identical assessments in this process
+_assessment_flights = None
+
+def get_assessment_flights() -> SingleFlight:
+    """Get or create the global assessment coalescer"""
+    global _assessment_flights
+    if _assessment_flights is None:
+        _assessment_flights = SingleFlight()
+    return _assessment_flights
 
 
 # Decorator for caching coefficient lookups
@@ -180,7 +632,7 @@ def warm_cache(model, common_assessments):
         except Exception as e:
             print(f"Failed to warm cache for {country} {sector}: {e}")
     
-    print(f"Cache warmed. Size: {len(assessment_cache)}")
+    print(f"Cache warmed. Size: {len(get_assessment_cache())}")
 
 
 # Common country-sector pairs for cache warming
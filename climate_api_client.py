@@ -46,3 +46,7 @@ class ClimateRiskAPIClient:
         except Exception as e:
             print(f"Climate API error for {country_identifier}: {str(e)}")
             return {"error": "exception", "message": str(e)}
+    
+    def get_cached_country_risk(self, country_identifier: str) -> Optional[Dict]:
+        """Get climate risk data only if already fetched (never calls the API)"""
+        return self.cache.get(country_identifier)
@@ -0,0 +1,54 @@
+"""
+Shared pytest fixtures.
+
+The real OECD ICIO coefficient matrix is downloaded at deploy time and is not
+part of the repository, so tests run against a small synthetic matrix with
+real country and sector codes (written in the same gzip CSV format).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_manager
+import watchlist_manager
+from oecd_icio_model import OECDICIOModel
+
+SYNTHETIC_COUNTRIES = ['USA', 'CHN', 'DEU', 'JPN', 'KOR', 'MEX', 'CN1', 'AGO', 'VNM', 'THA', 'IND', 'BRA']
+SYNTHETIC_SECTORS = ['A01', 'B07', 'C10T12', 'C26', 'C27', 'C29', 'G', 'K', 'HFCE']
+
+
+def write_synthetic_coefficients(data_path, seed: int = 0, countries=SYNTHETIC_COUNTRIES):
+    """Write a random sparse A matrix as oecd_icio_coefficients_full.csv.gz"""
+    rng = np.random.default_rng(seed)
+    labels = [f"{c}_{s}" for c in countries for s in SYNTHETIC_SECTORS]
+    n = len(labels)
+    
+    coefficients = rng.random((n, n)) ** 6 * 0.05
+    coefficients[rng.random((n, n)) < 0.5] = 0.0
+    np.fill_diagonal(coefficients, rng.random(n) * 0.2)  # Strong self-supply, as in real tables
+    
+    df = pd.DataFrame(coefficients, index=labels, columns=labels)
+    df.index.name = 'V1'
+    df.to_csv(data_path / 'oecd_icio_coefficients_full.csv.gz', compression='gzip')
+
+
+@pytest.fixture(scope='session')
+def synthetic_model(tmp_path_factory):
+    """OECD ICIO model backed by the synthetic coefficient matrix"""
+    data_path = tmp_path_factory.mktemp('icio')
+    write_synthetic_coefficients(data_path)
+    return OECDICIOModel(data_path=data_path)
+
+
+@pytest.fixture(autouse=True)
+def in_process_assessment_cache(monkeypatch):
+    """Each test gets an empty assessment cache without the on-disk tier"""
+    monkeypatch.setattr(cache_manager, '_assessment_cache', cache_manager.AssessmentCache())
+
+
+@pytest.fixture(autouse=True)
+def isolated_watchlists(tmp_path, monkeypatch):
+    """Refreshes evaluate an empty watchlist store under tmp_path, never ./watchlists.json"""
+    store = str(tmp_path / 'watchlists.json')
+    monkeypatch.setattr(watchlist_manager, '_watchlist_manager', watchlist_manager.WatchlistManager(store_file=store))
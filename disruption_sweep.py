@@ -0,0 +1,122 @@
+"""
+Country Disruption Sweep (hypothetical extraction)
+
+Answers "how much does risk change across all buyers if country X's exports
+are removed or shocked". The supplier coefficients of every node of X are
+scaled (factor 0 removes them), buyers' supplier weights are renormalised and
+indirect/total risk is recomputed for all nodes in one vectorized propagation
+over the SupplyNetwork. Multi-country sweeps can be spread over a process pool
+with parallel_backend.
+
+Only the indexed top suppliers of each buyer are reweighted; suppliers outside
+a buyer's top list do not move in to replace the removed ones.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from risk_calculator_v2 import RISK_TYPES
+from supply_network import SupplyNetwork
+
+# Changes smaller than this are rounding noise (scores are rounded to 2 decimals)
+CHANGE_THRESHOLD = 0.005
+
+
+def _scores(values) -> Dict:
+    return {risk_type: round(float(values[r]), 4) for r, risk_type in enumerate(RISK_TYPES)}
+
+
+def country_disruption_impact(
+    network: SupplyNetwork,
+    country: str,
+    factor: float = 0.0,
+    top_n: int = 20,
+    rank_by: str = 'total'
+) -> Dict:
+    """
+    Impact of scaling one country's exports on every node of the network.
+    
+    Args:
+        network: Baseline SupplyNetwork
+        country: Country code whose supplier coefficients are shocked
+                 (firm splits such as CN1/CN2 are included with their parent)
+        factor: Multiplier for the country's coefficients (0 = removed)
+        top_n: Number of most affected nodes to return
+        rank_by: 'total' (mean absolute change over risk types) or a risk type
+    
+    Returns:
+        Dictionary with aggregate changes and the most affected nodes
+    """
+    n = network.node_count
+    shocked = network.country_mask(country)
+    if not shocked.any():
+        return {'error': f"Country '{country}' not found in network", 'country': country}
+    
+    # Exposure: share of each buyer's indexed supplier weight coming from the country
+    padded = np.append(shocked, False)
+    exposure = (network.weights * padded[network.suppliers]).sum(axis=1)
+    
+    scale = np.where(shocked, factor, 1.0)
+    before = network.total_risk()
+    after = network.total_risk(network.reweighted(scale).propagate())
+    change = after - before
+    
+    # Buyers: nodes with risk data, excluding the extracted country itself
+    buyers = network.valid[:n].copy()
+    if factor == 0.0:
+        buyers &= ~shocked
+    
+    if rank_by == 'total':
+        score = np.abs(change).mean(axis=1)
+    else:
+        score = np.abs(change[:, RISK_TYPES.index(rank_by)])
+    score = np.where(buyers, score, -1.0)
+    affected = buyers & (np.abs(change) >= CHANGE_THRESHOLD).any(axis=1)
+    
+    ranked = np.argsort(-score, kind='stable')[:top_n]
+    most_affected = [
+        {
+            'country': network.nodes[i][0],
+            'sector': network.nodes[i][1],
+            'exposure': round(float(exposure[i]), 4),
+            'total_risk_before': _scores(before[i]),
+            'total_risk_after': _scores(after[i]),
+            'change': _scores(change[i]),
+            'change_score': round(float(score[i]), 4)
+        }
+        for i in ranked if score[i] > 0
+    ]
+    
+    return {
+        'country': country,
+        'factor': factor,
+        'buyers_evaluated': int(buyers.sum()),
+        'affected_nodes': int(affected.sum()),
+        'exposed_nodes': int((buyers & (exposure > 0)).sum()),
+        'mean_exposure': round(float(exposure[buyers].mean()), 4) if buyers.any() else 0.0,
+        'total_risk_change': {
+            'sum': _scores(change[buyers].sum(axis=0)),
+            'mean': _scores(change[buyers].mean(axis=0)) if buyers.any() else _scores(np.zeros(len(RISK_TYPES))),
+            'max_increase': _scores(change[buyers].max(axis=0)) if buyers.any() else _scores(np.zeros(len(RISK_TYPES))),
+            'max_decrease': _scores(change[buyers].min(axis=0)) if buyers.any() else _scores(np.zeros(len(RISK_TYPES)))
+        },
+        'most_affected': most_affected
+    }
+
+
+def sweep_country_disruptions(
+    network: SupplyNetwork,
+    countries: List[str],
+    factor: float = 0.0,
+    top_n: int = 20,
+    rank_by: str = 'total'
+) -> List[Dict]:
+    """
+    Run country_disruption_impact for several countries in this process
+    (see parallel_backend.ProcessPoolBackend for the multi-process version).
+    
+    Returns:
+        One impact dictionary per country, in input order
+    """
+    return [country_disruption_impact(network, country, factor, top_n, rank_by) for country in countries]
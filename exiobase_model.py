@@ -7,9 +7,13 @@ This module implements the IOModel interface for EXIOBASE 3 data.
 from typing import List, Optional
 import os
 from pathlib import Path
-from io_model_base import IOModel, Country, Sector, Supplier
+import numpy as np
+from io_model_base import IOModel, Country, Sector, Supplier, Customer, CustomerIndex
 from exiobase_data import EXIOBASE_COUNTRIES, EXIOBASE_SECTORS, EXIOBASE_TO_OECD_MAPPING
 
+# Size of the cached customer index; larger get_customers() queries scan the coefficients
+CUSTOMER_INDEX_TOP_N = 50
+
 
 class EXIOBASEModel(IOModel):
     """
@@ -33,6 +37,7 @@ class EXIOBASEModel(IOModel):
         self._countries_cache = None
         self._sectors_cache = None
         self._coefficients = None  # Lazy load
+        self._customer_index = None  # Built on first get_customers()
         self._load_data()
     
     def _load_data(self):
@@ -166,6 +171,97 @@ class EXIOBASEModel(IOModel):
         suppliers.sort(key=lambda s: s.coefficient, reverse=True)
         return suppliers[:top_n]
     
+    def get_customers(
+        self,
+        country: str,
+        sector: str,
+        top_n: int = 10,
+        min_coefficient: float = 0.0
+    ) -> List[Customer]:
+        """
+        Get top customers (buyers) of a country-sector from EXIOBASE data.
+        
+        Served in O(K) from the cached customer index when top_n is within
+        CUSTOMER_INDEX_TOP_N, else by scanning the coefficients.
+        Returns customers sorted by coefficient (descending).
+        """
+        if top_n <= CUSTOMER_INDEX_TOP_N and min_coefficient >= 0:
+            if self._customer_index is None:
+                self._customer_index = self.get_customer_index(top_n=CUSTOMER_INDEX_TOP_N)
+            customers = self._customer_index.lookup(country, sector, top_n, min_coefficient)
+        else:
+            customers = self._scan_customers(country, sector, top_n, min_coefficient)
+        
+        result = []
+        for (customer_country, customer_sector), coef in customers:
+            country_obj = self.get_country(customer_country)
+            sector_obj = self.get_sector(customer_sector)
+            result.append(Customer(
+                country=customer_country,
+                country_name=country_obj.name if country_obj else customer_country,
+                sector=customer_sector,
+                sector_name=sector_obj.name if sector_obj else customer_sector,
+                coefficient=coef
+            ))
+        return result
+    
+    def _scan_customers(self, country: str, sector: str, top_n: int, min_coefficient: float) -> List:
+        """Top customers of a country-sector found by scanning all coefficients"""
+        # Lazy load coefficients
+        if self._coefficients is None:
+            self._coefficients = self._load_coefficients()
+        
+        customers = []
+        
+        # Find all coefficients where from_country and from_sector match
+        for key, coef in self._coefficients.items():
+            parts = key.split('_')
+            if len(parts) == 4:
+                from_c, from_s, to_c, to_s = parts
+                if from_c == country and from_s == sector and coef > min_coefficient:
+                    customers.append(((to_c, to_s), coef))
+        
+        # Sort by coefficient (descending) and return top N
+        customers.sort(key=lambda c: c[1], reverse=True)
+        return customers[:top_n]
+    
+    def get_customer_index(self, top_n: int = 20, min_coefficient: float = 0.0) -> CustomerIndex:
+        """
+        Build top-N customer lists for all country-sectors in one pass.
+        
+        Groups the coefficients by supplying node instead of scanning them
+        once per node. Nodes referenced only by coefficients are appended
+        after the country x sector grid.
+        """
+        # Lazy load coefficients
+        if self._coefficients is None:
+            self._coefficients = self._load_coefficients()
+        
+        nodes = [(c.code, s.code) for c in self.get_countries() for s in self.get_sectors()]
+        positions = {node: i for i, node in enumerate(nodes)}
+        customer_lists = {}
+        
+        for key, coef in self._coefficients.items():
+            parts = key.split('_')
+            if len(parts) == 4 and coef > min_coefficient:
+                from_c, from_s, to_c, to_s = parts
+                for node in ((from_c, from_s), (to_c, to_s)):
+                    if node not in positions:
+                        positions[node] = len(nodes)
+                        nodes.append(node)
+                customer_lists.setdefault(positions[(from_c, from_s)], []).append((positions[(to_c, to_s)], coef))
+        
+        customer_positions = np.full((len(nodes), top_n), -1, dtype=np.int32)
+        coefficients = np.zeros((len(nodes), top_n), dtype=np.float64)
+        for i, row in customer_lists.items():
+            # Stable sort keeps ties in coefficient order, as _scan_customers() does
+            row.sort(key=lambda c: c[1], reverse=True)
+            for k, (position, coefficient) in enumerate(row[:top_n]):
+                customer_positions[i, k] = position
+                coefficients[i, k] = coefficient
+        
+        return CustomerIndex(nodes, customer_positions, coefficients, top_n, min_coefficient)
+    
     def has_environmental_data(self) -> bool:
         """EXIOBASE includes comprehensive environmental satellite accounts"""
         return True
@@ -0,0 +1,147 @@
+"""
+Incremental Recomputation after Data Changes
+
+When one country's climate data is refreshed or some risk scores are revised,
+only the nodes whose result can depend on the change need new values. The
+reverse supplier index of the SupplyNetwork (buyer_index / dependents) walks
+downstream from the changed nodes to find that dirty set:
+
+- Risk score revisions change direct risk, which reaches every buyer up to
+  the tier depth. Those nodes are re-propagated (SupplyNetwork.updated), and
+  their cached assessments and supplier subtrees are invalidated, and
+  watchlists are notified of watched nodes among them that changed. The
+  in-process assessments of all other nodes are re-keyed to the new
+  risk-data version.
+- Climate data only feeds expected loss: a node's own country (direct) and
+  its tier-1 suppliers (supplier expected loss). Only the climate variants
+  of the cached assessments of those nodes are invalidated; scores are
+  unaffected.
+
+Everything else stays cached, instead of waiting for the TTL or clearing the
+whole cache.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from cache_manager import carry_forward_assessments, get_subtree_cache, invalidate_assessments
+from oecd_data_full import OECD_COUNTRIES, OECD_SECTORS
+from risk_calculator_v2 import MultiTierRiskCalculator
+from watchlist_manager import get_watchlist_manager
+
+# Assessment cache variants that include Climate API data (see app_v2._assessment_cache_variant)
+CLIMATE_VARIANTS = ('', 'split')
+
+
+def _invalidate(model_type: str, calculator: MultiTierRiskCalculator, positions, variants=None) -> Dict:
+    network = calculator.get_supply_network()
+    nodes = [network.nodes[i] for i in positions]
+    report = {'invalidated_assessments': invalidate_assessments(model_type, nodes, variants)}
+    if variants is None:
+        report['invalidated_subtrees'] = get_subtree_cache().invalidate_nodes(
+            calculator.io_model.name, [f"{country}_{sector}" for country, sector in nodes]
+        )
+    return report
+
+
+def apply_risk_score_update(
+    calculators: Dict[str, MultiTierRiskCalculator],
+    country_scores: Dict[str, Dict[str, float]],
+    sector_scores: Dict[str, Dict[str, float]]
+) -> Dict:
+    """
+    Revise risk scores in the risk data and recompute only what depends on them.
+    
+    Args:
+        calculators: Live calculators by model key
+        country_scores: {risk-data country code: {risk_type: score}}
+        sector_scores: {risk-data sector code: {risk_type: score}}
+    
+    Returns:
+        Report with the updated codes and, per model, the nodes touched
+    """
+    # Networks are built from the old data first, so the change can be diffed
+    versions = {}
+    for model_type, calculator in calculators.items():
+        calculator.get_supply_network()
+        versions[model_type] = calculator.cache_version()
+    
+    updated_countries = []
+    for country in OECD_COUNTRIES:
+        if country['code'] in country_scores:
+            country['risk_scores'].update(country_scores[country['code']])
+            updated_countries.append(country['code'])
+    updated_sectors = []
+    for sector in OECD_SECTORS:
+        if sector['code'] in sector_scores:
+            sector['risk_scores'].update(sector_scores[sector['code']])
+            updated_sectors.append(sector['code'])
+    
+    watchlists = get_watchlist_manager()
+    models = []
+    for model_type, calculator in calculators.items():
+        refreshed = calculator.refresh_direct_risk(updated_countries, updated_sectors)
+        report = {
+            'model': model_type,
+            'changed_nodes': len(refreshed['changed']),
+            'recomputed_nodes': len(refreshed['recomputed']),
+            'node_count': calculator.get_supply_network().node_count
+        }
+        report.update(_invalidate(model_type, calculator, refreshed['recomputed']))
+        # Cache keys include the risk-data hash; entries the change did not reach move to the new one
+        report['carried_forward_assessments'] = carry_forward_assessments(
+            model_type, versions[model_type], calculator.cache_version()
+        )
+        
+        # Watched nodes among the recomputed ones are compared with their baseline
+        notifications = watchlists.evaluate(model_type, calculator, refreshed['recomputed'])
+        watchlists.deliver_in_background(notifications)
+        report['watchlist_notifications'] = len(notifications)
+        models.append(report)
+    
+    return {
+        'updated_countries': updated_countries,
+        'updated_sectors': updated_sectors,
+        'unknown_countries': sorted(set(country_scores) - set(updated_countries)),
+        'unknown_sectors': sorted(set(sector_scores) - set(updated_sectors)),
+        'models': models
+    }
+
+
+def apply_climate_update(calculators: Dict[str, MultiTierRiskCalculator], country_names: List[str]) -> Dict:
+    """
+    Invalidate the cached climate assessments that depend on refreshed countries.
+    
+    Args:
+        calculators: Live calculators by model key
+        country_names: Countries whose Climate API data changed
+    
+    Returns:
+        Report with the nodes touched per model
+    """
+    from country_codes import get_country_code
+    
+    codes = set()
+    for name in country_names:
+        try:
+            codes.add(get_country_code(name))
+        except KeyError:
+            continue
+    
+    models = []
+    for model_type, calculator in calculators.items():
+        network = calculator.get_supply_network()
+        changed = np.flatnonzero(np.isin(network.home_countries, list(codes)))
+        # Expected loss reaches buyers through their tier-1 suppliers only
+        dirty = network.dependents(changed, tiers=1) if len(changed) else changed
+        report = {
+            'model': model_type,
+            'changed_nodes': len(changed),
+            'touched_nodes': len(dirty),
+            'node_count': network.node_count
+        }
+        report.update(_invalidate(model_type, calculator, dirty, CLIMATE_VARIANTS))
+        models.append(report)
+    
+    return {'countries': sorted(codes), 'models': models}
@@ -8,7 +8,8 @@ through a unified interface.
 
 from abc import ABC, abstractmethod
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import numpy as np
 
 
 @dataclass
@@ -60,6 +61,90 @@ class Supplier:
         }
 
 
+@dataclass
+class Customer:
+    """Represents a buyer (customer) of a country-sector's output"""
+    country: str
+    sector: str
+    coefficient: float  # Input from the supplier per unit of the customer's output
+    country_name: str = ""
+    sector_name: str = ""
+    
+    def to_dict(self) -> Dict:
+        return {
+            'country': self.country,
+            'sector': self.sector,
+            'coefficient': self.coefficient,
+            'country_name': self.country_name,
+            'sector_name': self.sector_name
+        }
+
+
+@dataclass
+class SupplierIndex:
+    """
+    Precomputed top-K supplier lists for every node of the model (column index).
+    
+    Row i of `suppliers`/`coefficients` holds the top suppliers of nodes[i] in
+    the same order get_suppliers() returns them; `suppliers` contains positions
+    into `nodes`, padded with -1 where a node has fewer than K suppliers.
+    """
+    nodes: List[Tuple[str, str]]  # (country, sector) per node
+    suppliers: np.ndarray  # (N, K) int32 node positions, -1 = padding
+    coefficients: np.ndarray  # (N, K) float64 coefficients, 0.0 = padding
+    top_n: int
+    min_coefficient: float
+    
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+
+@dataclass
+class CustomerIndex:
+    """
+    Precomputed top-K customer lists for every node of the model (row index).
+    
+    The counterpart of SupplierIndex: row i of `customers`/`coefficients` holds
+    the top buyers of nodes[i] in the same order get_customers() returns them,
+    as positions into `nodes` padded with -1.
+    """
+    nodes: List[Tuple[str, str]]  # (country, sector) per node
+    customers: np.ndarray  # (N, K) int32 node positions, -1 = padding
+    coefficients: np.ndarray  # (N, K) float64 coefficients, 0.0 = padding
+    top_n: int
+    min_coefficient: float
+    positions: Dict[Tuple[str, str], int] = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.positions = {node: i for i, node in enumerate(self.nodes)}
+    
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+    
+    def covers(self, top_n: int, min_coefficient: float) -> bool:
+        """Whether a get_customers() query can be answered from this index"""
+        return top_n <= self.top_n and min_coefficient >= self.min_coefficient
+    
+    def lookup(self, country: str, sector: str, top_n: int, min_coefficient: float) -> List[Tuple[Tuple[str, str], float]]:
+        """
+        Top customers of one node above min_coefficient, in O(K).
+        
+        Returns:
+            List of ((country, sector), coefficient), empty for unknown nodes
+        """
+        position = self.positions.get((country, sector))
+        if position is None:
+            return []
+        customers = []
+        for j, coefficient in zip(self.customers[position, :top_n], self.coefficients[position, :top_n]):
+            if j < 0 or coefficient <= min_coefficient:
+                break  # Rows are sorted, so the rest is below the threshold too
+            customers.append((self.nodes[j], float(coefficient)))
+        return customers
+
+
 class IOModel(ABC):
     """
     Abstract base class for Input-Output models.
@@ -179,6 +264,114 @@ class IOModel(ABC):
         """
         pass
     
+    def get_supplier_index(self, top_n: int = 20, min_coefficient: float = 0.0) -> SupplierIndex:
+        """
+        Build the top-N supplier lists for every country-sector at once.
+        
+        This default implementation calls get_suppliers() for every node;
+        models backed by a coefficient matrix should override it with a
+        vectorized version.
+        
+        Args:
+            top_n: Number of top suppliers per node
+            min_coefficient: Minimum coefficient threshold
+        
+        Returns:
+            SupplierIndex covering all nodes (and any supplier nodes they reference)
+        """
+        nodes = [(c.code, s.code) for c in self.get_countries() for s in self.get_sectors()]
+        positions = {node: i for i, node in enumerate(nodes)}
+        supplier_lists = []
+        
+        i = 0
+        while i < len(nodes):
+            country, sector = nodes[i]
+            suppliers = self.get_suppliers(country, sector, top_n=top_n, min_coefficient=min_coefficient)
+            row = []
+            for supplier in suppliers:
+                key = (supplier.country, supplier.sector)
+                if key not in positions:
+                    positions[key] = len(nodes)
+                    nodes.append(key)
+                row.append((positions[key], supplier.coefficient))
+            supplier_lists.append(row)
+            i += 1
+        
+        supplier_positions = np.full((len(nodes), top_n), -1, dtype=np.int32)
+        coefficients = np.zeros((len(nodes), top_n), dtype=np.float64)
+        for i, row in enumerate(supplier_lists):
+            for k, (position, coefficient) in enumerate(row):
+                supplier_positions[i, k] = position
+                coefficients[i, k] = coefficient
+        
+        return SupplierIndex(nodes, supplier_positions, coefficients, top_n, min_coefficient)
+    
+    @abstractmethod
+    def get_customers(
+        self,
+        country: str,
+        sector: str,
+        top_n: int = 10,
+        min_coefficient: float = 0.0
+    ) -> List[Customer]:
+        """
+        Get the top customers (buyers) of a specific country-sector.
+        
+        The reverse of get_suppliers(): every node whose input coefficient
+        from this country-sector exceeds min_coefficient.
+        
+        Args:
+            country: Country code
+            sector: Sector code
+            top_n: Number of top customers to return
+            min_coefficient: Minimum coefficient threshold
+        
+        Returns:
+            List of Customer objects, sorted by coefficient (descending)
+        """
+        pass
+    
+    def get_customer_index(self, top_n: int = 20, min_coefficient: float = 0.0) -> CustomerIndex:
+        """
+        Build the top-N customer lists for every country-sector at once.
+        
+        This default implementation calls get_customers() for every node;
+        models backed by a coefficient matrix should override it with a
+        vectorized version.
+        
+        Args:
+            top_n: Number of top customers per node
+            min_coefficient: Minimum coefficient threshold
+        
+        Returns:
+            CustomerIndex covering all nodes (and any customer nodes they reference)
+        """
+        nodes = [(c.code, s.code) for c in self.get_countries() for s in self.get_sectors()]
+        positions = {node: i for i, node in enumerate(nodes)}
+        customer_lists = []
+        
+        i = 0
+        while i < len(nodes):
+            country, sector = nodes[i]
+            row = []
+            for customer in self.get_customers(country, sector, top_n=top_n, min_coefficient=min_coefficient):
+                key = (customer.country, customer.sector)
+                if key not in positions:
+                    positions[key] = len(nodes)
+                    nodes.append(key)
+                row.append((positions[key], customer.coefficient))
+            customer_lists.append(row)
+            i += 1
+        
+        customer_positions = np.full((len(nodes), top_n), -1, dtype=np.int32)
+        coefficients = np.zeros((len(nodes), top_n), dtype=np.float64)
+        for i, row in enumerate(customer_lists):
+            for k, (position, coefficient) in enumerate(row):
+                customer_positions[i, k] = position
+                coefficients[i, k] = coefficient
+        
+        return CustomerIndex(nodes, customer_positions, coefficients, top_n, min_coefficient)
+    
     @abstractmethod
     def has_environmental_data(self) -> bool:
         """
@@ -4,14 +4,18 @@ OECD ICIO Model Implementation
 This module implements the IOModel interface for OECD Inter-Country Input-Output tables.
 """
 
+import numpy as np
 import pandas as pd
 import gzip
 from pathlib import Path
 from typing import List, Optional
-from io_model_base import IOModel, Country, Sector, Supplier
+from io_model_base import IOModel, Country, Sector, Supplier, SupplierIndex, Customer, CustomerIndex
 from oecd_icio_data import OECD_ICIO_COUNTRIES, OECD_ICIO_SECTORS
 from functools import lru_cache
 
+# Size of the precomputed customer index; larger get_customers() queries scan the matrix row
+CUSTOMER_INDEX_TOP_N = 50
+
 
 class OECDICIOModel(IOModel):
     """
@@ -35,6 +39,7 @@ class OECDICIOModel(IOModel):
         self._sectors_cache = None
         self._coefficients_df = None
         self._coefficient_cache = {}
+        self._customer_index = None
         self._load_data()
     
     def _load_data(self):
@@ -195,6 +200,162 @@ class OECDICIOModel(IOModel):
         except KeyError:
             return []
     
+    def get_customers(
+        self,
+        country: str,
+        sector: str,
+        top_n: int = 10,
+        min_coefficient: float = 0.0
+    ) -> List[Customer]:
+        """
+        Get top customers (buyers) of a country-sector from OECD ICIO data.
+        
+        Served in O(K) from the precomputed customer index when top_n is
+        within CUSTOMER_INDEX_TOP_N, else by scanning the matrix row.
+        Returns customers sorted by coefficient (descending).
+        """
+        if top_n <= CUSTOMER_INDEX_TOP_N and min_coefficient >= 0:
+            if self._customer_index is None:
+                self._customer_index = self.get_customer_index(top_n=CUSTOMER_INDEX_TOP_N)
+            customers = self._customer_index.lookup(country, sector, top_n, min_coefficient)
+        else:
+            customers = self._scan_customers(country, sector, top_n, min_coefficient)
+        
+        result = []
+        for (customer_country, customer_sector), coef in customers:
+            country_obj = self.get_country(customer_country)
+            sector_obj = self.get_sector(customer_sector)
+            result.append(Customer(
+                country=customer_country,
+                sector=customer_sector,
+                coefficient=coef,
+                country_name=country_obj.name if country_obj else customer_country,
+                sector_name=sector_obj.name if sector_obj else customer_sector
+            ))
+        return result
+    
+    def _scan_customers(self, country: str, sector: str, top_n: int, min_coefficient: float) -> List:
+        """Top customers read from the matrix row of a country-sector"""
+        self._ensure_coefficients_loaded()
+        
+        try:
+            coefficients = self._coefficients_df.loc[f"{country}_{sector}"]
+        except KeyError:
+            return []
+        coefficients = coefficients[coefficients > min_coefficient].nlargest(top_n)
+        return [
+            (tuple(col_label.split('_', 1)), float(coef))
+            for col_label, coef in coefficients.items() if '_' in col_label
+        ]
+    
+    def _index_nodes(self):
+        """
+        Nodes shared by the supplier and customer indexes: every column, plus
+        supplier rows that have no column of their own.
+        
+        Returns:
+            Tuple of (nodes, node position of every row or -1)
+        """
+        row_labels = list(self._coefficients_df.index)
+        col_labels = list(self._coefficients_df.columns)
+        
+        nodes = [tuple(label.split('_', 1)) for label in col_labels]
+        positions = {node: i for i, node in enumerate(nodes)}
+        row_to_node = np.full(len(row_labels), -1, dtype=np.int64)
+        for r, label in enumerate(row_labels):
+            if '_' not in label:
+                continue  # Not a country-sector row (get_suppliers skips these too)
+            node = tuple(label.split('_', 1))
+            if node not in positions:
+                positions[node] = len(nodes)
+                nodes.append(node)
+            row_to_node[r] = positions[node]
+        return nodes, row_to_node
+    
+    def get_supplier_index(self, top_n: int = 20, min_coefficient: float = 0.0) -> SupplierIndex:
+        """
+        Build top-N supplier lists for all columns of the A matrix in one pass.
+        
+        Equivalent to calling get_suppliers() for every column, but selects the
+        top coefficients with numpy over blocks of columns (keeping peak memory
+        well below a second copy of the matrix).
+        """
+        self._ensure_coefficients_loaded()
+        
+        row_labels = list(self._coefficients_df.index)
+        col_labels = list(self._coefficients_df.columns)
+        nodes, row_to_node = self._index_nodes()
+        
+        values = self._coefficients_df.to_numpy(dtype=np.float64, copy=False)
+        k = min(top_n, len(row_labels))
+        supplier_positions = np.full((len(nodes), top_n), -1, dtype=np.int32)
+        coefficients = np.zeros((len(nodes), top_n), dtype=np.float64)
+        
+        block_size = 256
+        for start in range(0, len(col_labels), block_size):
+            block = values[:, start:start + block_size]
+            block = np.where(block > min_coefficient, block, -np.inf)  # also drops NaN
+            
+            # Top-k rows per column, sorted by coefficient (ties: lower row first)
+            top_rows = np.argpartition(-block, k - 1, axis=0)[:k]
+            top_values = np.take_along_axis(block, top_rows, axis=0)
+            order = np.lexsort((top_rows, -top_values), axis=0)
+            top_rows = np.take_along_axis(top_rows, order, axis=0)
+            top_values = np.take_along_axis(top_values, order, axis=0)
+            
+            # Drop filtered and non country-sector rows, keeping order
+            top_nodes = row_to_node[top_rows]
+            keep = np.isfinite(top_values) & (top_nodes >= 0)
+            compact = np.argsort(~keep, axis=0, kind='stable')
+            top_nodes = np.take_along_axis(top_nodes, compact, axis=0)
+            top_values = np.take_along_axis(top_values, compact, axis=0)
+            keep = np.take_along_axis(keep, compact, axis=0)
+            
+            end = start + block.shape[1]
+            supplier_positions[start:end, :k] = np.where(keep, top_nodes, -1).T
+            coefficients[start:end, :k] = np.where(keep, top_values, 0.0).T
+        
+        return SupplierIndex(nodes, supplier_positions, coefficients, top_n, min_coefficient)
+    
+    def get_customer_index(self, top_n: int = 20, min_coefficient: float = 0.0) -> CustomerIndex:
+        """
+        Build top-N customer lists for all rows of the A matrix in one pass.
+        
+        The row-oriented counterpart of get_supplier_index(): selects the top
+        coefficients of every row with numpy over blocks of rows. Customers are
+        columns, which are the first nodes of the index.
+        """
+        self._ensure_coefficients_loaded()
+        
+        col_labels = list(self._coefficients_df.columns)
+        nodes, row_to_node = self._index_nodes()
+        col_is_node = np.array(['_' in label for label in col_labels])
+        
+        values = self._coefficients_df.to_numpy(dtype=np.float64, copy=False)
+        k = min(top_n, len(col_labels))
+        customer_positions = np.full((len(nodes), top_n), -1, dtype=np.int32)
+        coefficients = np.zeros((len(nodes), top_n), dtype=np.float64)
+        
+        block_size = 256
+        for start in range(0, len(row_to_node), block_size):
+            block_nodes = row_to_node[start:start + block_size]
+            block = values[start:start + block_size]
+            block = np.where((block > min_coefficient) & col_is_node, block, -np.inf)  # also drops NaN
+            
+            # Top-k columns per row, sorted by coefficient (ties: lower column first)
+            top_cols = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_values = np.take_along_axis(block, top_cols, axis=1)
+            order = np.lexsort((top_cols, -top_values), axis=1)
+            top_cols = np.take_along_axis(top_cols, order, axis=1)
+            top_values = np.take_along_axis(top_values, order, axis=1)
+            
+            keep = np.isfinite(top_values)
+            rows = block_nodes >= 0
+            customer_positions[block_nodes[rows], :k] = np.where(keep, top_cols, -1)[rows]
+            coefficients[block_nodes[rows], :k] = np.where(keep, top_values, 0.0)[rows]
+        
+        return CustomerIndex(nodes, customer_positions, coefficients, top_n, min_coefficient)
+    
     def has_environmental_data(self) -> bool:
         """OECD ICIO does not include environmental satellite accounts"""
         return False
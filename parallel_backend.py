@@ -0,0 +1,260 @@
+"""
+Process-Pool Execution Backend
+
+Each gunicorn worker has one GIL, so CPU-bound work inside a request uses a
+single core. This backend shards sweep scenarios and batch targets across a
+ProcessPoolExecutor instead.
+
+Worker processes do not reload the 100 MB coefficient matrix. The parent
+writes its SupplyNetwork once as a memory-mapped artifact (.npy arrays under
+NETWORK_ARTIFACT_DIR), and every worker attaches to the same files with
+np.load(mmap_mode='r'), so one copy is shared through the page cache. Each
+worker builds a calculator on the model's metadata only; the coefficient
+matrix is never loaded there.
+
+Pools are kept alive between requests (one per model) and use the 'spawn'
+start method, which avoids forking a multi-threaded gunicorn worker. When the
+risk data changes, the pool is replaced; the old one is shut down, and its
+artifact deleted, once the requests using it are done.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from oecd_data_full import OECD_COUNTRIES, OECD_SECTORS
+from risk_calculator_v2 import MultiTierRiskCalculator, risk_data_hash
+from supply_network import SupplyNetwork
+
+
+NETWORK_ARTIFACT_DIR = os.path.abspath(os.environ.get('NETWORK_ARTIFACT_DIR', 'network_artifacts'))
+PARALLEL_WORKERS = int(os.environ.get('PARALLEL_WORKERS', os.cpu_count() or 1))
+LISTING_TOP_N = 10  # Top suppliers listed in assessments (get_suppliers default)
+
+
+def artifact_path(calculator: MultiTierRiskCalculator, root: Optional[str] = None) -> str:
+    """
+    Artifact directory for a calculator's network.
+    
+    The name hashes the model and every input of the network (supplier
+    structure parameters, tier weights, the direct risk table and the risk
+    scores the workers are started with), so an artifact is never reused
+    after any of them changes.
+    """
+    network = calculator.get_supply_network()
+    digest = hashlib.sha1()
+    digest.update(json.dumps([
+        calculator.io_model.name,
+        calculator.io_model.version,
+        network.tier_weights,
+        network.depth,
+        calculator.supplier_top_n,
+        calculator.supplier_min_coefficient,
+        risk_data_hash()
+    ]).encode())
+    digest.update(network.direct.tobytes())
+    name = f"{calculator.io_model.name.lower().replace(' ', '_')}_{digest.hexdigest()[:16]}"
+    return os.path.join(root or NETWORK_ARTIFACT_DIR, name)
+
+
+def export_network_artifact(calculator: MultiTierRiskCalculator, root: Optional[str] = None) -> str:
+    """
+    Write the calculator's network (with a top-supplier listing) as a
+    memory-mappable artifact, unless it already exists.
+    
+    Returns:
+        Artifact directory
+    """
+    path = artifact_path(calculator, root)
+    if not os.path.exists(os.path.join(path, 'manifest.json')):
+        network = calculator.get_supply_network()
+        exported = SupplyNetwork.__new__(SupplyNetwork)
+        exported.__dict__.update(network.__dict__)
+        exported.attach_listing(calculator.io_model.get_supplier_index(top_n=LISTING_TOP_N))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        exported.save_artifact(path)
+    return path
+
+
+# Calculator of a worker process (set by the pool initializer)
+_worker_calculator: Optional[MultiTierRiskCalculator] = None
+
+
+def risk_data_snapshot() -> Dict:
+    """Current country and sector risk scores (revisions live only in the parent's memory)"""
+    return {
+        'countries': {c['code']: dict(c['risk_scores']) for c in OECD_COUNTRIES},
+        'sectors': {s['code']: dict(s['risk_scores']) for s in OECD_SECTORS}
+    }
+
+
+def _attach_worker(model_class, data_path, path: str, risk_data: Dict):
+    """Pool initializer: metadata-only model, the parent's risk scores and the memory-mapped network"""
+    global _worker_calculator
+    for country in OECD_COUNTRIES:
+        country['risk_scores'].update(risk_data['countries'].get(country['code'], {}))
+    for sector in OECD_SECTORS:
+        sector['risk_scores'].update(risk_data['sectors'].get(sector['code'], {}))
+    
+    io_model = model_class(data_path=data_path) if data_path is not None else model_class()
+    network = SupplyNetwork.load_artifact(path)
+    calculator = MultiTierRiskCalculator(io_model, max_tiers=network.depth)
+    calculator.tier_weights = list(network.tier_weights)
+    calculator._supply_network = network
+    _worker_calculator = calculator
+
+
+def _sweep_task(args) -> List[Dict]:
+    from disruption_sweep import country_disruption_impact
+    countries, factor, top_n, rank_by = args
+    network = _worker_calculator.get_supply_network()
+    return [country_disruption_impact(network, country, factor, top_n, rank_by) for country in countries]
+
+
+def _batch_task(args) -> List[Dict]:
+    targets, skip_climate = args
+    return _worker_calculator.assess_batch(targets, skip_climate=skip_climate)
+
+
+def _shard(items: List, shards: int) -> List[List]:
+    size = -(-len(items) // max(shards, 1)) if items else 1
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class ProcessPoolBackend:
+    """
+    Process pool whose workers share one memory-mapped supply network.
+    
+    Backends from get_process_backend() are leased: release them (or use
+    them as a context manager) after dispatching. A retired backend shuts its
+    pool down, and deletes its artifact, only after the last lease is released.
+    """
+    
+    def __init__(self, calculator: MultiTierRiskCalculator, workers: int = PARALLEL_WORKERS):
+        """
+        Args:
+            calculator: Calculator whose network the workers attach to
+            workers: Number of worker processes
+        """
+        self.workers = max(workers, 1)
+        self.calculator = calculator
+        self.artifact = export_network_artifact(calculator)
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+        io_model = calculator.io_model
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_attach_worker,
+            initargs=(
+                type(io_model), getattr(io_model, 'data_path', None), self.artifact, risk_data_snapshot()
+            )
+        )
+    
+    def __enter__(self) -> 'ProcessPoolBackend':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+    
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+    
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            self._close()
+    
+    def retire(self):
+        """Shut down once no request uses the backend any more"""
+        with self._lock:
+            self._retired = True
+            close = self._users == 0
+        if close:
+            self._close()
+    
+    def _close(self):
+        """Let queued tasks finish, then remove the superseded artifact (in the background)"""
+        def close():
+            self._pool.shutdown(wait=True)
+            with _backends_lock:
+                in_use = any(backend.artifact == self.artifact for backend in _backends.values())
+            if not in_use:
+                shutil.rmtree(self.artifact, ignore_errors=True)
+        
+        threading.Thread(target=close, daemon=True).start()
+    
+    def _map(self, task, shards: List) -> List:
+        # Workers start lazily and load the artifact then; restore it if another
+        # gunicorn worker retired the same network and removed its files
+        root = os.path.dirname(self.artifact)
+        missing = not os.path.exists(os.path.join(self.artifact, 'manifest.json'))
+        if missing and artifact_path(self.calculator, root) == self.artifact:
+            export_network_artifact(self.calculator, root)
+        return [result for shard in self._pool.map(task, shards) for result in shard]
+    
+    def sweep_country_disruptions(
+        self,
+        countries: List[str],
+        factor: float = 0.0,
+        top_n: int = 20,
+        rank_by: str = 'total',
+        shards: Optional[int] = None
+    ) -> List[Dict]:
+        """country_disruption_impact() for each country, in one task per shard of countries"""
+        parts = _shard(countries, shards or len(countries))
+        return self._map(_sweep_task, [(part, factor, top_n, rank_by) for part in parts])
+    
+    def assess_batch(
+        self,
+        targets: List[Tuple[str, str]],
+        skip_climate: bool = False,
+        shards: Optional[int] = None
+    ) -> List[Dict]:
+        """MultiTierRiskCalculator.assess_batch() split into shards (default: one per worker)"""
+        parts = _shard(targets, shards or self.workers)
+        return self._map(_batch_task, [(part, skip_climate) for part in parts])
+    
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Live backends by calculator (pools are expensive to start, so they are reused)
+_backends: Dict[str, ProcessPoolBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_process_backend(calculator: MultiTierRiskCalculator) -> ProcessPoolBackend:
+    """
+    Get or create the process pool backend of a calculator, leased to the caller.
+    
+    Each calculator has one pool of PARALLEL_WORKERS processes; callers pick
+    their parallelism with the `shards` argument. When the network artifact
+    no longer matches the calculator (after a risk data change), a new
+    backend replaces the old one, which is retired once its current users
+    are done. Use the result as a context manager:
+    
+        with get_process_backend(calculator) as backend:
+            results = backend.assess_batch(targets, shards=workers)
+    """
+    key = f"{calculator.io_model.name}:{id(calculator)}"
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is not None and backend.artifact != artifact_path(calculator):
+            del _backends[key]
+            backend.retire()
+            backend = None
+        if backend is None:
+            backend = ProcessPoolBackend(calculator, PARALLEL_WORKERS)
+            _backends[key] = backend
+        backend.acquire()
+    return backend
@@ -3,11 +3,35 @@ Multi-Tier Risk Calculator (Version 2)
 Implements comprehensive supply chain risk assessment using IOModel interface
 """
 
-from typing import Dict, List, Optional
-from io_model_base import IOModel
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from io_model_base import IOModel, Supplier
 from oecd_data_full import OECD_COUNTRIES, OECD_SECTORS
 from sector_code_mapper import get_risk_sector_for_oecd
 from climate_api_client import ClimateRiskAPIClient
+from cache_manager import get_subtree_cache
+
+
+RISK_TYPES = ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']
+
+
+def risk_data_hash() -> str:
+    """Hash of the current country and sector risk scores"""
+    data = [
+        [(c['code'], c['risk_scores']) for c in OECD_COUNTRIES],
+        [(s['code'], s['risk_scores']) for s in OECD_SECTORS]
+    ]
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+class DeadlineExceeded(Exception):
+    """Raised inside the tier recursion when an assessment runs out of time budget"""
+    pass
 
 
 class MultiTierRiskCalculator:
@@ -25,18 +49,26 @@ class MultiTierRiskCalculator:
     - Tier-3: 16% (third-tier suppliers)
     """
     
-    def __init__(self, io_model: IOModel, max_tiers: int = 3):
+    def __init__(self, io_model: IOModel, max_tiers: int = 3, use_subtree_cache: bool = True):
         """
         Initialize risk calculator with an I-O model.
         
         Args:
             io_model: IOModel instance (OECD ICIO, EXIOBASE, etc.)
             max_tiers: Maximum number of supply chain tiers to analyze
+            use_subtree_cache: Share supplier subtree results across assessments
         """
         self.io_model = io_model
         self.max_tiers = max_tiers
         self.tier_weights = [1.0, 0.4, 0.16]  # 100%, 40%, 16%
+        self.supplier_top_n = 20  # Suppliers followed per node
+        self.supplier_min_coefficient = 0.001  # Ignore very small coefficients
+        self.use_subtree_cache = use_subtree_cache
         self.climate_api = ClimateRiskAPIClient()
+        self._supply_network = None
+        self._supply_network_lock = threading.Lock()
+        self._hotspot_index = None
+        self._cache_version = None
     
     def get_countries(self) -> List[Dict]:
         """Get list of all supported countries from the I-O model"""
@@ -62,13 +94,64 @@ class MultiTierRiskCalculator:
             for s in sectors
         ]
     
-    def calculate_direct_risk(self, country_code: str, sector_code: str) -> Optional[Dict]:
+    def get_customers(
+        self,
+        country_code: str,
+        sector_code: str,
+        top_n: int = 20,
+        min_coefficient: float = 0.0
+    ) -> Dict:
+        """
+        Buyers that depend on a country-sector (the reverse of its suppliers).
+        
+        Args:
+            country_code: Supplier country code
+            sector_code: Supplier sector code
+            top_n: Number of top customers to return
+            min_coefficient: Only customers buying more than this per unit of output
+        
+        Returns:
+            Dictionary with the customers, or dictionary with 'error'
+        """
+        is_valid, error = self.io_model.validate_country_sector(country_code, sector_code)
+        if not is_valid:
+            return {'error': error, 'country': country_code, 'sector': sector_code}
+        
+        start = time.perf_counter()
+        customers = self.io_model.get_customers(
+            country_code, sector_code, top_n=top_n, min_coefficient=min_coefficient
+        )
+        country = self.io_model.get_country(country_code)
+        sector = self.io_model.get_sector(sector_code)
+        return {
+            'country': country_code,
+            'country_name': country.name,
+            'sector': sector_code,
+            'sector_name': sector.name,
+            'model': self.io_model.name,
+            'top_n': top_n,
+            'min_coefficient': min_coefficient,
+            'count': len(customers),
+            'customers': [c.to_dict() for c in customers],
+            'lookup_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+    
+    def calculate_direct_risk(
+        self,
+        country_code: str,
+        sector_code: str,
+        score_overrides: Optional[Dict] = None
+    ) -> Optional[Dict]:
         """
         Calculate direct (inherent) risk for a country-sector.
         
         Uses risk scores from OECD_COUNTRIES and OECD_SECTORS data.
         Maps OECD ICIO sector codes to risk data sector codes if needed.
         Maps firm splits (CN1/CN2/MX1/MX2) to parent countries for risk lookup.
+        
+        score_overrides ({'countries': {code: {risk_type: score}}, 'sectors':
+        {code: {...}}}) replace individual scores; countries are keyed by
+        risk-data code, sectors by I-O or risk-data sector code.
         """
         # Map country code for risk lookup (handles firm splits and ISO-3 codes)
         from country_codes import get_country_code
@@ -92,12 +175,23 @@ class MultiTierRiskCalculator:
         if not country or not sector:
             return None
         
+        country_scores = country['risk_scores']
+        sector_scores = sector['risk_scores']
+        if score_overrides:
+            country_scores = {**country_scores, **score_overrides.get('countries', {}).get(risk_country_code, {})}
+            sector_overrides = score_overrides.get('sectors', {})
+            sector_scores = {
+                **sector_scores,
+                **sector_overrides.get(risk_sector_code, {}),
+                **sector_overrides.get(sector_code, {})
+            }
+        
         # Calculate weighted combination of country and sector risk
         # Country weight: 70%, Sector weight: 30%
         direct_risk = {}
-        for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']:
-            country_risk = country['risk_scores'].get(risk_type, 0)
-            sector_risk = sector['risk_scores'].get(risk_type, 0)
+        for risk_type in RISK_TYPES:
+            country_risk = country_scores.get(risk_type, 0)
+            sector_risk = sector_scores.get(risk_type, 0)
             direct_risk[risk_type] = round(0.7 * country_risk + 0.3 * sector_risk, 2)
         
         # Expected loss will be added separately if not skipped
@@ -120,12 +214,7 @@ class MultiTierRiskCalculator:
         cache = get_cache()
         
         # Get suppliers with coefficients
-        suppliers = self.io_model.get_suppliers(
-            country_code,
-            sector_code,
-            top_n=20,
-            min_coefficient=0.001
-        )
+        suppliers = self._followed_suppliers(country_code, sector_code)
         
         if not suppliers:
             return
@@ -141,13 +230,13 @@ class MultiTierRiskCalculator:
             'hurricane': {'annual_loss': 0.0}
         }
         
-        total_coefficient = sum(s.coefficient for s in suppliers)
+        total_coefficient = sum(coefficient for _, coefficient in suppliers)
         if total_coefficient == 0:
             return
         
         # Aggregate expected loss from all suppliers
-        for supplier in suppliers:
-            supplier_country_obj = self.io_model.get_country(supplier.country)
+        for supplier_country, coefficient in suppliers:
+            supplier_country_obj = self.io_model.get_country(supplier_country)
             if not supplier_country_obj:
                 continue
             
@@ -157,7 +246,7 @@ class MultiTierRiskCalculator:
                 continue
             
             # Weight by I-O coefficient
-            weight = supplier.coefficient / total_coefficient
+            weight = coefficient / total_coefficient
             
             # Add weighted expected loss
             total_annual_loss += supplier_climate_data.get('expected_annual_loss', 0) * weight
@@ -186,6 +275,32 @@ class MultiTierRiskCalculator:
                 'note': 'Supplier expected loss weighted by I-O coefficients from cached Climate API data'
             }
     
+    def _followed_suppliers(self, country_code: str, sector_code: str) -> List[Tuple[str, float]]:
+        """
+        (country, coefficient) of the suppliers followed for a node.
+        
+        Read from the supply network's supplier index once the network exists
+        (its rows equal get_suppliers() with the same top_n and threshold), so
+        the coefficient matrix is not needed. Process-pool workers have only
+        the memory-mapped network.
+        """
+        network = self._supply_network
+        position = network.node_position(country_code, sector_code) if network is not None else None
+        if position is None:
+            suppliers = self.io_model.get_suppliers(
+                country_code,
+                sector_code,
+                top_n=self.supplier_top_n,
+                min_coefficient=self.supplier_min_coefficient
+            )
+            return [(s.country, s.coefficient) for s in suppliers]
+        
+        row = network.index.suppliers[position]
+        return [
+            (network.nodes[supplier][0], float(coefficient))
+            for supplier, coefficient in zip(row, network.index.coefficients[position]) if supplier >= 0
+        ]
+    
     def _add_climate_data(self, direct_risk: Dict, country_name: str):
         """
         Add Climate API expected loss data to direct risk.
@@ -215,7 +330,9 @@ class MultiTierRiskCalculator:
         country_code: str,
         sector_code: str,
         current_tier: int = 1,
-        visited: Optional[set] = None
+        visited: Optional[set] = None,
+        max_tiers: Optional[int] = None,
+        deadline: Optional[float] = None
     ) -> Dict:
         """
         Calculate indirect risk from suppliers using recursive multi-tier analysis.
@@ -227,36 +344,80 @@ class MultiTierRiskCalculator:
             sector_code: Target sector
             current_tier: Current tier level (1, 2, or 3)
             visited: Set of visited country-sectors to avoid cycles
+            max_tiers: Tier depth to stop at (defaults to self.max_tiers)
+            deadline: time.monotonic() value after which DeadlineExceeded is raised
         
         Returns:
             Dictionary of risk scores by type
         """
         if visited is None:
             visited = set()
+        if max_tiers is None:
+            max_tiers = self.max_tiers
+        
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceeded(f"Time budget exhausted at tier {current_tier}")
         
         # Base case: max tier reached
-        if current_tier > self.max_tiers:
-            return {risk_type: 0.0 for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']}
+        if current_tier > max_tiers:
+            return {risk_type: 0.0 for risk_type in RISK_TYPES}
         
         # Mark current node as visited
         node_id = f"{country_code}_{sector_code}"
         if node_id in visited:
-            return {risk_type: 0.0 for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']}
+            return {risk_type: 0.0 for risk_type in RISK_TYPES}
+        
+        subtree_cache = get_subtree_cache() if self.use_subtree_cache else None
+        remaining_depth = max_tiers - current_tier + 1
+        cache_key = None
+        
+        # A subtree with no ancestors to skip is path independent,
+        # so it can be looked up before fetching suppliers
+        if subtree_cache is not None and (remaining_depth < 2 or not visited):
+            cache_key = self._subtree_cache_key(node_id, current_tier, remaining_depth, frozenset())
+            cached = subtree_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        ancestors = frozenset(visited)
         visited.add(node_id)
         
         # Get suppliers using real I-O coefficients from the model
         suppliers = self.io_model.get_suppliers(
             country_code,
             sector_code,
-            top_n=20,  # Get top 20 suppliers
-            min_coefficient=0.001  # Filter out very small coefficients
+            top_n=self.supplier_top_n,  # Get top 20 suppliers
+            min_coefficient=self.supplier_min_coefficient  # Filter out very small coefficients
         )
         
+        if subtree_cache is not None and cache_key is None:
+            excluded = self._excluded_ancestors(suppliers, remaining_depth, ancestors)
+            cache_key = self._subtree_cache_key(node_id, current_tier, remaining_depth, excluded)
+            cached = subtree_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        indirect_risk = self._aggregate_supplier_risk(suppliers, current_tier, visited, max_tiers, deadline)
+        
+        if cache_key is not None:
+            subtree_cache.put(cache_key, indirect_risk)
+        
+        return indirect_risk
+    
+    def _aggregate_supplier_risk(
+        self,
+        suppliers: List,
+        current_tier: int,
+        visited: set,
+        max_tiers: int,
+        deadline: Optional[float]
+    ) -> Dict:
+        """Weighted average of supplier total risks for one node of the recursion"""
         if not suppliers:
-            return {risk_type: 0.0 for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']}
+            return {risk_type: 0.0 for risk_type in RISK_TYPES}
         
         # Calculate weighted risk from suppliers
-        indirect_risk = {risk_type: 0.0 for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']}
+        indirect_risk = {risk_type: 0.0 for risk_type in RISK_TYPES}
         total_coefficient = sum(s.coefficient for s in suppliers)
         
         if total_coefficient == 0:
@@ -276,12 +437,14 @@ class MultiTierRiskCalculator:
                 supplier.country,
                 supplier.sector,
                 current_tier + 1,
-                visited.copy()  # Pass a copy to avoid affecting other branches
+                visited.copy(),  # Pass a copy to avoid affecting other branches
+                max_tiers,
+                deadline
             )
             
             # Combine direct and indirect for supplier's total risk
             supplier_total = {}
-            for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']:
+            for risk_type in RISK_TYPES:
                 supplier_total[risk_type] = (
                     0.6 * supplier_direct[risk_type] +
                     0.4 * supplier_indirect[risk_type]
@@ -290,7 +453,7 @@ class MultiTierRiskCalculator:
             # Weight by I-O coefficient and tier weight
             weight = (supplier.coefficient / total_coefficient) * tier_weight
             
-            for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']:
+            for risk_type in RISK_TYPES:
                 indirect_risk[risk_type] += weight * supplier_total[risk_type]
         
         # Round to 2 decimal places
@@ -299,6 +462,73 @@ class MultiTierRiskCalculator:
         
         return indirect_risk
     
+    def _subtree_cache_key(
+        self,
+        node_id: str,
+        current_tier: int,
+        remaining_depth: int,
+        excluded: frozenset
+    ) -> Tuple:
+        """Key for the shared subtree cache: node, depth and every parameter the result depends on"""
+        return (
+            self.io_model.name,
+            self.io_model.version,
+            node_id,
+            current_tier,
+            remaining_depth,
+            tuple(self.tier_weights),
+            self.supplier_top_n,
+            self.supplier_min_coefficient,
+            excluded
+        )
+    
+    def cache_version(self) -> str:
+        """
+        Short hash of every input a cached assessment depends on: model name
+        and version, methodology parameters and the risk-score data. Cached
+        results are keyed by it, so they never outlive a change of any input.
+        """
+        if self._cache_version is None:
+            self._cache_version = hashlib.sha1(json.dumps([
+                self.io_model.name,
+                self.io_model.version,
+                self.tier_weights,
+                self.max_tiers,
+                self.supplier_top_n,
+                self.supplier_min_coefficient,
+                risk_data_hash()
+            ]).encode()).hexdigest()[:12]
+        return self._cache_version
+    
+    def _excluded_ancestors(self, suppliers: List, remaining_depth: int, ancestors: frozenset) -> frozenset:
+        """
+        Ancestors on the current path that the subtree below a node will skip.
+        
+        The recursion only checks `visited` for nodes within remaining_depth - 1
+        hops upstream, so a subtree result depends on its path only through the
+        ancestors found there. Keying on this (usually empty) set lets the same
+        subtree be shared by different targets without changing results.
+        """
+        if remaining_depth < 2 or not ancestors:
+            return frozenset()
+        
+        frontier = {(s.country, s.sector) for s in suppliers}
+        reachable = set(frontier)
+        for _ in range(remaining_depth - 2):
+            next_frontier = set()
+            for country, sector in frontier:
+                for s in self.io_model.get_suppliers(
+                    country, sector,
+                    top_n=self.supplier_top_n,
+                    min_coefficient=self.supplier_min_coefficient
+                ):
+                    next_frontier.add((s.country, s.sector))
+            frontier = next_frontier - reachable
+            reachable |= frontier
+        
+        return frozenset(node for node in ancestors
+                         if tuple(node.split('_', 1)) in reachable)
+    
     def calculate_total_risk(self, country_code: str, sector_code: str) -> Optional[Dict]:
         """
         Calculate total risk (direct + indirect) for a country-sector.
@@ -316,16 +546,101 @@ class MultiTierRiskCalculator:
         
         indirect_risk = self.calculate_indirect_risk(country_code, sector_code)
         
+        return self.combine_total_risk(direct_risk, indirect_risk)
+    
+    @staticmethod
+    def combine_total_risk(direct_risk: Dict, indirect_risk: Dict) -> Dict:
+        """Combine direct and indirect scores: 60% direct + 40% indirect"""
         total_risk = {}
-        for risk_type in ['climate', 'modern_slavery', 'political', 'water_stress', 'nature_loss']:
+        for risk_type in RISK_TYPES:
             total_risk[risk_type] = round(
                 0.6 * direct_risk[risk_type] + 0.4 * indirect_risk[risk_type],
                 2
             )
-        
         return total_risk
     
-    def assess_risk(self, country_code: str, sector_code: str, skip_climate: bool = False) -> Optional[Dict]:
+    def calculate_indirect_risk_progressive(
+        self,
+        country_code: str,
+        sector_code: str,
+        deadline: Optional[float] = None
+    ) -> Tuple[Dict, int]:
+        """
+        Anytime variant of calculate_indirect_risk.
+        
+        Tier 1 is always computed; deeper tiers are refined one at a time
+        (iterative deepening) while the deadline has not passed. The result of
+        the deepest tier that completed in time is returned.
+        
+        Args:
+            country_code: Target country
+            sector_code: Target sector
+            deadline: time.monotonic() value, or None for no time limit
+        
+        Returns:
+            Tuple of (indirect risk scores, number of completed tiers)
+        """
+        if deadline is None:
+            return self.calculate_indirect_risk(country_code, sector_code), self.max_tiers
+        
+        indirect_risk = self.calculate_indirect_risk(country_code, sector_code, max_tiers=1)
+        completed_tiers = 1
+        
+        for depth in range(2, self.max_tiers + 1):
+            try:
+                indirect_risk = self.calculate_indirect_risk(
+                    country_code, sector_code, max_tiers=depth, deadline=deadline
+                )
+            except DeadlineExceeded:
+                break
+            completed_tiers = depth
+        
+        return indirect_risk, completed_tiers
+    
+    def get_residual_bound(self, completed_tiers: int) -> Dict:
+        """
+        Upper bound on how much indirect risk the tiers beyond `completed_tiers` can add.
+        
+        Supplier weights are normalised per node, so the deepest possible
+        contribution is bounded by the largest direct risk score in the data,
+        discounted by the tier weights and the 40% indirect share at each level.
+        """
+        max_country = {
+            risk_type: max(c['risk_scores'].get(risk_type, 0) for c in OECD_COUNTRIES)
+            for risk_type in RISK_TYPES
+        }
+        max_sector = {
+            risk_type: max(s['risk_scores'].get(risk_type, 0) for s in OECD_SECTORS)
+            for risk_type in RISK_TYPES
+        }
+        
+        effective_tiers = min(self.max_tiers, len(self.tier_weights))
+        bound = {}
+        for risk_type in RISK_TYPES:
+            max_direct = 0.7 * max_country[risk_type] + 0.3 * max_sector[risk_type]
+            
+            # Largest indirect score a node at tier t can have, built bottom-up
+            tier_bound = 0.0
+            for tier in range(effective_tiers, completed_tiers, -1):
+                tier_bound = self.tier_weights[tier - 1] * (0.6 * max_direct + 0.4 * tier_bound)
+            
+            # Discount by the path from the target down to the first missing tier
+            for tier in range(1, completed_tiers + 1):
+                tier_bound *= self.tier_weights[tier - 1] * 0.4
+            
+            bound[risk_type] = round(tier_bound, 2)
+        
+        return bound
+    
+    def assess_risk(
+        self,
+        country_code: str,
+        sector_code: str,
+        skip_climate: bool = False,
+        budget_ms: Optional[float] = None,
+        include_split: bool = False,
+        score_overrides: Optional[Dict] = None
+    ) -> Optional[Dict]:
         """
         Comprehensive risk assessment for a country-sector.
         
@@ -333,6 +648,16 @@ class MultiTierRiskCalculator:
             country_code: ISO country code
             sector_code: Sector code
             skip_climate: If True, skip Climate API call for faster response
+            budget_ms: Optional time budget. Tier 1 is always computed, deeper
+                       tiers only while time remains. Climate API data is only
+                       used if already cached, so a slow upstream call cannot
+                       blow the budget ('complete' is False if it was deferred).
+            include_split: If True, add a domestic vs. imported split of the
+                           indirect risk ('indirect_risk_split')
+            score_overrides: Scenario risk scores (see calculate_direct_risk());
+                             evaluated on the supply network, see scenario_risk().
+                             Scenario results are always complete, so budget_ms
+                             does not apply to them
         
         Returns complete assessment including:
         - Direct risk scores
@@ -341,6 +666,16 @@ class MultiTierRiskCalculator:
         - Top suppliers with coefficients
         - Methodology details
         """
+        if score_overrides:
+            result = self.assess_batch(
+                [(country_code, sector_code)], skip_climate=skip_climate, score_overrides=score_overrides
+            )[0]
+            if include_split and 'error' not in result:
+                result['indirect_risk_split'] = self.split_indirect_risk(
+                    country_code, sector_code, direct=self._scenario_direct(score_overrides)[0]
+                )
+            return result
+        
         # Validate inputs
         is_valid, error = self.io_model.validate_country_sector(country_code, sector_code)
         if not is_valid:
@@ -354,12 +689,20 @@ class MultiTierRiskCalculator:
         country_obj = self.io_model.get_country(country_code)
         sector_obj = self.io_model.get_sector(sector_code)
         
+        deadline = time.monotonic() + budget_ms / 1000.0 if budget_ms is not None else None
+        
         # Calculate risks
         direct_risk = self.calculate_direct_risk(country_code, sector_code)
         
         # Add Climate API data if not skipped
+        # (under a time budget only if it is already cached - the API can take 35s)
+        climate_deferred = False
         if not skip_climate and direct_risk:
-            self._add_climate_data(direct_risk, country_obj.name if country_obj else country_code)
+            country_name = country_obj.name if country_obj else country_code
+            if deadline is not None and self.climate_api.get_cached_country_risk(country_name) is None:
+                climate_deferred = True
+            else:
+                self._add_climate_data(direct_risk, country_name)
         if not direct_risk:
             return {
                 'error': f'Risk data not available for {country_code}_{sector_code}',
@@ -367,8 +710,12 @@ class MultiTierRiskCalculator:
                 'sector': sector_code
             }
         
-        indirect_risk = self.calculate_indirect_risk(country_code, sector_code)
-        total_risk = self.calculate_total_risk(country_code, sector_code)
+        indirect_risk, completed_tiers = self.calculate_indirect_risk_progressive(
+            country_code, sector_code, deadline
+        )
+        # Copy: the subtree cache shares this dict with other assessments
+        indirect_risk = dict(indirect_risk)
+        total_risk = self.combine_total_risk(direct_risk, indirect_risk)
         
         # Add supplier expected loss if Climate API is enabled
         if not skip_climate and indirect_risk:
@@ -377,6 +724,34 @@ class MultiTierRiskCalculator:
         # Get top suppliers
         suppliers = self.io_model.get_suppliers(country_code, sector_code, top_n=10)
         
+        result = self._assessment_result(
+            country_code, sector_code, direct_risk, indirect_risk, total_risk, suppliers,
+            completed_tiers, complete=completed_tiers == self.max_tiers and not climate_deferred
+        )
+        
+        if include_split:
+            # Over the same tiers as the (possibly truncated) indirect risk
+            result['indirect_risk_split'] = self.split_indirect_risk(
+                country_code, sector_code, max_tiers=completed_tiers
+            )
+        
+        return result
+    
+    def _assessment_result(
+        self,
+        country_code: str,
+        sector_code: str,
+        direct_risk: Dict,
+        indirect_risk: Dict,
+        total_risk: Dict,
+        suppliers: List,
+        completed_tiers: int,
+        complete: bool
+    ) -> Dict:
+        """Assemble the assessment payload returned by assess_risk() and assess_batch()"""
+        country_obj = self.io_model.get_country(country_code)
+        sector_obj = self.io_model.get_sector(sector_code)
+        
         return {
             'country': {
                 'code': country_code,
@@ -404,8 +779,1064 @@ class MultiTierRiskCalculator:
                     'tier_3': '16%'
                 },
                 'max_tiers': self.max_tiers
+            },
+            'completed_tiers': completed_tiers,
+            'residual_bound': self.get_residual_bound(completed_tiers),
+            'complete': complete
+        }
+    
+    def assess_batch(
+        self,
+        targets: List[Tuple[str, str]],
+        skip_climate: bool = False,
+        score_overrides: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Assess many country-sectors together.
+        
+        Indirect risk for all targets comes from one vectorized propagation over
+        the shared supply network (identical to calculate_indirect_risk() for up
+        to 3 tiers) instead of one recursion per target.
+        
+        Args:
+            targets: List of (country_code, sector_code), ideally without duplicates
+            skip_climate: If True, skip Climate API data
+            score_overrides: Scenario risk scores (see scenario_risk())
+        
+        Returns:
+            One assessment (or dictionary with 'error') per target, in input order
+        """
+        network = self.get_supply_network()
+        positions = [network.node_position(country, sector) for country, sector in targets]
+        known = [position for position in positions if position is not None]
+        scenario = self.scenario_risk(score_overrides) if score_overrides else None
+        indirect = scenario['indirect'] if scenario else network.baseline_indirect()
+        indirect_rows = dict(zip(known, indirect[known].tolist()))
+        
+        results = []
+        for (country_code, sector_code), position in zip(targets, positions):
+            is_valid, error = self.io_model.validate_country_sector(country_code, sector_code)
+            direct_risk = self.calculate_direct_risk(
+                country_code, sector_code, score_overrides=score_overrides
+            ) if is_valid else None
+            if not is_valid or not direct_risk or position is None:
+                results.append({
+                    'error': error or f'Risk data not available for {country_code}_{sector_code}',
+                    'country': country_code,
+                    'sector': sector_code
+                })
+                continue
+            
+            if not skip_climate:
+                country_obj = self.io_model.get_country(country_code)
+                self._add_climate_data(direct_risk, country_obj.name if country_obj else country_code)
+            
+            indirect_risk = dict(zip(RISK_TYPES, indirect_rows[position]))
+            total_risk = self.combine_total_risk(direct_risk, indirect_risk)
+            if not skip_climate:
+                self._add_supplier_expected_loss(indirect_risk, country_code, sector_code)
+            
+            result = self._assessment_result(
+                country_code, sector_code, direct_risk, indirect_risk, total_risk,
+                self._top_suppliers(network, position, country_code, sector_code),
+                self.max_tiers, complete=True
+            )
+            if scenario:
+                result['scenario'] = scenario['summary']
+            results.append(result)
+        
+        return results
+    
+    @staticmethod
+    def _nodes_scored_by(network, country_codes, sector_codes) -> np.ndarray:
+        """
+        Positions of the nodes with risk data whose direct risk uses one of the
+        given risk-data countries or (I-O or risk-data) sectors
+        """
+        risk_sectors = {}
+        for code in np.unique(network.node_sectors):
+            try:
+                risk_sectors[code] = get_risk_sector_for_oecd(str(code))
+            except ValueError:
+                risk_sectors[code] = str(code)
+        sector_codes = list(sector_codes)
+        return np.flatnonzero(network.valid[:network.node_count] & (
+            np.isin(network.home_countries, list(country_codes))
+            | np.isin(network.node_sectors, sector_codes)
+            | np.isin([risk_sectors[code] for code in network.node_sectors], sector_codes)
+        ))
+    
+    def _scenario_direct(self, score_overrides: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """Direct risk table with overridden scores, and the positions whose direct risk changed"""
+        network = self.get_supply_network()
+        candidates = self._nodes_scored_by(
+            network, score_overrides.get('countries', {}), score_overrides.get('sectors', {})
+        )
+        
+        direct = np.array(network.direct)
+        for i in candidates:
+            direct_risk = self.calculate_direct_risk(*network.nodes[i], score_overrides=score_overrides)
+            direct[i] = [direct_risk[risk_type] for risk_type in RISK_TYPES]
+        changed = candidates[(direct[candidates] != network.direct[candidates]).any(axis=1)]
+        return direct, changed
+    
+    def scenario_risk(self, score_overrides: Dict) -> Dict:
+        """
+        All-node risk tables with some country/sector risk scores overridden.
+        
+        Only nodes whose direct risk changes, and the nodes that have one of
+        them in their truncated upstream tree (found through the network's
+        reverse supplier index), are recomputed. The shared network, its
+        memoized tables and the caches are left untouched.
+        
+        Args:
+            score_overrides: {'countries': {code: {risk_type: score}},
+                              'sectors': {code: {risk_type: score}}}
+        
+        Returns:
+            Dictionary with (N+1, 5) 'direct', (N, 5) 'indirect' and 'total'
+            arrays, plus a 'summary' of the overrides and recomputed nodes
+        """
+        network = self.get_supply_network()
+        direct, changed = self._scenario_direct(score_overrides)
+        
+        if len(changed):
+            rows = network.dependents(changed)
+            indirect = network.propagate(direct, rows=rows)
+        else:
+            rows = changed
+            indirect = network.baseline_indirect()
+        
+        return {
+            'direct': direct,
+            'indirect': indirect,
+            'total': network.total_risk(indirect, direct),
+            'summary': {
+                'score_overrides': score_overrides,
+                'changed_nodes': len(changed),
+                'recomputed_nodes': len(rows)
+            }
+        }
+    
+    def refresh_direct_risk(self, country_codes=(), sector_codes=()) -> Dict:
+        """
+        Bring the supply network up to date after risk scores were revised.
+        
+        Direct risk is recomputed for the nodes of the given countries and
+        sectors (firm splits follow their parent country). Only the nodes whose
+        direct risk actually changed, and their dependents, are re-propagated.
+        The new network replaces the old one, so readers holding the old
+        network are not affected.
+        
+        Args:
+            country_codes: Risk-data country codes whose scores changed
+            sector_codes: I-O or risk-data sector codes whose scores changed
+        
+        Returns:
+            Dictionary with 'changed' and 'recomputed' node positions
+        """
+        with self._supply_network_lock:
+            self._cache_version = None  # The risk-score data changed
+            network = self._supply_network
+            if network is None:
+                return {'changed': np.array([], dtype=np.int64), 'recomputed': np.array([], dtype=np.int64)}
+            
+            candidates = self._nodes_scored_by(network, country_codes, sector_codes)
+            
+            direct = np.array(network.direct)
+            for i in candidates:
+                direct_risk = self.calculate_direct_risk(*network.nodes[i])
+                if direct_risk:
+                    direct[i] = [direct_risk[risk_type] for risk_type in RISK_TYPES]
+            changed = candidates[(direct[candidates] != network.direct[candidates]).any(axis=1)]
+            
+            if len(changed) == 0:
+                return {'changed': changed, 'recomputed': changed}
+            self._supply_network, recomputed = network.updated(direct, changed)
+            return {'changed': changed, 'recomputed': recomputed}
+    
+    def _top_suppliers(self, network, position: int, country_code: str, sector_code: str, top_n: int = 10) -> List:
+        """
+        get_suppliers(top_n=10), read from the network's listing index if it has
+        one, else from the supplier index when that holds enough suppliers
+        """
+        index = network.listing if network.listing is not None else network.index
+        row = index.suppliers[position, :top_n]
+        if network.listing is None and (row >= 0).sum() < top_n:
+            return self.io_model.get_suppliers(country_code, sector_code, top_n=top_n)
+        
+        suppliers = []
+        for supplier, coefficient in zip(row, index.coefficients[position, :top_n]):
+            if supplier < 0:
+                break
+            country, sector = network.nodes[supplier]
+            country_obj = self.io_model.get_country(country)
+            sector_obj = self.io_model.get_sector(sector)
+            suppliers.append(Supplier(
+                country=country,
+                sector=sector,
+                coefficient=float(coefficient),
+                country_name=country_obj.name if country_obj else country,
+                sector_name=sector_obj.name if sector_obj else sector
+            ))
+        return suppliers
+    
+    def get_supply_network(self):
+        """
+        Get the vectorized supplier structure for this calculator (built once).
+        
+        Returns:
+            SupplyNetwork over all nodes of the I-O model
+        """
+        if self._supply_network is None:
+            with self._supply_network_lock:
+                if self._supply_network is None:
+                    from supply_network import SupplyNetwork
+                    index = self.io_model.get_supplier_index(
+                        top_n=self.supplier_top_n,
+                        min_coefficient=self.supplier_min_coefficient
+                    )
+                    self._supply_network = SupplyNetwork(
+                        index, self.calculate_direct_risk, self.tier_weights, self.max_tiers
+                    )
+        return self._supply_network
+    
+    def get_hotspot_index(self):
+        """
+        Get the sorted hotspot index over this calculator's network (built once).
+        
+        Returns:
+            HotspotIndex over all nodes of the I-O model
+        """
+        network = self.get_supply_network()
+        index = self._hotspot_index
+        if index is None or index.network is not network:
+            with self._supply_network_lock:
+                if self._hotspot_index is None or self._hotspot_index.network is not network:
+                    from risk_hotspots import HotspotIndex
+                    self._hotspot_index = HotspotIndex(network, self.io_model)
+                index = self._hotspot_index
+        return index
+    
+    def attribute_indirect_risk(self, country_code: str, sector_code: str, top_n: int = 10) -> Dict:
+        """
+        Break a target's indirect risk down by origin country, origin sector and tier.
+        
+        Uses a single vectorized upstream propagation from the target (no path
+        enumeration). Contributions are computed before the per-tier rounding
+        of the recursive calculator, so their sum can differ from the reported
+        indirect risk by a few hundredths.
+        
+        Args:
+            country_code: Target country code
+            sector_code: Target sector code
+            top_n: Number of top contributing nodes to return per risk type
+        
+        Returns:
+            Attribution dictionary, or dictionary with 'error'
+        """
+        is_valid, error = self.io_model.validate_country_sector(country_code, sector_code)
+        if not is_valid:
+            return {'error': error, 'country': country_code, 'sector': sector_code}
+        
+        network = self.get_supply_network()
+        target = network.node_position(country_code, sector_code)
+        if target is None or not network.valid[target]:
+            return {
+                'error': f'Risk data not available for {country_code}_{sector_code}',
+                'country': country_code,
+                'sector': sector_code
+            }
+        
+        contributions = network.tier_contributions(target)  # (tiers, N, 5)
+        by_node = contributions.sum(axis=0)
+        attributed = by_node.sum(axis=0)
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 4) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        def shares(values) -> Dict:
+            return {
+                risk_type: round(float(values[r] / attributed[r]), 4) if attributed[r] > 0 else 0.0
+                for r, risk_type in enumerate(RISK_TYPES)
+            }
+        
+        def grouped(labels, name_fn) -> List[Dict]:
+            codes, inverse = np.unique(labels, return_inverse=True)
+            totals = np.zeros((len(codes), len(RISK_TYPES)))
+            np.add.at(totals, inverse, by_node)
+            order = np.argsort(-totals.sum(axis=1), kind='stable')
+            return [
+                {
+                    'code': str(codes[g]),
+                    'name': name_fn(str(codes[g])),
+                    'contribution': scores(totals[g]),
+                    'share': shares(totals[g])
+                }
+                for g in order if totals[g].sum() > 0
+            ]
+        
+        def country_name(code: str) -> str:
+            country = self.io_model.get_country(code)
+            return country.name if country else code
+        
+        def sector_name(code: str) -> str:
+            sector = self.io_model.get_sector(code)
+            return sector.name if sector else code
+        
+        top_contributors = {}
+        for r, risk_type in enumerate(RISK_TYPES):
+            ranked = np.argsort(-by_node[:, r], kind='stable')[:top_n]
+            top_contributors[risk_type] = [
+                {
+                    'country': network.nodes[i][0],
+                    'sector': network.nodes[i][1],
+                    'contribution': round(float(by_node[i, r]), 4),
+                    'share': round(float(by_node[i, r] / attributed[r]), 4) if attributed[r] > 0 else 0.0,
+                    'by_tier': {
+                        f'tier_{t + 1}': round(float(contributions[t, i, r]), 4)
+                        for t in range(contributions.shape[0])
+                    }
+                }
+                for i in ranked if by_node[i, r] > 0
+            ]
+        
+        return {
+            'country': {'code': country_code, 'name': country_name(country_code)},
+            'sector': {'code': sector_code, 'name': sector_name(sector_code)},
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'indirect_risk': scores(network.baseline_indirect()[target]),
+            'attributed_total': scores(attributed),
+            'by_tier': {
+                f'tier_{t + 1}': scores(contributions[t].sum(axis=0))
+                for t in range(contributions.shape[0])
+            },
+            'by_country': grouped(network.node_countries, country_name),
+            'by_sector': grouped(network.node_sectors, sector_name),
+            'top_contributors': top_contributors,
+            'methodology': {
+                'contribution_formula': 'path weight x 60% of origin direct risk, summed over all supply paths',
+                'path_weight': 'product of normalised I-O coefficients x tier weights x 40% per additional tier',
+                'max_tiers': network.depth
+            }
+        }
+    
+    def split_indirect_risk(
+        self,
+        country_code: str,
+        sector_code: str,
+        max_tiers: Optional[int] = None,
+        direct: Optional[np.ndarray] = None
+    ) -> Optional[Dict]:
+        """
+        Split a target's indirect risk into domestic and imported parts, per tier.
+        
+        Domestic contributions originate from suppliers in the target's own
+        country (firm splits such as CN1/CN2 count as their parent country);
+        everything else is imported. Both parts come from one vectorized
+        upstream propagation, masked by supplier country.
+        
+        Args:
+            country_code: Target country
+            sector_code: Target sector
+            max_tiers: Only split the first tiers, as computed by a
+                budget-truncated assessment (default: all tiers)
+            direct: Scenario direct risk table (see scenario_risk()) to split
+                instead of the network's
+        
+        Returns:
+            Split dictionary, or None if the node has no risk data
+        """
+        network = self.get_supply_network()
+        target = network.node_position(country_code, sector_code)
+        if target is None or not network.valid[target]:
+            return None
+        
+        contributions = network.tier_contributions(target, direct)[:max_tiers]  # (tiers, N, 5)
+        domestic = network.domestic_mask(target)
+        domestic_by_tier = contributions[:, domestic].sum(axis=1)
+        imported_by_tier = contributions[:, ~domestic].sum(axis=1)
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 4) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        domestic_total = domestic_by_tier.sum(axis=0)
+        imported_total = imported_by_tier.sum(axis=0)
+        combined = domestic_total + imported_total
+        
+        return {
+            'domestic': scores(domestic_total),
+            'imported': scores(imported_total),
+            'domestic_share': {
+                risk_type: round(float(domestic_total[r] / combined[r]), 4) if combined[r] > 0 else 0.0
+                for r, risk_type in enumerate(RISK_TYPES)
+            },
+            'by_tier': {
+                f'tier_{t + 1}': {
+                    'domestic': scores(domestic_by_tier[t]),
+                    'imported': scores(imported_by_tier[t])
+                }
+                for t in range(contributions.shape[0])
+            },
+            'home_country': str(network.home_countries[target]),
+            'note': 'Contributions by supplier location, before per-tier rounding'
+        }
+    
+    def assess_uncertainty(
+        self,
+        country_code: str,
+        sector_code: str,
+        samples: int = 1000,
+        distribution: str = 'normal',
+        country_spread: float = 0.3,
+        sector_spread: float = 0.2,
+        percentiles: Optional[List[float]] = None,
+        seed: Optional[int] = None
+    ) -> Dict:
+        """
+        Monte Carlo confidence intervals for a country-sector's risk scores.
+        
+        Country and sector risk scores are sampled around their point
+        estimates and all samples are propagated through the supply network
+        at once (see risk_uncertainty).
+        
+        Args:
+            country_code: ISO country code
+            sector_code: Sector code
+            samples: Number of samples
+            distribution: 'normal', 'uniform' or 'triangular'
+            country_spread: Spread of country scores (std or half-width, score points)
+            sector_spread: Spread of sector scores (std or half-width, score points)
+            percentiles: Percentiles to report (default: 5, 25, 50, 75, 95)
+            seed: Random seed for reproducible results
+        
+        Returns:
+            Uncertainty dictionary, or dictionary with 'error'
+        """
+        from risk_uncertainty import simulate_target
+        
+        start = time.perf_counter()
+        network = self.get_supply_network()
+        position = network.node_position(country_code, sector_code)
+        if position is None or not network.valid[position]:
+            return {
+                'error': f"No risk data for {country_code}_{sector_code} in {self.io_model.name}",
+                'country': country_code,
+                'sector': sector_code
+            }
+        
+        simulation = simulate_target(
+            network, position, samples=samples, distribution=distribution,
+            country_spread=country_spread, sector_spread=sector_spread,
+            percentiles=percentiles, seed=seed
+        )
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 2) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        indirect = network.baseline_indirect()
+        return {
+            'country': country_code,
+            'sector': sector_code,
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'samples': samples,
+            'distribution': distribution,
+            'country_spread': country_spread,
+            'sector_spread': sector_spread,
+            'seed': seed,
+            'point_estimate': {
+                'direct_risk': scores(network.direct[position]),
+                'indirect_risk': scores(indirect[position]),
+                'total_risk': scores(network.total_risk(indirect)[position])
+            },
+            'direct_risk': simulation['direct_risk'],
+            'indirect_risk': simulation['indirect_risk'],
+            'total_risk': simulation['total_risk'],
+            'upstream_nodes': simulation['upstream_nodes'],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'methodology': {
+                'sampling': 'country and sector risk scores drawn independently per sample, clipped to 1-5',
+                'propagation': 'all samples at once through the tier path weights of the target',
+                'max_tiers': network.depth
+            }
+        }
+    
+    def explain_paths(
+        self,
+        country_code: str,
+        sector_code: str,
+        k: int = 10,
+        max_depth: Optional[int] = None,
+        risk_type: str = 'mean'
+    ) -> Dict:
+        """
+        The k supply paths that contribute most to a country-sector's indirect risk.
+        
+        Args:
+            country_code: ISO country code
+            sector_code: Sector code
+            k: Number of paths to return
+            max_depth: Maximum path length in tiers (default: max_tiers)
+            risk_type: Risk type to rank by, or 'mean'
+        
+        Returns:
+            Path explanation dictionary, or dictionary with 'error'
+        """
+        from supply_paths import top_paths
+        
+        if risk_type != 'mean' and risk_type not in RISK_TYPES:
+            return {'error': f"Unknown risk type '{risk_type}'", 'available': ['mean'] + RISK_TYPES}
+        
+        network = self.get_supply_network()
+        position = network.node_position(country_code, sector_code)
+        if position is None or not network.valid[position]:
+            return {
+                'error': f"No risk data for {country_code}_{sector_code} in {self.io_model.name}",
+                'country': country_code,
+                'sector': sector_code
+            }
+        
+        result = top_paths(network, position, k=k, depth=max_depth, risk_type=risk_type)
+        result.update({
+            'country': country_code,
+            'sector': sector_code,
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'indirect_risk': {
+                r: round(float(v), 2) for r, v in zip(RISK_TYPES, network.baseline_indirect()[position])
+            }
+        })
+        return result
+    
+    def assess_country_disruption(
+        self,
+        country_codes: List[str],
+        factor: float = 0.0,
+        top_n: int = 20,
+        rank_by: str = 'total',
+        workers: int = 1
+    ) -> Dict:
+        """
+        Sweep country export shocks over all nodes of the model.
+        
+        For each country, its supplier coefficients are scaled by `factor`
+        (0 removes its exports), buyers' supplier weights are renormalised and
+        the total risk of every node is recomputed in one vectorized pass.
+        
+        Args:
+            country_codes: Countries to shock, one scenario each
+            factor: Multiplier for the shocked country's coefficients
+            top_n: Number of most affected nodes to return per country
+            rank_by: 'total' (mean absolute change) or a single risk type
+            workers: Worker processes for multi-country sweeps
+        
+        Returns:
+            Dictionary with one impact entry per country
+        """
+        from disruption_sweep import sweep_country_disruptions
+        
+        network = self.get_supply_network()
+        
+        if workers > 1 and len(country_codes) > 1:
+            from parallel_backend import get_process_backend
+            with get_process_backend(self) as backend:
+                impacts = backend.sweep_country_disruptions(
+                    country_codes, factor=factor, top_n=top_n, rank_by=rank_by, shards=workers
+                )
+        else:
+            impacts = sweep_country_disruptions(
+                network, country_codes, factor=factor, top_n=top_n, rank_by=rank_by
+            )
+        return {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'factor': factor,
+            'rank_by': rank_by,
+            'node_count': network.node_count,
+            'scenarios': impacts,
+            'methodology': {
+                'shock': "shocked country's supplier coefficients x factor, buyer weights renormalised",
+                'substitution': "proportional, among each buyer's indexed top suppliers",
+                'max_tiers': network.depth
+            }
+        }
+    
+    def assess_portfolio(
+        self,
+        holdings: List[Tuple[str, str, float]],
+        top_n: int = 10,
+        score_overrides: Optional[Dict] = None,
+        line_numbers: Optional[List[int]] = None
+    ) -> Dict:
+        """
+        Spend-weighted risk of a portfolio of country-sector holdings.
+        
+        Holdings are aggregated into one spend vector over the network nodes
+        (lines for the same node are summed), and the weighted direct, indirect
+        and total risk are single vector-matrix products with the all-node
+        risk tables.
+        
+        Expected loss uses only the pre-computed expected loss cache (no
+        Climate API calls): Climate API losses are per $1M of asset value, so
+        the portfolio loss is each node's loss rate times its amount.
+        
+        Args:
+            holdings: List of (country_code, sector_code, amount)
+            top_n: Number of top contributing nodes and countries to return
+            score_overrides: Scenario risk scores (see scenario_risk())
+            line_numbers: Request line of each holding, reported for unmatched
+                holdings (default: its index in holdings)
+        
+        Returns:
+            Portfolio dictionary, or dictionary with 'error'
+        """
+        from expected_loss_cache import get_cache
+        
+        network = self.get_supply_network()
+        n = network.node_count
+        
+        positions = np.array(
+            [network.positions.get(f"{country}_{sector}", n) for country, sector, _ in holdings],
+            dtype=np.int64
+        )
+        amounts = np.array([amount for _, _, amount in holdings], dtype=float)
+        matched = network.valid[positions]
+        
+        spend = np.bincount(positions[matched], weights=amounts[matched], minlength=n)[:n]
+        matched_amount = spend.sum()
+        if matched_amount <= 0:
+            return {'error': 'No holdings with risk data'}
+        share = spend / matched_amount
+        
+        scenario = self.scenario_risk(score_overrides) if score_overrides else None
+        if scenario:
+            direct = scenario['direct'][:n]
+            indirect = scenario['indirect']
+            total = scenario['total']
+        else:
+            direct = network.direct[:n]
+            indirect = network.baseline_indirect()
+            total = network.total_risk()
+        
+        # Expected annual loss rate per node (per $1M), from its country's cached Climate API data
+        cache = get_cache()
+        loss_rates = np.zeros(n + 1)
+        has_loss_data = np.zeros(n + 1, dtype=bool)
+        for code in np.unique(network.node_countries):
+            country_obj = self.io_model.get_country(code)
+            climate_data = cache.get(country_obj.name if country_obj else code)
+            if climate_data:
+                in_country = np.flatnonzero(network.node_countries == code)
+                loss_rates[in_country] = climate_data.get('expected_annual_loss', 0)
+                has_loss_data[in_country] = True
+        supplier_loss_rates = (network.weights * loss_rates[network.suppliers]).sum(axis=1)
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 2) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        contributions = share[:, None] * total
+        ranking = np.argsort(-contributions.mean(axis=1), kind='stable')[:top_n]
+        top_contributors = [
+            {
+                'country': network.nodes[i][0],
+                'sector': network.nodes[i][1],
+                'amount': round(float(spend[i]), 2),
+                'share': round(float(share[i]), 4),
+                'total_risk': scores(total[i]),
+                'contribution': {risk_type: round(float(contributions[i, r]), 4) for r, risk_type in enumerate(RISK_TYPES)}
+            }
+            for i in ranking if spend[i] > 0
+        ]
+        
+        countries, inverse = np.unique(network.home_countries, return_inverse=True)
+        country_share = np.bincount(inverse, weights=share, minlength=len(countries))
+        country_contribution = np.zeros((len(countries), len(RISK_TYPES)))
+        np.add.at(country_contribution, inverse, contributions)
+        top_countries = [
+            {
+                'code': str(countries[g]),
+                'share': round(float(country_share[g]), 4),
+                'contribution': {risk_type: round(float(country_contribution[g, r]), 4) for r, risk_type in enumerate(RISK_TYPES)}
+            }
+            for g in np.argsort(-country_contribution.mean(axis=1), kind='stable')[:top_n]
+            if country_share[g] > 0
+        ]
+        
+        unmatched = np.flatnonzero(~matched)
+        line_numbers = line_numbers if line_numbers is not None else range(len(holdings))
+        
+        result = {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'holdings': {
+                'lines': len(holdings),
+                'matched_lines': int(matched.sum()),
+                'unique_nodes': int((spend > 0).sum()),
+                'total_amount': round(float(amounts.sum()), 2),
+                'matched_amount': round(float(matched_amount), 2)
+            },
+            'direct_risk': scores(share @ direct),
+            'indirect_risk': scores(share @ indirect),
+            'total_risk': scores(share @ total),
+            'expected_loss': {
+                'direct_annual_loss': round(float(spend @ loss_rates[:n]) / 1e6, 2),
+                'supplier_annual_loss': round(float(spend @ supplier_loss_rates) / 1e6, 2),
+                'coverage': round(float(share @ has_loss_data[:n]), 4),
+                'note': 'Per-$1M expected annual losses from cached Climate API data times holding amounts'
+            },
+            'top_contributors': top_contributors,
+            'top_countries': top_countries,
+            'unmatched': [
+                {'line': int(line_numbers[i]), 'country': holdings[i][0], 'sector': holdings[i][1]}
+                for i in unmatched[:20]
+            ],
+            'unmatched_lines': len(unmatched)
+        }
+        if scenario:
+            result['scenario'] = scenario['summary']
+        return result
+    
+    def rank_sector_countries(
+        self,
+        sector_code: str,
+        weights: Optional[Dict[str, float]] = None,
+        include_extended: bool = False,
+        include_rest_of_world: bool = False,
+        exclude_countries: Optional[List[str]] = None,
+        max_score: Optional[float] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """
+        Rank all countries for one sector as alternative sourcing locations.
+        
+        Scores come from the all-node risk tables of the supply network, so
+        every country is evaluated in the same vectorized pass. The ranking
+        score is the weighted mean of the total risk over risk types.
+        
+        Args:
+            sector_code: Sector to rank countries for
+            weights: Risk-type weights (default: equal); missing types weigh 0
+            include_extended: Include firm heterogeneity splits (e.g. CN1)
+            include_rest_of_world: Include the rest-of-world region
+            exclude_countries: Country codes to leave out
+            max_score: Only countries whose score is at most this value
+            descending: Highest risk first (default: lowest first)
+            limit: Maximum number of countries to return
+        
+        Returns:
+            Ranking dictionary, or dictionary with 'error'
+        """
+        if weights:
+            unknown = [risk_type for risk_type in weights if risk_type not in RISK_TYPES]
+            if unknown:
+                return {'error': f"Unknown risk types in weights: {', '.join(unknown)}", 'available': RISK_TYPES}
+            weight_vector = np.array([float(weights.get(risk_type, 0.0)) for risk_type in RISK_TYPES])
+            if (weight_vector < 0).any() or weight_vector.sum() <= 0:
+                return {'error': 'Weights must be non-negative with a positive sum'}
+        else:
+            weight_vector = np.ones(len(RISK_TYPES))
+        weight_vector = weight_vector / weight_vector.sum()
+        
+        network = self.get_supply_network()
+        n = network.node_count
+        in_sector = (network.node_sectors == sector_code) & network.valid[:n]
+        if not in_sector.any():
+            return {'error': f"Sector '{sector_code}' not found in {self.io_model.name}"}
+        
+        countries = {c.code: c for c in self.io_model.get_countries()}
+        excluded = {code.upper() for code in exclude_countries or []}
+        keep = in_sector.copy()
+        for i in np.flatnonzero(in_sector):
+            code = network.nodes[i][0]
+            country = countries.get(code)
+            # Firm splits (CN1, MX2, ...) map to a different parent country
+            is_extended = code != network.home_countries[i] or getattr(country, 'is_extended', False)
+            is_rest_of_world = code == 'ROW' or getattr(country, 'is_rest_of_world', False)
+            if code in excluded or network.home_countries[i] in excluded:
+                keep[i] = False
+            elif (is_extended and not include_extended) or (is_rest_of_world and not include_rest_of_world):
+                keep[i] = False
+        
+        direct = network.direct[:n]
+        indirect = network.baseline_indirect()
+        total = network.total_risk(indirect)
+        score = total @ weight_vector
+        if max_score is not None:
+            keep &= score <= max_score
+        
+        positions = np.flatnonzero(keep)
+        order = np.argsort(-score[positions] if descending else score[positions], kind='stable')
+        positions = positions[order]
+        
+        # Position of each country in a ranking by every single risk type (1 = lowest risk)
+        type_ranks = np.empty((len(positions), len(RISK_TYPES)), dtype=np.int64)
+        for r in range(len(RISK_TYPES)):
+            type_ranks[np.argsort(total[positions, r], kind='stable'), r] = np.arange(1, len(positions) + 1)
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 2) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        ranking = [
+            {
+                'rank': rank,
+                'country': network.nodes[i][0],
+                'country_name': countries[network.nodes[i][0]].name if network.nodes[i][0] in countries else network.nodes[i][0],
+                'score': round(float(score[i]), 2),
+                'direct_risk': scores(direct[i]),
+                'indirect_risk': scores(indirect[i]),
+                'total_risk': scores(total[i]),
+                'risk_type_ranks': dict(zip(RISK_TYPES, type_ranks[rank - 1].tolist()))
+            }
+            for rank, i in enumerate(positions[:limit] if limit else positions, start=1)
+        ]
+        
+        sector = self.io_model.get_sector(sector_code)
+        return {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'sector': {'code': sector_code, 'name': sector.name if sector else sector_code},
+            'weights': dict(zip(RISK_TYPES, np.round(weight_vector, 4).tolist())),
+            'order': 'descending' if descending else 'ascending',
+            'countries_evaluated': int(in_sector.sum()),
+            'countries_matching': len(positions),
+            'ranking': ranking
+        }
+    
+    def recommend_sourcing_mix(
+        self,
+        buyer_country: str,
+        buyer_sector: str,
+        input_sector: str,
+        weights: Optional[Dict[str, float]] = None,
+        max_share: float = 0.4,
+        country_caps: Optional[Dict[str, float]] = None,
+        exclude_countries: Optional[List[str]] = None,
+        include_extended: bool = False,
+        include_rest_of_world: bool = False
+    ) -> Dict:
+        """
+        Mix of supplier countries for one purchased sector with the lowest weighted risk.
+        
+        Candidate countries and their scores come from rank_sector_countries()
+        (the all-node risk tables), and the shares solve the allocation LP
+        (see sourcing_optimizer). The buyer's current mix is read from its I-O
+        coefficients for the sector.
+        
+        Args:
+            buyer_country: Buyer country code
+            buyer_sector: Buyer sector code
+            input_sector: Sector the buyer purchases
+            weights: Risk-type weights (default: equal)
+            max_share: Maximum share of any single country
+            country_caps: Per-country maximum shares overriding max_share
+            exclude_countries: Country codes that must not be used
+            include_extended: Allow firm heterogeneity splits (e.g. CN1)
+            include_rest_of_world: Allow the rest-of-world region
+        
+        Returns:
+            Recommendation dictionary, or dictionary with 'error'
+        """
+        from sourcing_optimizer import allocate_min_risk
+        
+        start = time.perf_counter()
+        is_valid, error = self.io_model.validate_country_sector(buyer_country, buyer_sector)
+        if not is_valid:
+            return {'error': error, 'country': buyer_country, 'sector': buyer_sector}
+        
+        candidates = self.rank_sector_countries(
+            input_sector, weights=weights,
+            include_extended=include_extended,
+            include_rest_of_world=include_rest_of_world,
+            exclude_countries=exclude_countries
+        )
+        if 'error' in candidates:
+            return candidates
+        everyone = self.rank_sector_countries(
+            input_sector, weights=weights, include_extended=True, include_rest_of_world=True
+        )
+        scores = {entry['country']: entry['score'] for entry in everyone['ranking']}
+        
+        ranking = candidates['ranking']
+        caps = {code.upper(): cap for code, cap in (country_caps or {}).items()}
+        cap_vector = np.array([caps.get(entry['country'], max_share) for entry in ranking])
+        shares = allocate_min_risk(np.array([entry['score'] for entry in ranking]), cap_vector)
+        if shares is None:
+            return {
+                'error': 'No feasible mix: the share caps of the allowed countries add up to less than 100%',
+                'countries_allowed': len(ranking),
+                'capacity': round(float(cap_vector.sum()), 4)
+            }
+        
+        recommended = [
+            {
+                'country': entry['country'],
+                'country_name': entry['country_name'],
+                'share': round(float(share), 4),
+                'score': entry['score'],
+                'total_risk': entry['total_risk']
+            }
+            for entry, share in zip(ranking, shares) if share > 0
+        ]
+        recommended_score = float(sum(entry['score'] * share for entry, share in zip(ranking, shares)))
+        
+        # Current mix: the buyer's I-O coefficients on the sector in every country
+        purchases = {
+            country.code: self.io_model.get_coefficient(country.code, input_sector, buyer_country, buyer_sector)
+            for country in self.io_model.get_countries()
+        }
+        purchases = {code: coefficient for code, coefficient in purchases.items() if coefficient > 0 and code in scores}
+        purchased = sum(purchases.values())
+        current = sorted(
+            (
+                {'country': code, 'share': round(coefficient / purchased, 4), 'score': scores[code]}
+                for code, coefficient in purchases.items()
+            ),
+            key=lambda entry: -entry['share']
+        )
+        current_score = sum(scores[code] * coefficient / purchased for code, coefficient in purchases.items()) if purchased else None
+        
+        return {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'buyer': {'country': buyer_country, 'sector': buyer_sector},
+            'input_sector': candidates['sector'],
+            'weights': candidates['weights'],
+            'constraints': {
+                'max_share': max_share,
+                'country_caps': caps,
+                'excluded_countries': sorted({code.upper() for code in exclude_countries or []}),
+                'include_extended': include_extended,
+                'include_rest_of_world': include_rest_of_world
+            },
+            'recommended_mix': recommended,
+            'recommended_score': round(recommended_score, 3),
+            'current_mix': current,
+            'current_score': round(current_score, 3) if current_score is not None else None,
+            'risk_reduction': round(current_score - recommended_score, 3) if current_score is not None else None,
+            'countries_evaluated': len(ranking),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+    
+    def country_profile(self, country_code: str, include_names: bool = False) -> Dict:
+        """
+        Direct, indirect and total risk of every sector of a country.
+        
+        All sectors are read from the all-node risk tables of the supply
+        network in one pass. The payload is columnar: one row of scores per
+        sector, in the order of `risk_types`.
+        
+        Args:
+            country_code: Country code
+            include_names: Add the sector names
+        
+        Returns:
+            Profile dictionary, or dictionary with 'error'
+        """
+        network = self.get_supply_network()
+        n = network.node_count
+        positions = np.flatnonzero((network.node_countries == country_code) & network.valid[:n])
+        if len(positions) == 0:
+            return {'error': f"Country '{country_code}' not found in {self.io_model.name}"}
+        
+        direct = network.direct[positions]
+        indirect = network.baseline_indirect()[positions]
+        total = network.total_risk()[positions]
+        sectors = [network.nodes[i][1] for i in positions]
+        mean_total = total.mean(axis=1)
+        
+        country = self.io_model.get_country(country_code)
+        profile = {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'country': {'code': country_code, 'name': country.name if country else country_code},
+            'risk_types': RISK_TYPES,
+            'sectors': sectors,
+            'direct': np.round(direct, 2).tolist(),
+            'indirect': np.round(indirect, 2).tolist(),
+            'total': np.round(total, 2).tolist(),
+            'summary': {
+                'mean_total': dict(zip(RISK_TYPES, np.round(total.mean(axis=0), 2).tolist())),
+                'highest_risk_sector': sectors[int(np.argmax(mean_total))],
+                'lowest_risk_sector': sectors[int(np.argmin(mean_total))]
+            }
+        }
+        if include_names:
+            profile['sector_names'] = [
+                sector.name if sector else code
+                for code, sector in ((code, self.io_model.get_sector(code)) for code in sectors)
+            ]
+        return profile
+    
+    def supply_subgraph(
+        self,
+        country_code: str,
+        sector_code: str,
+        depth: Optional[int] = None,
+        max_nodes: int = 200,
+        min_coefficient: float = 0.0,
+        include_names: bool = False
+    ) -> Dict:
+        """
+        Upstream supply network of a country-sector in a compact form for drawing.
+        
+        One traversal of the supplier index (see SupplyNetwork.upstream_subgraph)
+        gives a node table with per-node risk rows, in the order of
+        `risk_types`, and parallel edge arrays indexing into it.
+        
+        Args:
+            country_code: Country code
+            sector_code: Sector code
+            depth: Number of supplier tiers (default: max_tiers)
+            max_nodes: Maximum number of nodes, including the target
+            min_coefficient: Drop supplier links with a smaller I-O coefficient
+            include_names: Add country and sector names to the node table
+        
+        Returns:
+            Subgraph dictionary, or dictionary with 'error'
+        """
+        is_valid, error = self.io_model.validate_country_sector(country_code, sector_code)
+        if not is_valid:
+            return {'error': error, 'country': country_code, 'sector': sector_code}
+        
+        network = self.get_supply_network()
+        position = network.node_position(country_code, sector_code)
+        if position is None:
+            return {
+                'error': f"{country_code}_{sector_code} is not in the supply network of {self.io_model.name}",
+                'country': country_code,
+                'sector': sector_code
+            }
+        
+        subgraph = network.upstream_subgraph(position, depth=depth, max_nodes=max_nodes, min_coefficient=min_coefficient)
+        nodes = subgraph['nodes']
+        valid = network.valid[nodes]
+        
+        def rows(table) -> List:
+            # Nodes without risk data get null rows
+            return [row if ok else None for row, ok in zip(np.round(table[nodes], 2).tolist(), valid)]
+        
+        indirect = network.baseline_indirect()
+        result = {
+            'model': {'name': self.io_model.name, 'version': self.io_model.version},
+            'target': {'country': country_code, 'sector': sector_code},
+            'depth': network.depth if depth is None else depth,
+            'truncated': subgraph['truncated'],
+            'risk_types': RISK_TYPES,
+            'nodes': {
+                'country': [network.nodes[i][0] for i in nodes],
+                'sector': [network.nodes[i][1] for i in nodes],
+                'tier': subgraph['tiers'].tolist(),
+                'direct': rows(network.direct),
+                'indirect': rows(indirect),
+                'total': rows(network.total_risk(indirect))
+            },
+            'edges': {
+                'supplier': subgraph['suppliers'].tolist(),
+                'buyer': subgraph['buyers'].tolist(),
+                'coefficient': np.round(subgraph['coefficients'], 6).tolist()
             }
         }
+        if include_names:
+            countries = {c.code: c.name for c in self.io_model.get_countries()}
+            sectors = {s.code: s.name for s in self.io_model.get_sectors()}
+            result['nodes']['country_name'] = [countries.get(c, c) for c in result['nodes']['country']]
+            result['nodes']['sector_name'] = [sectors.get(s, s) for s in result['nodes']['sector']]
+        return result
     
     def get_model_info(self) -> Dict:
         """Get information about the underlying I-O model"""
@@ -0,0 +1,192 @@
+"""
+Global Risk Hotspot Index
+
+Answers "top 100 country-sectors globally by modern slavery total risk" and
+similar queries from sorted indexes instead of sorting per request. The index
+is built once over the all-node risk tables of a SupplyNetwork. It keeps one
+descending order per (measure, risk type) plus precomputed boolean masks for
+every region and sector category. A query combines the masks it needs, keeps
+the sorted positions that pass and slices out one page, which takes well
+under a millisecond for the ~4,800 nodes of OECD ICIO.
+
+Regions and sector categories come from the risk data (OECD_COUNTRIES and
+OECD_SECTORS). Firm splits (CN1, MX2, ...) take their parent country's region.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from io_model_base import IOModel
+from oecd_data_full import OECD_COUNTRIES, OECD_SECTORS
+from risk_calculator_v2 import RISK_TYPES
+from sector_code_mapper import get_risk_sector_for_oecd
+from supply_network import SupplyNetwork
+
+MEASURES = ['total', 'direct', 'indirect']
+EXTENDED_FILTERS = ['include', 'exclude', 'only']
+UNKNOWN = 'Unknown'
+
+
+class HotspotIndex:
+    """Per-risk-type sorted node orders and filter masks over a SupplyNetwork"""
+    
+    def __init__(self, network: SupplyNetwork, io_model: IOModel):
+        """
+        Args:
+            network: Supply network whose risk tables are indexed
+            io_model: I-O model (country names and firm-split flags)
+        """
+        from country_codes import get_country_code
+        
+        n = network.node_count
+        self.network = network
+        self.valid = network.valid[:n].copy()
+        
+        indirect = network.baseline_indirect()
+        self.values = {
+            'direct': np.asarray(network.direct[:n]),
+            'indirect': indirect,
+            'total': network.total_risk(indirect)
+        }
+        
+        # Descending order of every (measure, risk type) over valid nodes ('mean' averages the types)
+        valid_positions = np.flatnonzero(self.valid)
+        self.orders = {}
+        for measure, table in self.values.items():
+            columns = dict(zip(RISK_TYPES, table.T))
+            columns['mean'] = table.mean(axis=1)
+            for risk_type, column in columns.items():
+                order = np.argsort(-column[valid_positions], kind='stable')
+                self.orders[(measure, risk_type)] = valid_positions[order]
+        
+        regions = {c['code']: c['region'] for c in OECD_COUNTRIES}
+        categories = {s['code']: s['category'] for s in OECD_SECTORS}
+        countries = {c.code: c for c in io_model.get_countries()}
+        self.country_names = {code: country.name for code, country in countries.items()}
+        
+        region_cache = {}
+        for code in np.unique(network.node_countries):
+            try:
+                region_cache[code] = regions.get(get_country_code(str(code)), UNKNOWN)
+            except KeyError:
+                region_cache[code] = regions.get(str(code), UNKNOWN)
+        category_cache = {}
+        for code in np.unique(network.node_sectors):
+            try:
+                category_cache[code] = categories.get(get_risk_sector_for_oecd(str(code)), UNKNOWN)
+            except ValueError:
+                category_cache[code] = categories.get(str(code), UNKNOWN)
+        
+        self.node_regions = np.array([region_cache[code] for code in network.node_countries])
+        self.node_categories = np.array([category_cache[code] for code in network.node_sectors])
+        # Firm splits map to a different parent country (the metadata flag is not always set)
+        self.extended = (network.node_countries != network.home_countries) | np.array([
+            getattr(countries.get(code), 'is_extended', False) for code in network.node_countries
+        ], dtype=bool)
+        
+        self.region_masks = {region: self.node_regions == region for region in np.unique(self.node_regions)}
+        self.category_masks = {
+            category: self.node_categories == category for category in np.unique(self.node_categories)
+        }
+    
+    @property
+    def regions(self) -> List[str]:
+        return sorted(self.region_masks)
+    
+    @property
+    def categories(self) -> List[str]:
+        return sorted(self.category_masks)
+    
+    def _combined_mask(self, masks: Dict[str, np.ndarray], names: List[str]) -> np.ndarray:
+        combined = np.zeros(len(self.valid), dtype=bool)
+        for name in names:
+            combined |= masks[name]
+        return combined
+    
+    def query(
+        self,
+        risk_type: str = 'mean',
+        measure: str = 'total',
+        regions: Optional[List[str]] = None,
+        categories: Optional[List[str]] = None,
+        extended: str = 'include',
+        offset: int = 0,
+        limit: int = 100
+    ) -> Dict:
+        """
+        One page of country-sectors sorted by risk, highest first.
+        
+        Args:
+            risk_type: Risk type to sort by, or 'mean' (average over types)
+            measure: 'total', 'direct' or 'indirect'
+            regions: Only nodes in these regions (default: all)
+            categories: Only sectors in these categories (default: all)
+            extended: 'include', 'exclude' or 'only' firm-split nodes
+            offset: Number of matching nodes to skip
+            limit: Page size
+        
+        Returns:
+            Page dictionary, or dictionary with 'error'
+        """
+        start = time.perf_counter()
+        
+        if measure not in MEASURES:
+            return {'error': f"Unknown measure '{measure}'", 'available': MEASURES}
+        if risk_type != 'mean' and risk_type not in RISK_TYPES:
+            return {'error': f"Unknown risk type '{risk_type}'", 'available': ['mean'] + RISK_TYPES}
+        if extended not in EXTENDED_FILTERS:
+            return {'error': f"Unknown extended filter '{extended}'", 'available': EXTENDED_FILTERS}
+        unknown = [r for r in regions or [] if r not in self.region_masks]
+        if unknown:
+            return {'error': f"Unknown regions: {', '.join(unknown)}", 'available': self.regions}
+        unknown = [c for c in categories or [] if c not in self.category_masks]
+        if unknown:
+            return {'error': f"Unknown categories: {', '.join(unknown)}", 'available': self.categories}
+        
+        order = self.orders[(measure, risk_type)]
+        if regions or categories or extended != 'include':
+            mask = np.ones(len(self.valid), dtype=bool)
+            if regions:
+                mask &= self._combined_mask(self.region_masks, regions)
+            if categories:
+                mask &= self._combined_mask(self.category_masks, categories)
+            if extended == 'exclude':
+                mask &= ~self.extended
+            elif extended == 'only':
+                mask &= self.extended
+            order = order[mask[order]]
+        
+        page = order[offset:offset + limit]
+        table = self.values[measure]
+        
+        def scores(values) -> Dict:
+            return {risk_type: round(float(values[r]), 2) for r, risk_type in enumerate(RISK_TYPES)}
+        
+        results = []
+        for rank, i in enumerate(page, start=offset + 1):
+            country, sector = self.network.nodes[i]
+            results.append({
+                'rank': rank,
+                'country': country,
+                'country_name': self.country_names.get(country, country),
+                'sector': sector,
+                'region': str(self.node_regions[i]),
+                'category': str(self.node_categories[i]),
+                'is_extended': bool(self.extended[i]),
+                'score': round(float(table[i].mean() if risk_type == 'mean' else table[i, RISK_TYPES.index(risk_type)]), 2),
+                measure + '_risk': scores(table[i])
+            })
+        
+        return {
+            'risk_type': risk_type,
+            'measure': measure,
+            'filters': {'regions': regions or [], 'categories': categories or [], 'extended': extended},
+            'total_matches': len(order),
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if offset + limit < len(order) else None,
+            'results': results,
+            'query_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
@@ -0,0 +1,179 @@
+"""
+Monte Carlo Uncertainty for Risk Scores
+
+The country and sector risk_scores in oecd_data_full are point estimates.
+This module samples them from a distribution around each estimate and
+propagates all samples through the supply network at once.
+
+The propagation is cheap because a target's unrounded indirect risk is linear
+in the direct risk of its upstream nodes: the tier masses from
+SupplyNetwork.tier_masses() give each node's total path weight. Direct risk is
+0.7 x country + 0.3 x sector score, so the node masses can be summed into one
+mass per risk-data country and one per risk-data sector. Then the indirect
+risk of every sample is two matrix products, (S, C, 5) with (C,) and
+(S, K, 5) with (K,). The network is traversed once however many samples are
+drawn.
+
+Scores are drawn SAMPLE_CHUNK samples at a time, so memory stays bounded up
+to MAX_SAMPLES; only the (S, 5) results of every chunk are kept.
+
+Samples use the unrounded scores. The deterministic assessment rounds at
+every tier, so the two can differ by a few hundredths.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from oecd_data_full import OECD_COUNTRIES, OECD_SECTORS
+from risk_calculator_v2 import RISK_TYPES
+from sector_code_mapper import get_risk_sector_for_oecd
+from supply_network import SupplyNetwork
+
+DISTRIBUTIONS = ['normal', 'uniform', 'triangular']
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+SCORE_RANGE = (1.0, 5.0)  # Risk scores are on a 1-5 scale
+MAX_SAMPLES = 100000
+SAMPLE_CHUNK = 5000  # Samples drawn at once (about 20 MB of scores)
+
+
+def sample_scores(
+    estimates: np.ndarray,
+    samples: int,
+    distribution: str,
+    spread: float,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draw samples of a (rows, 5) table of score estimates.
+    
+    Args:
+        estimates: Point estimates
+        samples: Number of samples
+        distribution: 'normal' (spread = standard deviation), 'uniform' or
+            'triangular' (spread = half-width around the estimate)
+        spread: Spread in score points
+        rng: Random generator
+    
+    Returns:
+        (samples, rows, 5) array, clipped to SCORE_RANGE
+    """
+    shape = (samples,) + estimates.shape
+    if distribution == 'normal':
+        drawn = rng.normal(estimates, spread, size=shape)
+    elif distribution == 'uniform':
+        drawn = rng.uniform(estimates - spread, estimates + spread, size=shape)
+    elif distribution == 'triangular':
+        if spread > 0:
+            drawn = rng.triangular(estimates - spread, estimates, estimates + spread, size=shape)
+        else:
+            drawn = np.broadcast_to(estimates, shape)
+    else:
+        raise ValueError(f"Unknown distribution '{distribution}'")
+    return np.clip(drawn, *SCORE_RANGE)
+
+
+def _risk_data_indexes(network: SupplyNetwork):
+    """Row of every node's country in OECD_COUNTRIES and sector in OECD_SECTORS (-1 if none)"""
+    from country_codes import get_country_code
+    
+    country_rows = {c['code']: row for row, c in enumerate(OECD_COUNTRIES)}
+    sector_rows = {s['code']: row for row, s in enumerate(OECD_SECTORS)}
+    
+    def country_row(code: str) -> int:
+        try:
+            code = get_country_code(code)
+        except KeyError:
+            pass
+        return country_rows.get(code, -1)
+    
+    def sector_row(code: str) -> int:
+        try:
+            code = get_risk_sector_for_oecd(code)
+        except ValueError:
+            pass
+        return sector_rows.get(code, -1)
+    
+    countries = {code: country_row(str(code)) for code in np.unique(network.node_countries)}
+    sectors = {code: sector_row(str(code)) for code in np.unique(network.node_sectors)}
+    return (
+        np.array([countries[code] for code in network.node_countries]),
+        np.array([sectors[code] for code in network.node_sectors])
+    )
+
+
+def simulate_target(
+    network: SupplyNetwork,
+    target: int,
+    samples: int = 1000,
+    distribution: str = 'normal',
+    country_spread: float = 0.3,
+    sector_spread: float = 0.2,
+    percentiles: Optional[List[float]] = None,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Percentiles of one target's direct, indirect and total risk under sampled scores.
+    
+    Args:
+        network: Supply network
+        target: Node position of the target
+        samples: Number of Monte Carlo samples
+        distribution: One of DISTRIBUTIONS
+        country_spread: Spread of the country scores (score points)
+        sector_spread: Spread of the sector scores (score points)
+        percentiles: Percentiles to report (default: DEFAULT_PERCENTILES)
+        seed: Random seed for reproducible results
+    
+    Returns:
+        Dictionary with 'direct_risk', 'indirect_risk' and 'total_risk' entries
+        holding mean, std and percentiles per risk type
+    """
+    percentiles = percentiles or DEFAULT_PERCENTILES
+    rng = np.random.default_rng(seed)
+    
+    country_estimates = np.array([[c['risk_scores'].get(r, 0) for r in RISK_TYPES] for c in OECD_COUNTRIES], dtype=float)
+    sector_estimates = np.array([[s['risk_scores'].get(r, 0) for r in RISK_TYPES] for s in OECD_SECTORS], dtype=float)
+    # Total path weight of every upstream node, summed into risk-data countries and sectors
+    node_country, node_sector = _risk_data_indexes(network)
+    mass = np.sum(network.tier_masses(target), axis=0)
+    upstream = np.flatnonzero((mass > 0) & (node_country >= 0) & (node_sector >= 0))
+    country_mass = np.bincount(node_country[upstream], weights=mass[upstream], minlength=len(OECD_COUNTRIES))
+    sector_mass = np.bincount(node_sector[upstream], weights=mass[upstream], minlength=len(OECD_SECTORS))
+    
+    direct_chunks, indirect_chunks = [], []
+    for start in range(0, samples, SAMPLE_CHUNK):
+        size = min(SAMPLE_CHUNK, samples - start)
+        country_samples = sample_scores(country_estimates, size, distribution, country_spread, rng)
+        sector_samples = sample_scores(sector_estimates, size, distribution, sector_spread, rng)
+        direct_chunks.append(
+            0.7 * country_samples[:, node_country[target]]
+            + 0.3 * sector_samples[:, node_sector[target]]
+        )
+        indirect_chunks.append(0.6 * (
+            0.7 * np.einsum('scr,c->sr', country_samples, country_mass)
+            + 0.3 * np.einsum('skr,k->sr', sector_samples, sector_mass)
+        ))
+    direct = np.concatenate(direct_chunks)
+    indirect = np.concatenate(indirect_chunks)
+    total = 0.6 * direct + 0.4 * indirect
+    
+    def summary(values: np.ndarray) -> Dict:
+        quantiles = np.percentile(values, percentiles, axis=0)
+        return {
+            risk_type: {
+                'mean': round(float(values[:, r].mean()), 3),
+                'std': round(float(values[:, r].std()), 3),
+                'percentiles': {
+                    f'p{p:g}': round(float(quantiles[q, r]), 3) for q, p in enumerate(percentiles)
+                }
+            }
+            for r, risk_type in enumerate(RISK_TYPES)
+        }
+    
+    return {
+        'direct_risk': summary(direct),
+        'indirect_risk': summary(indirect),
+        'total_risk': summary(total),
+        'upstream_nodes': len(upstream)
+    }
@@ -0,0 +1,362 @@
+"""
+Shared Assessment Cache Backends
+
+Every gunicorn worker has its own in-process AssessmentCache, so each worker
+misses and recomputes the same hot nodes. A shared backend adds a second tier
+that all workers (and dynos, for Redis) read and write. Results are stored as
+JSON under the same keys as the in-process cache. Both backends keep their
+entries across restarts; keys carry the data version, so entries computed from
+other inputs are simply never read again.
+
+Backends are chosen with ASSESSMENT_CACHE_BACKEND:
+- sqlite:relative/path.db or sqlite:///absolute/path.db - one WAL-mode SQLite
+  file shared by the workers of a machine (no extra service needed)
+- redis://[:password@]host:6379/0 - any server speaking the Redis protocol
+  (Redis, Valkey, KeyDB, ...), through the minimal RESP client below;
+  rediss:// for TLS (add ?ssl_cert_reqs=none for self-signed certificates,
+  as on Heroku Redis)
+- none - no shared tier
+
+Besides entries, a backend holds integer counters that workers add to
+atomically. They aggregate hit/miss accounting across workers and carry a
+generation number that is bumped whenever entries are invalidated, so the
+other workers drop their in-process copies.
+"""
+
+import os
+import select
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+MAX_SHARED_ENTRIES = int(os.environ.get('SHARED_CACHE_MAX_ENTRIES', 20000))  # SQLite only
+SQLITE_TIMEOUT = 5.0  # Seconds to wait for another worker's write lock
+REDIS_TIMEOUT = 2.0  # Seconds per connect / reply
+REDIS_NAMESPACE = 'scr:assessment'
+
+
+class SharedCacheBackend(ABC):
+    """Interface of a cache tier shared between worker processes"""
+    
+    name = 'none'
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Stored value of a key, or None if missing or expired"""
+        pass
+    
+    @abstractmethod
+    def put(self, key: str, value: str, ttl: float):
+        """Store a value that expires after ttl seconds"""
+        pass
+    
+    @abstractmethod
+    def delete(self, keys: List[str]):
+        pass
+    
+    @abstractmethod
+    def keys(self, prefix: str = '') -> List[str]:
+        """All stored keys starting with prefix"""
+        pass
+    
+    def clear(self):
+        self.delete(self.keys())
+    
+    @abstractmethod
+    def add_counters(self, deltas: Dict[str, int]):
+        """Atomically add to named counters"""
+        pass
+    
+    @abstractmethod
+    def counters(self) -> Dict[str, int]:
+        pass
+    
+    def entry_count(self) -> Optional[int]:
+        """Number of stored entries, if the backend can count them cheaply"""
+        return None
+
+
+class SQLiteCacheBackend(SharedCacheBackend):
+    """
+    Shared cache in a SQLite file.
+    
+    WAL mode lets workers read while another writes. Every thread has its
+    own connection. Expired and excess entries (oldest first) are pruned
+    every PRUNE_EVERY puts rather than on each one.
+    """
+    
+    name = 'sqlite'
+    PRUNE_EVERY = 100
+    
+    def __init__(self, path: str, max_entries: int = MAX_SHARED_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS assessments ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        db.execute('CREATE INDEX IF NOT EXISTS assessments_expiry ON assessments (expires_at)')
+        db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+    
+    def get(self, key: str) -> Optional[str]:
+        row = self._db().execute(
+            'SELECT value FROM assessments WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def put(self, key: str, value: str, ttl: float):
+        db = self._db()
+        db.execute(
+            'INSERT OR REPLACE INTO assessments (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl)
+        )
+        self._puts += 1
+        if self._puts % self.PRUNE_EVERY == 0:
+            self.prune()
+    
+    def prune(self):
+        """Delete expired entries, then the oldest beyond max_entries"""
+        db = self._db()
+        db.execute('DELETE FROM assessments WHERE expires_at <= ?', (time.time(),))
+        excess = db.execute('SELECT COUNT(*) FROM assessments').fetchone()[0] - self.max_entries
+        if excess > 0:
+            db.execute(
+                'DELETE FROM assessments WHERE key IN '
+                '(SELECT key FROM assessments ORDER BY expires_at LIMIT ?)', (excess,)
+            )
+    
+    def delete(self, keys: List[str]):
+        if keys:
+            self._db().executemany('DELETE FROM assessments WHERE key = ?', [(key,) for key in keys])
+    
+    def keys(self, prefix: str = '') -> List[str]:
+        rows = self._db().execute(
+            'SELECT key FROM assessments WHERE key >= ? AND key < ?', (prefix, prefix + '\U0010ffff')
+        )
+        return [row[0] for row in rows]
+    
+    def clear(self):
+        self._db().execute('DELETE FROM assessments')
+    
+    def add_counters(self, deltas: Dict[str, int]):
+        self._db().executemany(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+            list(deltas.items())
+        )
+    
+    def counters(self) -> Dict[str, int]:
+        return dict(self._db().execute('SELECT name, value FROM counters'))
+    
+    def entry_count(self) -> Optional[int]:
+        return self._db().execute(
+            'SELECT COUNT(*) FROM assessments WHERE expires_at > ?', (time.time(),)
+        ).fetchone()[0]
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RespConnection:
+    """
+    Minimal client for the Redis serialization protocol (RESP2).
+    
+    One socket per backend, used under a lock. A connection the server has
+    closed while idle is re-opened before the next command is sent.
+    """
+    
+    def __init__(self, host: str, port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = REDIS_TIMEOUT, ssl_context: Optional[ssl.SSLContext] = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.ssl_context is not None:
+            self._sock = self.ssl_context.wrap_socket(self._sock, server_hostname=self.host)
+        self._file = self._sock.makefile('rb')
+        if self.password:
+            self._command(('AUTH', self.password))
+        if self.db:
+            self._command(('SELECT', self.db))
+    
+    def close(self):
+        if self._sock is not None:
+            try:
+                if self._file is not None:
+                    self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+    
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+    
+    def _read(self):
+        line = self._file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by server')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise RespError(body.decode('utf-8'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            return None if length < 0 else self._file.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(body)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line[:50]!r}")
+    
+    def _command(self, args):
+        self._sock.sendall(self._encode(args))
+        return self._read()
+    
+    def execute(self, *args):
+        """
+        Send one command and return its decoded reply (bulk strings as bytes).
+        
+        Only connecting is retried. Once a command has been sent it may have
+        been applied, so an error while sending or reading is raised rather
+        than retried (HINCRBY must not be applied twice).
+        """
+        with self._lock:
+            if self._sock is not None and self._is_stale():
+                self.close()
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    break
+                except OSError:
+                    self.close()
+                    if attempt:
+                        raise
+            try:
+                return self._command(args)
+            except OSError:
+                self.close()
+                raise
+    
+    def _is_stale(self) -> bool:
+        """Whether the server closed the idle connection (it is readable with no pending reply)"""
+        try:
+            ready, _, _ = select.select([self._sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(ready)
+
+
+def _glob_escape(text: str) -> str:
+    return ''.join('\\' + c if c in '*?[]\\' else c for c in text)
+
+
+class RedisCacheBackend(SharedCacheBackend):
+    """
+    Shared cache on a Redis-protocol server.
+    
+    Entries expire through the server's own TTL (SET ... PX) and memory is
+    bounded by its maxmemory policy (e.g. allkeys-lru). Counters live in one
+    hash (HINCRBY).
+    """
+    
+    name = 'redis'
+    
+    def __init__(self, connection: RespConnection, namespace: str = REDIS_NAMESPACE):
+        self.connection = connection
+        self.prefix = f"{namespace}:"
+        self.counters_key = f"{namespace}-counters"
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self.connection.execute('GET', self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+    
+    def put(self, key: str, value: str, ttl: float):
+        self.connection.execute('SET', self.prefix + key, value, 'PX', max(1, int(ttl * 1000)))
+    
+    def delete(self, keys: List[str]):
+        for start in range(0, len(keys), 500):
+            self.connection.execute('DEL', *[self.prefix + key for key in keys[start:start + 500]])
+    
+    def keys(self, prefix: str = '') -> List[str]:
+        pattern = _glob_escape(self.prefix + prefix) + '*'
+        found, cursor = [], b'0'
+        while True:
+            cursor, batch = self.connection.execute('SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            found.extend(key.decode('utf-8')[len(self.prefix):] for key in batch)
+            if cursor == b'0':
+                return list(dict.fromkeys(found))  # SCAN may repeat keys
+    
+    def add_counters(self, deltas: Dict[str, int]):
+        for name, delta in deltas.items():
+            self.connection.execute('HINCRBY', self.counters_key, name, delta)
+    
+    def counters(self) -> Dict[str, int]:
+        reply = self.connection.execute('HGETALL', self.counters_key) or []
+        return {reply[i].decode('utf-8'): int(reply[i + 1]) for i in range(0, len(reply), 2)}
+
+
+def create_shared_backend(url: Optional[str]) -> Optional[SharedCacheBackend]:
+    """
+    Backend for a URL (sqlite:path, redis[s]://host:port/db), or None if empty or 'none'.
+    
+    Raises:
+        ValueError: For an unsupported scheme
+    """
+    if not url or url == 'none':
+        return None
+    if url.startswith('sqlite:'):
+        path = url[len('sqlite:'):]
+        return SQLiteCacheBackend(path[2:] if path.startswith('//') else path)
+    
+    parts = urlsplit(url)
+    if parts.scheme in ('redis', 'rediss'):
+        db = int(parts.path.lstrip('/') or 0)
+        password = unquote(parts.password) if parts.password else None
+        context = None
+        if parts.scheme == 'rediss':
+            context = ssl.create_default_context()
+            if parse_qs(parts.query).get('ssl_cert_reqs') == ['none']:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+        return RedisCacheBackend(RespConnection(
+            parts.hostname or 'localhost', parts.port or 6379, db, password, ssl_context=context
+        ))
+    raise ValueError(f"Unsupported assessment cache backend: {url}")
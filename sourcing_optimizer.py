@@ -0,0 +1,40 @@
+"""
+Sourcing Mix Optimisation
+
+Choosing the shares x_c with which an input is bought from each candidate
+country so that the weighted total risk sum(x_c * score_c) is minimal, subject
+to sum(x_c) = 1 and 0 <= x_c <= cap_c, is a linear program with a single
+equality constraint. Its optimum is found greedily: fill the lowest-risk
+country up to its cap, then the next, until the whole demand is placed
+(the continuous knapsack argument). allocate_min_risk() does this in
+O(C log C) for the ~80 candidate countries, without an LP solver.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def allocate_min_risk(scores: np.ndarray, caps: np.ndarray, total: float = 1.0) -> Optional[np.ndarray]:
+    """
+    Minimum-risk allocation of `total` over candidates with per-candidate caps.
+    
+    Args:
+        scores: (C,) risk score per candidate
+        caps: (C,) maximum share per candidate (0 excludes it)
+        total: Amount to allocate
+    
+    Returns:
+        (C,) shares, or None if the caps cannot hold the total
+    """
+    caps = np.clip(np.asarray(caps, dtype=float), 0.0, total)
+    if caps.sum() < total - 1e-9:
+        return None
+    
+    order = np.argsort(scores, kind='stable')
+    filled = np.cumsum(caps[order])
+    # Each candidate takes its cap, or what is left once the cheaper ones are full
+    taken = np.clip(total - (filled - caps[order]), 0.0, caps[order])
+    shares = np.zeros(len(caps))
+    shares[order] = taken
+    return shares
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for background bulk assessment jobs.
+"""
+
+import csv
+import gzip
+import time
+
+from bulk_job_manager import BulkJobManager
+from risk_calculator_v2 import MultiTierRiskCalculator
+
+
+def wait_for(manager, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while manager.get_job_status(job_id)['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    return manager.get_job_status(job_id)
+
+
+def test_bulk_job_writes_all_parameter_sets(synthetic_model, tmp_path):
+    """A job writes one row per node and parameter set, matching assess_risk()"""
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    manager = BulkJobManager(result_dir=str(tmp_path))
+    
+    manager.start_job('job-1', calculator, [{}, {'max_tiers': 1}])
+    status = wait_for(manager, 'job-1')
+    
+    assert status['status'] == 'completed'
+    with gzip.open(status['result_file'], 'rt') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == status['progress']['written']
+    assert {row['parameter_set'] for row in rows} == {'0', '1'}
+    
+    row = next(r for r in rows if (r['parameter_set'], r['country'], r['sector']) == ('0', 'USA', 'C26'))
+    expected = calculator.assess_risk('USA', 'C26', skip_climate=True)
+    assert float(row['total_climate']) == expected['total_risk']['climate']
+    assert float(row['indirect_political']) == expected['indirect_risk']['political']
+
+
+def test_bulk_job_cancellation(synthetic_model, tmp_path):
+    """Queued jobs can be cancelled before they start and leave no result file"""
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    manager = BulkJobManager(result_dir=str(tmp_path), max_concurrent=1)
+    
+    manager.slots.acquire()  # Occupy the only slot so the job stays queued
+    manager.start_job('job-2', calculator, [{}])
+    assert manager.get_job_status('job-2')['status'] == 'queued'
+    assert manager.cancel_job('job-2')
+    manager.slots.release()
+    
+    status = wait_for(manager, 'job-2')
+    assert status['status'] == 'cancelled'
+    assert status['result_file'] is None
+    assert not manager.cancel_job('job-2')
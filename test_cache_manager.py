@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Tests for the assessment cache.
+"""
+
+import fnmatch
+import socketserver
+import threading
+import time
+
+import pytest
+
+import cache_manager
+from cache_manager import AssessmentCache, SingleFlight, estimate_size
+from conftest import SYNTHETIC_COUNTRIES, SYNTHETIC_SECTORS
+from incremental_refresh import apply_risk_score_update
+from oecd_data_full import OECD_COUNTRIES
+from risk_calculator_v2 import MultiTierRiskCalculator
+from shared_cache import RedisCacheBackend, RespConnection, SQLiteCacheBackend, create_shared_backend
+
+
+def test_assessment_cache_bounds_lru_bytes_and_ttl():
+    """Least recently used entries go first, the byte bound holds and expired entries miss"""
+    entry = {'total_risk': {'climate': 2.5}, 'top_suppliers': ['x' * 100]}
+    size = estimate_size(entry)
+    cache = AssessmentCache(max_size=100, max_bytes=3 * size, ttl=60)
+    
+    for key in 'abc':
+        cache.put(key, entry)
+    assert cache.get('a') is entry  # 'a' is now more recent than 'b'
+    cache.put('d', entry)
+    assert cache.get('b') is None and cache.get('a') is entry
+    assert cache.bytes == 3 * size <= cache.max_bytes
+    
+    expiring = AssessmentCache(ttl=0.01)
+    expiring.put('a', entry)
+    time.sleep(0.02)
+    assert expiring.get('a') is None
+    assert expiring.get_stats()['expirations'] == 1 and expiring.bytes == 0
+    
+    # Concurrent puts and gets keep the counters and byte total consistent
+    shared = AssessmentCache(max_size=50, max_bytes=10 ** 9, ttl=60)
+    
+    def work(offset):
+        for i in range(500):
+            shared.put(f'{(offset + i) % 80}', entry)
+            shared.get(f'{i % 80}')
+    
+    threads = [threading.Thread(target=work, args=(t * 7,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = shared.get_stats()
+    assert stats['total_requests'] == 2000 and stats['cache_size'] == 50
+    assert stats['bytes'] == 50 * size
+
+
+class RespStandIn(socketserver.StreamRequestHandler):
+    """The few Redis commands the shared backend uses, on a dict (expiry ignored)"""
+    
+    store = {}
+    
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            self.wfile.write(self.reply(args[0].upper(), args[1:]))
+    
+    def reply(self, command, args):
+        store = self.store
+        if command == 'GET':
+            value = store.get(args[0])
+            return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value.encode()), value.encode())
+        if command == 'SET':
+            store[args[0]] = args[1]
+            return b'+OK\r\n'
+        if command == 'DEL':
+            return b':%d\r\n' % sum(store.pop(key, None) is not None for key in args)
+        if command == 'SCAN':
+            keys = [key for key in store if isinstance(store[key], str) and fnmatch.fnmatchcase(key, args[2])]
+            return b'*2\r\n$1\r\n0\r\n*%d\r\n' % len(keys) + b''.join(
+                b'$%d\r\n%s\r\n' % (len(key), key.encode()) for key in keys
+            )
+        if command == 'HINCRBY':
+            counters = store.setdefault(args[0], {})
+            counters[args[1]] = counters.get(args[1], 0) + int(args[2])
+            return b':%d\r\n' % counters[args[1]]
+        if command == 'HGETALL':
+            items = [str(x).encode() for item in store.get(args[0], {}).items() for x in item]
+            return b'*%d\r\n' % len(items) + b''.join(b'$%d\r\n%s\r\n' % (len(x), x) for x in items)
+        return b'-ERR unknown command\r\n'
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def shared_backend(request, tmp_path):
+    if request.param == 'sqlite':
+        yield SQLiteCacheBackend(str(tmp_path / 'assessments.db'))
+        return
+    RespStandIn.store = {}
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield RedisCacheBackend(RespConnection('127.0.0.1', server.server_address[1]))
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_backend_serves_workers_and_aggregates_stats(shared_backend):
+    """A result cached by one worker is a hit in another; invalidation and counters reach both"""
+    first = AssessmentCache(ttl=60, shared=shared_backend)
+    second = AssessmentCache(ttl=60, shared=shared_backend)
+    result = {'total_risk': {'climate': 2.5}, 'complete': True}
+    
+    assert second.get('oecd:CHN:C26') is None
+    first.put('oecd:CHN:C26', result)
+    first.put('oecd:USA:C26', result)
+    assert second.get('oecd:CHN:C26') == result
+    assert second.get_stats()['shared_hits'] == 1
+    
+    # Invalidation in one worker drops the entry from the backend and, at its next sync, the other's own tier
+    assert second.invalidate(lambda key: key.startswith('oecd:CHN:'), prefix='oecd:') == 1
+    first._sync_shared(force=True)
+    assert first.get('oecd:CHN:C26') is None and first.get('oecd:USA:C26') == result
+    
+    stats = first.get_stats()['shared']
+    assert (stats['hits'], stats['misses'], stats['shared_hits']) == (2, 2, 2)
+    assert stats['errors'] == 0
+
+
+def test_persistent_tier_survives_restart_and_follows_data_version(synthetic_model, tmp_path, monkeypatch):
+    """Entries outlive the process; risk-score revisions carry unaffected entries forward and strand the rest"""
+    calculator = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+    backend_url = f"sqlite:{tmp_path / 'assessments.db'}"
+    monkeypatch.setattr(cache_manager, '_assessment_cache', AssessmentCache(shared=create_shared_backend(backend_url)))
+    result = {'total_risk': {'climate': 2.5}, 'complete': True}
+    version = calculator.cache_version()
+    for country in ('CHN', 'USA'):
+        cache_manager.save_assessment_to_cache(country, 'C26', 'oecd', result, version=version)
+    
+    restarted = AssessmentCache(shared=create_shared_backend(backend_url))
+    assert restarted.get(cache_manager.get_cache_key('CHN', 'C26', 'oecd', version=version)) == result
+    
+    for code in ('FRA', 'CHN'):
+        country = next(c for c in OECD_COUNTRIES if c['code'] == code)
+        monkeypatch.setitem(country, 'risk_scores', dict(country['risk_scores']))
+    
+    # FRA is not in the synthetic model: the data version changes, but no node does
+    report = apply_risk_score_update({'oecd': calculator}, {'FRA': {'political': 9.0}}, {})
+    revised = calculator.cache_version()
+    assert revised != version and report['models'][0]['carried_forward_assessments'] == 2
+    assert cache_manager.get_assessment_from_cache('USA', 'C26', 'oecd', version=revised) == result
+    
+    apply_risk_score_update({'oecd': calculator}, {'CHN': {'political': 9.0}}, {})
+    assert cache_manager.get_assessment_from_cache('CHN', 'C26', 'oecd', version=calculator.cache_version()) is None
+    assert restarted.get(cache_manager.get_cache_key('CHN', 'C26', 'oecd', version=calculator.cache_version())) is None
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    """Callers arriving while the leader computes wait and share its result or its error"""
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if len(calls) > 1:
+            raise ValueError('model failed')
+        return {'total_risk': {'climate': 2.5}}
+    
+    def run_all(count):
+        outcomes = [None] * count
+        
+        def request(i):
+            try:
+                outcomes[i] = flights.do('oecd:CHN:C26', compute)
+            except ValueError as e:
+                outcomes[i] = e
+        
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(count)]
+        followers = flights.followers
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while flights.followers < followers + count - 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        started.clear()
+        release.clear()
+        return outcomes
+    
+    outcomes = run_all(8)
+    assert len(calls) == 1
+    assert all(result is outcomes[0][0] for result, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False] + [True] * 7
+    
+    # A failed computation fails every caller that shared it, and the next call starts afresh
+    errors = run_all(4)
+    assert len(calls) == 2 and all(isinstance(e, ValueError) for e in errors)
+    stats = flights.get_stats()
+    assert (stats['computations'], stats['coalesced_requests'], stats['failed_computations']) == (2, 10, 1)
+    assert stats['max_coalesced_per_computation'] == 7 and stats['in_flight'] == 0
+
+
+def test_subtree_cache_gives_uncached_results(synthetic_model, monkeypatch):
+    """Shared subtrees reproduce the uncached recursion, count hits and drop invalidated nodes"""
+    monkeypatch.setattr(cache_manager, '_subtree_cache', cache_manager.SubtreeCache())
+    cache = cache_manager.get_subtree_cache()
+    cached = MultiTierRiskCalculator(synthetic_model)
+    uncached = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+    cached.supplier_top_n = uncached.supplier_top_n = 8  # Keeps the uncached recursion quick
+    targets = [(country, sector) for country in SYNTHETIC_COUNTRIES[:6] for sector in SYNTHETIC_SECTORS[:5]]
+    
+    expected = {target: uncached.calculate_indirect_risk(*target) for target in targets}
+    for target in targets:
+        assert cached.calculate_indirect_risk(*target) == expected[target]
+    stats = cache.get_stats()
+    assert stats['hits'] > 0 and stats['misses'] > 0 and stats['size'] > 0
+    
+    # A second pass is answered from the top-level entries alone
+    for target in targets:
+        assert cached.calculate_indirect_risk(*target) == expected[target]
+    assert cache.get_stats()['hits'] == stats['hits'] + len(targets)
+    assert cache.get_stats()['misses'] == stats['misses']
+    
+    removed = cache.invalidate_nodes(synthetic_model.name, ['USA_C26', 'CHN_C26'])
+    assert removed > 0 and cache.get_stats()['size'] == stats['size'] - removed
+    assert cache.invalidate_nodes('EXIOBASE', ['DEU_A01']) == 0
+    assert cached.calculate_indirect_risk('USA', 'C26') == expected[('USA', 'C26')]
+    assert cache.get_stats()['misses'] > stats['misses']
+
+
+def test_unusable_shared_backend_falls_back_to_in_process_tier(monkeypatch):
+    """A backend that cannot be created leaves the in-process tier working"""
+    monkeypatch.setattr(cache_manager, 'ASSESSMENT_CACHE_BACKEND', 'memcached://localhost')
+    monkeypatch.setattr(cache_manager, '_assessment_cache', None)
+    cache = cache_manager.get_assessment_cache()
+    assert cache.shared is None
+    cache.put('key', {'total_risk': {}})
+    assert cache.get('key') == {'total_risk': {}}
+
+
+class DroppingRespStandIn(RespStandIn):
+    """Applies every command, then closes the connection without replying to the first one"""
+    
+    dropped = False
+    
+    def handle(self):
+        line = self.rfile.readline()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        reply = self.reply(args[0].upper(), args[1:])
+        if DroppingRespStandIn.dropped:
+            self.wfile.write(reply)  # Then close, as a server closing an idle connection
+        DroppingRespStandIn.dropped = True
+
+
+def test_resp_connection_never_repeats_a_sent_command():
+    """A lost reply is not retried, and a socket the server closed while idle is replaced"""
+    RespStandIn.store = {}
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), DroppingRespStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = RespConnection('127.0.0.1', server.server_address[1])
+        with pytest.raises(OSError):
+            connection.execute('HINCRBY', 'counters', 'hits', 1)
+        assert RespStandIn.store['counters'] == {'hits': 1}
+        
+        assert connection.execute('HINCRBY', 'counters', 'hits', 1) == 2
+        time.sleep(0.1)  # The server has closed that connection by now
+        assert connection.execute('HINCRBY', 'counters', 'hits', 1) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
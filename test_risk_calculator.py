@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for time-budgeted (anytime) assessments.
+"""
+
+import time
+
+import pytest
+
+from cache_manager import get_assessment_from_cache
+from risk_calculator_v2 import MultiTierRiskCalculator, RISK_TYPES
+
+
+@pytest.fixture
+def calculator(synthetic_model):
+    return MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+
+
+def test_truncated_indirect_risk_is_within_residual_bound(calculator):
+    """Each truncation depth lies within its residual bound of the full-depth result"""
+    targets = [(c.code, s.code) for c in calculator.io_model.get_countries()[:6]
+               for s in calculator.io_model.get_sectors()[:4]]
+    
+    for country, sector in targets:
+        full, tiers = calculator.calculate_indirect_risk_progressive(country, sector)
+        assert tiers == calculator.max_tiers
+        for depth in range(1, calculator.max_tiers):
+            truncated = calculator.calculate_indirect_risk(country, sector, max_tiers=depth)
+            bound = calculator.get_residual_bound(depth)
+            for risk_type in RISK_TYPES:
+                # Scores and bound are rounded to 2 decimals at every tier
+                assert abs(full[risk_type] - truncated[risk_type]) <= bound[risk_type] + 0.01 * calculator.max_tiers
+    
+    expired, tiers = calculator.calculate_indirect_risk_progressive('USA', 'C26', deadline=time.monotonic() - 1)
+    assert tiers == 1
+    assert expired == calculator.calculate_indirect_risk('USA', 'C26', max_tiers=1)
+    assert calculator.get_residual_bound(calculator.max_tiers) == {risk_type: 0.0 for risk_type in RISK_TYPES}
+
+
+def test_budgeted_assessment_is_completed_in_background(calculator, monkeypatch):
+    """A budget-truncated result is partial, and the background completion caches the full one"""
+    import app_v2
+    
+    partial = calculator.assess_risk('USA', 'C26', skip_climate=True, budget_ms=0)
+    assert partial['completed_tiers'] == 1 and not partial['complete']
+    assert any(value > 0 for value in partial['residual_bound'].values())
+    
+    monkeypatch.setitem(app_v2._model_cache, 'oecd', calculator)
+    app_v2.complete_assessment_in_background('oecd', 'USA', 'C26', skip_climate=True)
+    variant = app_v2._assessment_cache_variant(skip_climate=True)
+    for _ in range(200):
+        cached = get_assessment_from_cache('USA', 'C26', 'oecd', variant, calculator.cache_version())
+        if cached is not None:
+            break
+        time.sleep(0.05)
+    
+    assert cached is not None and cached['complete']
+    expected = calculator.assess_risk('USA', 'C26', skip_climate=True)
+    assert cached['indirect_risk'] == expected['indirect_risk']
+    assert cached['completed_tiers'] == calculator.max_tiers
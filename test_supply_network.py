@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized supply network.
+
+The vectorized propagation must give the same numbers as the recursive
+MultiTierRiskCalculator, which remains the reference implementation.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import SYNTHETIC_COUNTRIES, write_synthetic_coefficients
+from exiobase_model import EXIOBASEModel
+from io_model_base import IOModel
+from oecd_icio_model import OECDICIOModel
+from risk_calculator_v2 import MultiTierRiskCalculator, RISK_TYPES
+
+
+@pytest.fixture(scope='module')
+def calculator(synthetic_model):
+    return MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+
+
+def test_supplier_index_matches_get_suppliers(synthetic_model):
+    """Vectorized index rows equal get_suppliers() for every node"""
+    index = synthetic_model.get_supplier_index(top_n=20, min_coefficient=0.001)
+    
+    for i, (country, sector) in enumerate(index.nodes):
+        expected = [
+            ((s.country, s.sector), s.coefficient)
+            for s in synthetic_model.get_suppliers(country, sector, top_n=20, min_coefficient=0.001)
+        ]
+        actual = [
+            (index.nodes[j], c)
+            for j, c in zip(index.suppliers[i], index.coefficients[i]) if j >= 0
+        ]
+        assert actual == expected
+
+
+def test_customer_index_matches_matrix_rows(synthetic_model):
+    """Indexed get_customers() equals a scan of the matrix row and mirrors get_suppliers()"""
+    index = synthetic_model.get_customer_index(top_n=20, min_coefficient=0.001)
+    
+    for country, sector in index.nodes:
+        expected = synthetic_model._scan_customers(country, sector, 20, 0.001)
+        assert index.lookup(country, sector, 20, 0.001) == expected
+        customers = synthetic_model.get_customers(country, sector, top_n=5, min_coefficient=0.01)
+        assert [((c.country, c.sector), c.coefficient) for c in customers] == [e for e in expected if e[1] > 0.01][:5]
+    
+    customer = synthetic_model.get_customers('THA', 'C26', top_n=1)[0]
+    suppliers = synthetic_model.get_suppliers(customer.country, customer.sector, top_n=200)
+    assert ('THA', 'C26', customer.coefficient) in [(s.country, s.sector, s.coefficient) for s in suppliers]
+    
+    # EXIOBASE applies the same strict threshold
+    exiobase = EXIOBASEModel()
+    exiobase._coefficients = {'CN_C26_US_C29': 0.05, 'CN_C26_DE_C29': 0.02, 'CN_C26_JP_C29': 0.01}
+    assert [c.country for c in exiobase.get_customers('CN', 'C26', min_coefficient=0.02)] == ['US']
+
+
+def test_exiobase_customer_index_matches_scan():
+    """EXIOBASE customers come from its cached index, and fallback indexes cover appended nodes"""
+    exiobase = EXIOBASEModel()
+    exiobase._coefficients = {
+        'CN_D26T27_US_D29T30': 0.05, 'CN_D26T27_DE_D29T30': 0.02, 'CN_D26T27_JP_D29T30': 0.05,
+        'CN_D26T27_ZZ_D29T30': 0.03, 'ZZ_D29T30_US_D41T43': 0.4, 'US_D29T30_DE_D41T43': 0.1,
+    }
+    for country, sector in [('CN', 'D26T27'), ('ZZ', 'D29T30'), ('US', 'D29T30'), ('DE', 'D41T43')]:
+        for top_n, min_coefficient in [(2, 0.0), (10, 0.0), (10, 0.02)]:
+            customers = exiobase.get_customers(country, sector, top_n=top_n, min_coefficient=min_coefficient)
+            expected = exiobase._scan_customers(country, sector, top_n, min_coefficient)
+            assert [((c.country, c.sector), c.coefficient) for c in customers] == expected
+    assert exiobase._customer_index is not None
+    
+    # The default per-node build visits nodes it appends, so ZZ_D29T30 gets its own row
+    index = IOModel.get_customer_index(exiobase, top_n=5)
+    assert index.lookup('CN', 'D26T27', 5, 0.0)[2] == (('ZZ', 'D29T30'), 0.03)
+    assert index.lookup('ZZ', 'D29T30', 5, 0.0) == [(('US', 'D41T43'), 0.4)]
+
+
+@pytest.mark.parametrize('max_tiers', [1, 2, 3])
+def test_propagation_matches_recursion(synthetic_model, max_tiers):
+    """Indirect risk of every node equals calculate_indirect_risk()"""
+    calculator = MultiTierRiskCalculator(synthetic_model, max_tiers=max_tiers)
+    network = calculator.get_supply_network()
+    indirect = network.propagate()
+    
+    for i, (country, sector) in enumerate(network.nodes):
+        if not network.valid[i]:
+            continue
+        expected = calculator.calculate_indirect_risk(country, sector)
+        assert [expected[r] for r in RISK_TYPES] == pytest.approx(list(indirect[i]), abs=1e-9)
+
+
+def test_attribution_sums_to_unrounded_indirect_risk(calculator):
+    """Per-origin contributions add up to the path-enumerated indirect risk"""
+    network = calculator.get_supply_network()
+    
+    def enumerate_paths(node, tier, visited):
+        # Recursive formula without intermediate rounding
+        if tier > calculator.max_tiers or node in visited:
+            return np.zeros(len(RISK_TYPES))
+        total = np.zeros(len(RISK_TYPES))
+        for supplier, weight in zip(network.suppliers[node], network.weights[node]):
+            if supplier == network.node_count or not network.valid[supplier]:
+                continue
+            total += weight * calculator.tier_weights[tier - 1] * (
+                0.6 * network.direct[supplier]
+                + 0.4 * enumerate_paths(supplier, tier + 1, visited | {node})
+            )
+        return total
+    
+    for country, sector in [('USA', 'C26'), ('CN1', 'C29'), ('DEU', 'A01')]:
+        target = network.node_position(country, sector)
+        contributions = network.tier_contributions(target)
+        assert contributions.sum(axis=(0, 1)) == pytest.approx(enumerate_paths(target, 1, frozenset()))
+
+
+def test_attribution_endpoint_payload(calculator):
+    """Attribution groups are consistent with each other"""
+    result = calculator.attribute_indirect_risk('USA', 'C26', top_n=5)
+    
+    for risk_type in RISK_TYPES:
+        by_country = sum(g['contribution'][risk_type] for g in result['by_country'])
+        by_tier = sum(t[risk_type] for t in result['by_tier'].values())
+        assert by_country == pytest.approx(result['attributed_total'][risk_type], abs=1e-3)
+        assert by_tier == pytest.approx(result['attributed_total'][risk_type], abs=1e-3)
+        assert abs(result['attributed_total'][risk_type] - result['indirect_risk'][risk_type]) < 0.05
+        assert len(result['top_contributors'][risk_type]) <= 5
+    
+    assert 'error' in calculator.attribute_indirect_risk('XXX', 'C26')
+
+
+def test_country_profile_endpoint(calculator, monkeypatch):
+    """The profile holds every sector's scores, carries an ETag and 404s for unknown countries"""
+    import app_v2
+    
+    monkeypatch.setattr(app_v2, 'AUTH_ENABLED', False)
+    monkeypatch.setitem(app_v2._model_cache, 'oecd', calculator)
+    client = app_v2.app.test_client()
+    
+    response = client.get('/api/countries/DEU/profile?include_names=true')
+    assert response.status_code == 200
+    profile = response.get_json()
+    assert profile['country']['code'] == 'DEU' and profile['risk_types'] == RISK_TYPES
+    assert len(profile['sector_names']) == len(profile['sectors']) == len(profile['total']) > 0
+    batch = calculator.assess_batch([('DEU', sector) for sector in profile['sectors']], skip_climate=True)
+    for row, result in zip(profile['total'], batch):
+        assert row == pytest.approx([result['total_risk'][r] for r in RISK_TYPES], abs=0.02)
+    
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    # Another body (no names) has another ETag
+    assert client.get('/api/countries/Germany/profile', headers={'If-None-Match': etag}).status_code == 200
+    revalidated = client.get('/api/countries/DEU/profile?include_names=true', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert client.get('/api/countries/XXX/profile').status_code == 404
+
+
+def test_domestic_imported_split(calculator):
+    """Domestic and imported parts add up to the attributed total"""
+    attribution = calculator.attribute_indirect_risk('CN1', 'C26')
+    split = calculator.split_indirect_risk('CN1', 'C26')
+    
+    assert split['home_country'] == 'CHN'
+    for risk_type in RISK_TYPES:
+        total = split['domestic'][risk_type] + split['imported'][risk_type]
+        assert total == pytest.approx(attribution['attributed_total'][risk_type], abs=1e-3)
+        tiers = sum(t['domestic'][risk_type] + t['imported'][risk_type] for t in split['by_tier'].values())
+        assert tiers == pytest.approx(total, abs=1e-3)
+    
+    # A budget-truncated assessment splits only the tiers it computed
+    partial = calculator.assess_risk('CN1', 'C26', skip_climate=True, budget_ms=0, include_split=True)
+    assert list(partial['indirect_risk_split']['by_tier']) == ['tier_1']
+    for risk_type in RISK_TYPES:
+        parts = partial['indirect_risk_split']['domestic'][risk_type] + partial['indirect_risk_split']['imported'][risk_type]
+        assert parts == pytest.approx(partial['indirect_risk'][risk_type], abs=0.01)
+
+
+def test_country_disruption_impact(calculator):
+    """Removing a country moves all its weight to other suppliers; factor 1 changes nothing"""
+    from disruption_sweep import country_disruption_impact
+    
+    network = calculator.get_supply_network()
+    shocked = network.country_mask('CHN')
+    removed = network.reweighted(np.where(shocked, 0.0, 1.0))
+    padded = np.append(shocked, False)
+    
+    assert (removed.weights * padded[removed.suppliers]).sum() == 0
+    totals = removed.weights.sum(axis=1)
+    assert np.allclose(totals[totals > 0], 1.0)
+    
+    impact = country_disruption_impact(network, 'CHN', factor=0.0, top_n=5)
+    assert impact['exposed_nodes'] > 0
+    assert len(impact['most_affected']) <= 5
+    assert all(node['country'] not in ('CHN', 'CN1', 'CN2') for node in impact['most_affected'])
+    
+    unchanged = country_disruption_impact(network, 'CHN', factor=1.0)
+    assert unchanged['affected_nodes'] == 0
+    assert unchanged['most_affected'] == []
+
+
+def test_assess_batch_matches_assess_risk(synthetic_model):
+    """Batch results equal single assessments, errors stay in place"""
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    targets = [('USA', 'C26'), ('CN1', 'C29'), ('XXX', 'C26'), ('DEU', 'A01')]
+    
+    results = calculator.assess_batch(targets, skip_climate=True)
+    
+    assert 'error' in results[2]
+    for target, result in zip(targets, results):
+        if target[0] != 'XXX':
+            assert result == calculator.assess_risk(*target, skip_climate=True)
+
+
+def test_batch_endpoint_streams_ndjson_in_request_order(synthetic_model, monkeypatch):
+    """NDJSON batches hold one line per item in request order across chunks, then a summary"""
+    import json
+    import app_v2
+    
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    monkeypatch.setattr(app_v2, 'AUTH_ENABLED', False)
+    monkeypatch.setattr(app_v2, 'BATCH_STREAM_CHUNK_SIZE', 3)
+    monkeypatch.setitem(app_v2._model_cache, 'oecd', calculator)
+    items = [
+        {'country': 'USA', 'sector': 'C26'}, {'country': 'CHN', 'sector': 'C29'}, {'sector': 'C26'},
+        {'country': 'XXX', 'sector': 'C26'}, {'country': 'DEU', 'sector': 'A01'}, {'country': 'USA', 'sector': 'C26'},
+        {'country': 'JPN'}, {'country': 'KOR', 'sector': 'C27'},
+    ]
+    
+    response = app_v2.app.test_client().post(
+        '/api/batch',
+        json={'assessments': items, 'skip_climate': True},
+        headers={'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == len(items) + 1
+    
+    for item, line in zip(items, lines):
+        if 'country' not in item or 'sector' not in item:
+            assert line == {'error': 'Missing country or sector', 'item': item}
+        elif item['country'] == 'XXX':
+            assert 'error' in line and 'cache_hit' not in line
+        else:
+            line.pop('cache_hit')
+            assert line == calculator.assess_risk(item['country'], item['sector'], skip_climate=True)
+    
+    summary = lines[-1]['summary']
+    assert summary['count'] == len(items)
+    assert summary['cache_hits'] == 1  # USA C26 again, cached by the first chunk
+
+
+def test_portfolio_matches_weighted_assessments(synthetic_model, monkeypatch):
+    """Portfolio scores are the spend-weighted single-node scores"""
+    import expected_loss_cache
+    
+    cache = expected_loss_cache.ExpectedLossCache(cache_file='/nonexistent/expected_loss_cache.json')
+    cache.cache = {'China': {'expected_annual_loss': 5000.0}}
+    monkeypatch.setattr(expected_loss_cache, 'get_cache', lambda: cache)
+    
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    holdings = [('USA', 'C26', 300.0), ('CHN', 'C29', 500.0), ('USA', 'C26', 200.0), ('XXX', 'C26', 50.0)]
+    result = calculator.assess_portfolio(holdings, top_n=5, line_numbers=[0, 2, 3, 6])
+    
+    usa = calculator.assess_risk('USA', 'C26', skip_climate=True)
+    chn = calculator.assess_risk('CHN', 'C29', skip_climate=True)
+    for risk_type in RISK_TYPES:
+        expected = 0.5 * usa['total_risk'][risk_type] + 0.5 * chn['total_risk'][risk_type]
+        assert result['total_risk'][risk_type] == pytest.approx(expected, abs=0.01)
+    
+    assert result['holdings']['unique_nodes'] == 2
+    assert result['unmatched_lines'] == 1
+    assert result['unmatched'] == [{'line': 6, 'country': 'XXX', 'sector': 'C26'}]
+    assert result['expected_loss']['direct_annual_loss'] == pytest.approx(500.0 * 5000.0 / 1e6)
+    assert result['expected_loss']['coverage'] == pytest.approx(0.5)
+    assert [c['country'] for c in result['top_contributors']] in (['USA', 'CHN'], ['CHN', 'USA'])
+
+
+def test_network_artifact_round_trip(calculator, tmp_path):
+    """A memory-mapped network reproduces the in-memory one"""
+    from supply_network import SupplyNetwork
+    
+    network = calculator.get_supply_network()
+    path = str(tmp_path / 'network')
+    network.save_artifact(path)
+    loaded = SupplyNetwork.load_artifact(path)
+    
+    assert loaded.nodes == network.nodes
+    assert isinstance(loaded.weights, np.memmap)
+    assert np.array_equal(loaded.baseline_indirect(), network.baseline_indirect())
+    assert np.array_equal(loaded.propagate(loaded.direct), network.propagate(network.direct))
+
+
+def test_sector_ranking_matches_assessments(calculator):
+    """Ranked scores are the single-node total risks, sorted and filtered"""
+    result = calculator.rank_sector_countries('C26', weights={'climate': 1}, exclude_countries=['USA'])
+    
+    scores = [entry['score'] for entry in result['ranking']]
+    assert scores == sorted(scores)
+    assert 'USA' not in [entry['country'] for entry in result['ranking']]
+    for entry in result['ranking']:
+        assessment = calculator.assess_risk(entry['country'], 'C26', skip_climate=True)
+        assert entry['total_risk'] == assessment['total_risk']
+        assert entry['score'] == assessment['total_risk']['climate']
+    
+    assert 'error' in calculator.rank_sector_countries('XXX')
+
+
+def test_sector_ranking_filters_firm_splits_and_rest_of_world(tmp_path):
+    """Firm splits (CN1) and ROW are left out unless requested"""
+    write_synthetic_coefficients(tmp_path, countries=SYNTHETIC_COUNTRIES + ['ROW'])
+    calculator = MultiTierRiskCalculator(OECDICIOModel(data_path=tmp_path), use_subtree_cache=False)
+    
+    def ranked(**filters):
+        return {entry['country'] for entry in calculator.rank_sector_countries('C26', **filters)['ranking']}
+    
+    assert not ranked() & {'CN1', 'ROW'}
+    assert 'CN1' in ranked(include_extended=True) and 'ROW' not in ranked(include_extended=True)
+    assert 'ROW' in ranked(include_rest_of_world=True) and 'CN1' not in ranked(include_rest_of_world=True)
+    assert ranked(include_extended=True, include_rest_of_world=True) == ranked() | {'CN1', 'ROW'}
+
+
+def test_hotspot_index_pages_in_risk_order(calculator):
+    """Hotspot pages follow the all-node total risk, filters and pagination included"""
+    index = calculator.get_hotspot_index()
+    network = calculator.get_supply_network()
+    total = network.total_risk()
+    
+    first = index.query('modern_slavery', limit=5)
+    second = index.query('modern_slavery', offset=5, limit=5)
+    scores = [entry['score'] for entry in first['results'] + second['results']]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == round(float(total[network.valid[:network.node_count], 1].max()), 2)
+    
+    splits = index.query(extended='only', limit=1000)
+    assert splits['total_matches'] > 0
+    assert all(entry['country'] in ('CN1', 'CN2', 'MX1', 'MX2') for entry in splits['results'])
+    
+    assert 'error' in index.query(regions=['Atlantis'])
+
+
+def test_uncertainty_collapses_to_point_estimate(calculator):
+    """Without spread every sample equals the (unrounded) deterministic scores"""
+    result = calculator.assess_uncertainty('USA', 'C26', samples=200, country_spread=0, sector_spread=0)
+    
+    for part in ('direct_risk', 'indirect_risk', 'total_risk'):
+        for risk_type, stats in result[part].items():
+            assert stats['std'] == pytest.approx(0, abs=1e-9)
+            assert stats['mean'] == pytest.approx(result['point_estimate'][part][risk_type], abs=0.03)
+    
+    spread = calculator.assess_uncertainty('USA', 'C26', samples=500, seed=7)
+    climate = spread['total_risk']['climate']['percentiles']
+    assert climate['p5'] < climate['p50'] < climate['p95']
+
+
+def test_score_overrides_match_modified_risk_data(synthetic_model):
+    """Scenario results equal a recursion over overridden scores, and leave the baseline alone"""
+    overrides = {'countries': {'CHN': {'political': 4.5}}, 'sectors': {'C26': {'climate': 4.0}}}
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    baseline = calculator.assess_risk('USA', 'C26', skip_climate=True)
+    
+    reference = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+    direct_risk_fn = reference.calculate_direct_risk
+    reference.calculate_direct_risk = lambda country, sector: direct_risk_fn(country, sector, score_overrides=overrides)
+    
+    targets = [('USA', 'C26'), ('DEU', 'A01'), ('CHN', 'C29')]
+    results = calculator.assess_batch(targets, skip_climate=True, score_overrides=overrides)
+    for target, result in zip(targets, results):
+        expected = reference.assess_risk(*target, skip_climate=True)
+        assert result['direct_risk'] == expected['direct_risk']
+        assert result['indirect_risk'] == expected['indirect_risk']
+        assert result['total_risk'] == expected['total_risk']
+    assert results[0]['scenario']['changed_nodes'] > 0
+    
+    assert calculator.assess_risk('USA', 'C26', skip_climate=True) == baseline
+
+
+def test_scenario_split_and_budget(synthetic_model, monkeypatch):
+    """With overrides the split covers the scenario's indirect risk, and budget_ms is rejected"""
+    import json
+    import app_v2
+    
+    overrides = {'countries': {'CHN': {'political': 4.5}}}
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    result = calculator.assess_risk('USA', 'C26', skip_climate=True, include_split=True, score_overrides=overrides)
+    baseline = calculator.split_indirect_risk('USA', 'C26')
+    split = result['indirect_risk_split']
+    for risk_type in RISK_TYPES:
+        parts = split['domestic'][risk_type] + split['imported'][risk_type]
+        assert parts == pytest.approx(result['indirect_risk'][risk_type], abs=0.01)
+    assert split['imported']['political'] > baseline['imported']['political']
+    
+    monkeypatch.setattr(app_v2, 'AUTH_ENABLED', False)
+    monkeypatch.setitem(app_v2._model_cache, 'oecd', calculator)
+    client = app_v2.app.test_client()
+    query = {'country': 'USA', 'sector': 'C26', 'skip_climate': 'true', 'overrides': json.dumps(overrides)}
+    response = client.get('/api/assess', query_string=dict(query, include_split='true'))
+    assert response.status_code == 200 and response.get_json()['indirect_risk_split'] == split
+    assert client.get('/api/assess', query_string=dict(query, budget_ms='200')).status_code == 400
+
+
+def test_refresh_direct_risk_matches_rebuilt_network(synthetic_model, monkeypatch):
+    """Recomputing only the dependents of a revised score gives a full rebuild's numbers"""
+    from oecd_data_full import OECD_COUNTRIES
+    
+    calculator = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+    network = calculator.get_supply_network()
+    network.baseline_indirect()
+    
+    country = next(c for c in OECD_COUNTRIES if c['code'] == 'CHN')
+    monkeypatch.setitem(country, 'risk_scores', dict(country['risk_scores'], political=4.9))
+    refreshed = calculator.refresh_direct_risk(country_codes=['CHN'])
+    assert 0 < len(refreshed['changed']) <= len(refreshed['recomputed']) <= network.node_count
+    
+    rebuilt = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False).get_supply_network()
+    updated = calculator.get_supply_network()
+    assert updated is not network
+    np.testing.assert_array_equal(updated.direct, rebuilt.direct)
+    np.testing.assert_allclose(updated.baseline_indirect(), rebuilt.baseline_indirect(), atol=1e-12)
+
+
+def test_top_paths_are_the_best_of_all_paths(calculator):
+    """Pruned best-first search returns the head of the exhaustive path list"""
+    from supply_paths import top_paths
+    
+    network = calculator.get_supply_network()
+    target = network.node_position('USA', 'C26')
+    everything = top_paths(network, target, k=100000, risk_type='climate')
+    best = top_paths(network, target, k=10, risk_type='climate')
+    
+    assert best['paths'] == everything['paths'][:10]
+    assert best['search']['expanded_nodes'] < everything['search']['expanded_nodes']
+    
+    # All paths together add up to the attributed indirect risk
+    attributed = network.tier_contributions(target).sum(axis=(0, 1))
+    total = sum(p['contribution']['climate'] for p in everything['paths'])
+    assert total == pytest.approx(attributed[RISK_TYPES.index('climate')], abs=1e-3)
+
+
+def test_upstream_subgraph_follows_supplier_index(calculator):
+    """Every exported edge is an index link, and every node hangs off the tier above it"""
+    network = calculator.get_supply_network()
+    target = network.node_position('USA', 'C26')
+    subgraph = network.upstream_subgraph(target, max_nodes=40, min_coefficient=0.01)
+    nodes, tiers = subgraph['nodes'], subgraph['tiers']
+    
+    assert len(nodes) == len(set(nodes.tolist())) <= 40
+    assert nodes[0] == target and tiers[0] == 0
+    reached_from = {0}
+    for supplier, buyer, coefficient in zip(subgraph['suppliers'], subgraph['buyers'], subgraph['coefficients']):
+        slot = list(network.suppliers[nodes[buyer]]).index(nodes[supplier])
+        assert coefficient == network.index.coefficients[nodes[buyer], slot] >= 0.01
+        if tiers[supplier] == tiers[buyer] + 1:
+            reached_from.add(int(supplier))
+    assert reached_from == set(range(len(nodes)))
+
+
+def test_sourcing_mix_is_the_cheapest_feasible_allocation(calculator):
+    """Water-filled shares respect the caps and beat random feasible mixes"""
+    from sourcing_optimizer import allocate_min_risk
+    
+    result = calculator.recommend_sourcing_mix(
+        'USA', 'C29', 'C26', max_share=0.3, country_caps={'DEU': 0.1}, exclude_countries=['JPN']
+    )
+    mix = {entry['country']: entry['share'] for entry in result['recommended_mix']}
+    assert sum(mix.values()) == pytest.approx(1.0)
+    assert max(mix.values()) <= 0.3 and mix.get('DEU', 0) <= 0.1 and 'JPN' not in mix
+    
+    rng = np.random.default_rng(1)
+    scores = rng.random(12)
+    caps = np.full(12, 0.25)
+    shares = allocate_min_risk(scores, caps)
+    for _ in range(200):
+        # Random feasible mix: capped Dirichlet draws that still sum to 1
+        candidate = rng.dirichlet(np.ones(12))
+        if (candidate <= caps).all():
+            assert shares @ scores <= candidate @ scores + 1e-12
+    assert allocate_min_risk(scores, np.full(12, 0.05)) is None
+
+
+def test_process_pool_matches_in_process(calculator, tmp_path, monkeypatch):
+    """Pool shards give the in-process batch and sweep results"""
+    import parallel_backend
+    from disruption_sweep import sweep_country_disruptions
+    
+    monkeypatch.setattr(parallel_backend, 'NETWORK_ARTIFACT_DIR', str(tmp_path))
+    targets = [('USA', 'C26'), ('CN1', 'C29'), ('XXX', 'C26'), ('DEU', 'A01'), ('JPN', 'G')]
+    countries = ['CHN', 'USA', 'DEU']
+    
+    backend = parallel_backend.ProcessPoolBackend(calculator, workers=2)
+    try:
+        assert backend.assess_batch(targets, skip_climate=True, shards=3) == \
+            calculator.assess_batch(targets, skip_climate=True)
+        assert backend.sweep_country_disruptions(countries, shards=2) == \
+            sweep_country_disruptions(calculator.get_supply_network(), countries)
+    finally:
+        backend.shutdown()
+
+
+def test_pool_worker_assesses_without_the_matrix(calculator, tmp_path, monkeypatch):
+    """A worker's calculator (metadata and artifact only) never loads the coefficients"""
+    import expected_loss_cache
+    import parallel_backend
+    
+    cache = expected_loss_cache.ExpectedLossCache(cache_file='/nonexistent/expected_loss_cache.json')
+    cache.cache = {'China': {'expected_annual_loss': 5000.0, 'present_value_30yr': 60000.0}}
+    monkeypatch.setattr(expected_loss_cache, 'get_cache', lambda: cache)
+    monkeypatch.setattr(parallel_backend, '_worker_calculator', None)
+    climate = {'expected_annual_loss': 100.0, 'risk_breakdown': {}}
+    monkeypatch.setattr(calculator.climate_api, 'get_country_risk', lambda name: climate)
+    
+    path = parallel_backend.export_network_artifact(calculator, str(tmp_path))
+    data_path = calculator.io_model.data_path
+    parallel_backend._attach_worker(type(calculator.io_model), data_path, path, parallel_backend.risk_data_snapshot())
+    worker = parallel_backend._worker_calculator
+    monkeypatch.setattr(worker.climate_api, 'get_country_risk', lambda name: climate)
+    
+    targets = [('USA', 'C26'), ('DEU', 'A01')]
+    assert parallel_backend._batch_task((targets, False)) == calculator.assess_batch(targets)
+    assert worker.io_model._coefficients_df is None
+
+
+def test_process_pool_uses_revised_risk_scores(synthetic_model, tmp_path, monkeypatch):
+    """Pool workers see risk revisions made in the parent after import"""
+    import parallel_backend
+    from incremental_refresh import apply_risk_score_update
+    from oecd_data_full import OECD_COUNTRIES
+    
+    monkeypatch.setattr(parallel_backend, 'NETWORK_ARTIFACT_DIR', str(tmp_path))
+    country = next(c for c in OECD_COUNTRIES if c['code'] == 'CHN')
+    monkeypatch.setitem(country, 'risk_scores', dict(country['risk_scores']))
+    calculator = MultiTierRiskCalculator(synthetic_model)
+    apply_risk_score_update({'oecd': calculator}, {'CHN': {'political': 4.9}}, {})
+    
+    targets = [('CHN', 'C26'), ('USA', 'C26'), ('DEU', 'A01')]
+    with parallel_backend.get_process_backend(calculator) as backend:
+        results = backend.assess_batch(targets, skip_climate=True, shards=2)
+    parallel_backend._backends.pop(f"{synthetic_model.name}:{id(calculator)}").retire()
+    assert results == calculator.assess_batch(targets, skip_climate=True)
+
+
+def test_uncertainty_chunks_are_one_sample(calculator, monkeypatch):
+    """Drawing the samples in chunks keeps the sample count and the spread"""
+    import risk_uncertainty
+    
+    network = calculator.get_supply_network()
+    target = network.node_position('USA', 'C26')
+    whole = risk_uncertainty.simulate_target(network, target, samples=3000, seed=3)
+    monkeypatch.setattr(risk_uncertainty, 'SAMPLE_CHUNK', 700)
+    chunked = risk_uncertainty.simulate_target(network, target, samples=3000, seed=3)
+    
+    for part in ('direct_risk', 'indirect_risk', 'total_risk'):
+        for risk_type, stats in chunked[part].items():
+            assert stats['mean'] == pytest.approx(whole[part][risk_type]['mean'], abs=0.02)
+            assert stats['std'] == pytest.approx(whole[part][risk_type]['std'], rel=0.1, abs=0.005)
+
+
+def test_sourcing_allocation_reaches_the_exact_optimum():
+    """With tied scores and uneven caps the greedy fill equals the best LP vertex"""
+    from itertools import combinations
+    from sourcing_optimizer import allocate_min_risk
+    
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        scores = rng.integers(1, 4, size=7) / 2.0  # Few distinct values, so many ties
+        caps = rng.choice([0.0, 0.1, 0.25, 0.4, 1.0], size=7)
+        shares = allocate_min_risk(scores, caps)
+        if caps.sum() < 1.0:
+            assert shares is None
+            continue
+        
+        # A vertex of the LP: every candidate but one at 0 or its cap
+        best = np.inf
+        for fractional in range(7):
+            others = [c for c in range(7) if c != fractional]
+            for size in range(7):
+                for full in combinations(others, size):
+                    rest = 1.0 - caps[list(full)].sum()
+                    if -1e-12 <= rest <= caps[fractional] + 1e-12:
+                        best = min(best, caps[list(full)] @ scores[list(full)] + rest * scores[fractional])
+        assert shares.sum() == pytest.approx(1.0)
+        assert (shares >= 0).all() and (shares <= caps + 1e-12).all()
+        assert shares @ scores == pytest.approx(best, abs=1e-12)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for watchlists and their webhook notifications.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import watchlist_manager
+from oecd_data_full import OECD_COUNTRIES
+from risk_calculator_v2 import MultiTierRiskCalculator
+from watchlist_manager import WatchlistManager, webhook_url_error
+
+
+def test_watchlist_posts_changes_after_refresh(synthetic_model, tmp_path, monkeypatch):
+    """Only changed watched nodes are diffed, POSTed to the webhook and persisted as the new baseline"""
+    received = []
+    
+    class Webhook(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(204)
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), Webhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(watchlist_manager, 'WEBHOOK_ALLOWED_HOSTS', {'127.0.0.1'})
+    
+    try:
+        calculator = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+        store = str(tmp_path / 'watchlists.json')
+        manager = WatchlistManager(store_file=store)
+        watched = [('CHN', 'C26'), ('USA', 'C26'), ('BRA', 'A01')]
+        watchlist = manager.create(
+            'w1', calculator, 'oecd', watched, threshold=0.05,
+            webhook_url=f'http://127.0.0.1:{server.server_port}/hook'
+        )
+        assert watchlist['node_count'] == 3
+        
+        country = next(c for c in OECD_COUNTRIES if c['code'] == 'CHN')
+        monkeypatch.setitem(country, 'risk_scores', dict(country['risk_scores'], political=5.0, climate=5.0))
+        refreshed = calculator.refresh_direct_risk(country_codes=['CHN'])
+        
+        notifications = manager.evaluate('oecd', calculator, refreshed['recomputed'])
+        results = manager.deliver(notifications)
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    assert [r['status'] for r in results] == ['delivered']
+    assert received == notifications
+    changes = {(c['country'], c['sector']): c for c in received[0]['changes']}
+    assert ('CHN', 'C26') in changes
+    assert changes[('CHN', 'C26')]['delta']['political'] > 0.05
+    
+    # The new baseline survives a restart, so the same refresh is not reported twice
+    reloaded = WatchlistManager(store_file=store)
+    baseline = reloaded.get('w1', include_nodes=True)['baseline']
+    assert baseline['CHN_C26'] == list(changes[('CHN', 'C26')]['current'].values())
+    assert reloaded.evaluate('oecd', calculator) == []
+
+
+def test_refresh_without_watchlists_writes_nothing(synthetic_model, tmp_path):
+    """A refresh that evaluates no watchlist leaves the store untouched"""
+    import watchlist_manager
+    from incremental_refresh import apply_risk_score_update
+    
+    store = tmp_path / 'watchlists.json'
+    assert watchlist_manager.get_watchlist_manager().store_file == str(store)
+    manager = WatchlistManager(store_file=str(store))
+    calculator = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+    assert manager.evaluate('oecd', calculator) == []
+    apply_risk_score_update({'oecd': calculator}, {}, {})
+    assert not store.exists()
+
+
+def test_webhooks_must_be_public_and_are_not_redirected(synthetic_model, tmp_path, monkeypatch):
+    """Internal webhook addresses are rejected unless allowlisted, and redirects are not followed"""
+    import app_v2
+    
+    for url in ['http://127.0.0.1/hook', 'http://localhost:8080/hook', 'http://10.1.2.3/hook',
+                'http://169.254.169.254/latest/meta-data', 'http://[::1]/hook', 'http://[::ffff:127.0.0.1]/hook',
+                'http://0.0.0.0/hook', 'ftp://93.184.216.34/hook', 'http:///hook', 42]:
+        assert webhook_url_error(url) is not None, url
+    assert webhook_url_error('https://93.184.216.34:8443/hook') is None
+    
+    monkeypatch.setattr(app_v2, 'AUTH_ENABLED', False)
+    response = app_v2.app.test_client().post('/api/watchlists', json={
+        'nodes': [{'country': 'USA', 'sector': 'C26'}],
+        'webhook_url': 'http://169.254.169.254/latest/meta-data'
+    })
+    assert response.status_code == 400 and 'non-public' in response.get_json()['message']
+    
+    hits = []
+    
+    class Redirecting(BaseHTTPRequestHandler):
+        def do_POST(self):
+            hits.append(self.path)
+            self.send_response(307)
+            self.send_header('Location', '/internal')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), Redirecting)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(watchlist_manager, 'WEBHOOK_ALLOWED_HOSTS', {'127.0.0.1'})
+    assert webhook_url_error('http://127.0.0.1/hook') is None
+    
+    try:
+        calculator = MultiTierRiskCalculator(synthetic_model, use_subtree_cache=False)
+        manager = WatchlistManager(store_file=str(tmp_path / 'watchlists.json'))
+        manager.create('w1', calculator, 'oecd', [('USA', 'C26')], webhook_url=f'http://127.0.0.1:{server.server_port}/hook')
+        notification = {'watchlist_id': 'w1', 'changed_nodes': 1, 'changes': []}
+        
+        redirected = manager.deliver([notification])[0]
+        assert redirected['status'] == 'failed' and '307' in redirected['error']
+        assert hits == ['/hook']
+        
+        # The address is checked again at delivery time
+        monkeypatch.setattr(watchlist_manager, 'WEBHOOK_ALLOWED_HOSTS', set())
+        blocked = manager.deliver([notification])[0]
+        assert blocked['status'] == 'blocked'
+        assert hits == ['/hook']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,323 @@
+"""Watchlists of Country-Sectors with Change Notifications
+
+A watchlist is a set of country-sector nodes, a threshold and a webhook URL.
+Each watchlist stores the total risk of its nodes when they were last
+evaluated (the baseline). After a data refresh, only the watched nodes that the
+refresh recomputed are re-read from the supply network's all-node risk tables
+(one vectorized gather per watchlist). Nodes whose total risk moved by more
+than the threshold in any risk type are POSTed to the webhook as a diff, and
+their baseline is moved forward.
+
+Watchlists, including baselines, are persisted to a JSON file so they survive
+restarts, following the pattern of ExpectedLossCache.
+
+Webhooks may only point at public addresses (unless their host is listed in
+WEBHOOK_ALLOWED_HOSTS), and redirects are not followed, so a watchlist cannot
+be used to make the API POST to internal services.
+"""
+import ipaddress
+import json
+import os
+import socket
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from risk_calculator_v2 import MultiTierRiskCalculator, RISK_TYPES
+
+
+WATCHLIST_FILE = os.environ.get('WATCHLIST_FILE', 'watchlists.json')
+MAX_WATCHLIST_NODES = 5000
+WEBHOOK_TIMEOUT = 10  # Seconds per delivery
+# Comma-separated webhook hosts exempt from the public-address check (e.g. an internal relay)
+WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.environ.get('WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()
+}
+
+
+def webhook_url_error(url) -> Optional[str]:
+    """
+    Check that a webhook URL is http(s) and resolves only to public addresses.
+    
+    Returns:
+        Why the URL is rejected, or None if it may be used
+    """
+    if not isinstance(url, str):
+        return 'webhook_url must be an http(s) URL'
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        return 'webhook_url must be an http(s) URL'
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return 'webhook_url must be an http(s) URL'
+    if parts.hostname.lower() in WEBHOOK_ALLOWED_HOSTS:
+        return None
+    
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        return f"webhook host '{parts.hostname}' cannot be resolved: {e}"
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0].split('%')[0])
+        ip = getattr(ip, 'ipv4_mapped', None) or ip
+        if (ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified):
+            return f"webhook host '{parts.hostname}' resolves to non-public address {ip}"
+    return None
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Turns redirects into HTTPErrors, so a public webhook cannot bounce to a private one"""
+    
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirectHandler)
+
+
+class WatchlistManager:
+    """Manages persisted watchlists and their webhook notifications"""
+    
+    def __init__(self, store_file: str = WATCHLIST_FILE):
+        self.store_file = store_file
+        self.watchlists: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Load watchlists from the store file if it exists"""
+        if os.path.exists(self.store_file):
+            try:
+                with open(self.store_file, 'r') as f:
+                    self.watchlists = json.load(f)
+                print(f"[WatchlistManager] Loaded {len(self.watchlists)} watchlists")
+            except Exception as e:
+                print(f"[WatchlistManager] Error loading watchlists: {e}")
+                self.watchlists = {}
+    
+    def _save(self):
+        """Write all watchlists (caller holds the lock); replaced atomically"""
+        partial = f"{self.store_file}.{os.getpid()}.part"
+        with open(partial, 'w') as f:
+            json.dump(self.watchlists, f)
+        os.replace(partial, self.store_file)
+    
+    @staticmethod
+    def _summary(watchlist: Dict) -> Dict:
+        return {key: value for key, value in watchlist.items() if key != 'baseline'}
+    
+    def create(
+        self,
+        watchlist_id: str,
+        calculator: MultiTierRiskCalculator,
+        model_type: str,
+        nodes: List[Tuple[str, str]],
+        threshold: float = 0.1,
+        webhook_url: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Dict:
+        """
+        Create a watchlist, taking its baseline from the current risk tables.
+        
+        Args:
+            watchlist_id: Unique identifier
+            calculator: Calculator of the watched model
+            model_type: Model key ('oecd', ...)
+            nodes: (country, sector) pairs to watch
+            threshold: Smallest change in total risk (any risk type) that is reported
+            webhook_url: URL the diffs are POSTed to (None: only recorded)
+            name: Display name
+        
+        Returns:
+            Watchlist summary, or dictionary with 'error'
+        """
+        network = calculator.get_supply_network()
+        unknown = [
+            f"{country}_{sector}" for country, sector in nodes
+            if network.node_position(country, sector) is None
+        ]
+        if unknown:
+            return {'error': 'Unknown country-sectors', 'unknown': unknown[:20]}
+        
+        keys = list(dict.fromkeys(f"{country}_{sector}" for country, sector in nodes))
+        watchlist = {
+            'watchlist_id': watchlist_id,
+            'name': name or watchlist_id,
+            'model': model_type,
+            'threshold': threshold,
+            'webhook_url': webhook_url,
+            'created_at': datetime.utcnow().isoformat(),
+            'node_count': len(keys),
+            'last_evaluated_at': None,
+            'last_notification': None,
+            'baseline': dict(zip(keys, self._totals(network, keys).tolist()))
+        }
+        with self.lock:
+            self.watchlists[watchlist_id] = watchlist
+            self._save()
+        return self._summary(watchlist)
+    
+    def get(self, watchlist_id: str, include_nodes: bool = False) -> Optional[Dict]:
+        """Watchlist summary (with its baseline per node if include_nodes)"""
+        with self.lock:
+            watchlist = self.watchlists.get(watchlist_id)
+            if watchlist is None:
+                return None
+            result = self._summary(watchlist)
+            if include_nodes:
+                result['risk_types'] = RISK_TYPES
+                result['baseline'] = dict(watchlist['baseline'])
+            return result
+    
+    def list(self) -> List[Dict]:
+        with self.lock:
+            return [self._summary(watchlist) for watchlist in self.watchlists.values()]
+    
+    def delete(self, watchlist_id: str) -> bool:
+        with self.lock:
+            if self.watchlists.pop(watchlist_id, None) is None:
+                return False
+            self._save()
+            return True
+    
+    @staticmethod
+    def _totals(network, keys: List[str]) -> np.ndarray:
+        """(len(keys), 5) total risk of nodes from the network's all-node tables"""
+        positions = np.array([network.positions[key] for key in keys], dtype=np.int64)
+        indirect = network.baseline_indirect()[positions]
+        return np.round(0.6 * network.direct[positions] + 0.4 * indirect, 2)
+    
+    def evaluate(
+        self,
+        model_type: str,
+        calculator: MultiTierRiskCalculator,
+        recomputed: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        Compare watched nodes with their baseline after a refresh.
+        
+        Args:
+            model_type: Model key; only watchlists of this model are evaluated
+            calculator: Calculator holding the refreshed supply network
+            recomputed: Node positions the refresh recomputed (None: all watched nodes)
+        
+        Returns:
+            One notification per watchlist with changes above its threshold
+        """
+        network = calculator.get_supply_network()
+        dirty = None
+        if recomputed is not None:
+            dirty = np.zeros(network.node_count, dtype=bool)
+            dirty[recomputed] = True
+        
+        notifications = []
+        evaluated = False
+        with self.lock:
+            for watchlist in self.watchlists.values():
+                if watchlist['model'] != model_type:
+                    continue
+                evaluated = True
+                keys = list(watchlist['baseline'])
+                if dirty is not None:
+                    keys = [key for key in keys if dirty[network.positions[key]]]
+                watchlist['last_evaluated_at'] = datetime.utcnow().isoformat()
+                if not keys:
+                    continue
+                
+                previous = np.array([watchlist['baseline'][key] for key in keys])
+                current = self._totals(network, keys)
+                delta = current - previous
+                changed = np.flatnonzero(np.abs(delta).max(axis=1) > watchlist['threshold'] + 1e-9)
+                if len(changed) == 0:
+                    continue
+                
+                changes = []
+                for i in changed:
+                    watchlist['baseline'][keys[i]] = current[i].tolist()
+                    country, sector = network.nodes[network.positions[keys[i]]]
+                    changes.append({
+                        'country': country,
+                        'sector': sector,
+                        'previous': dict(zip(RISK_TYPES, previous[i].tolist())),
+                        'current': dict(zip(RISK_TYPES, current[i].tolist())),
+                        'delta': dict(zip(RISK_TYPES, np.round(delta[i], 2).tolist()))
+                    })
+                notifications.append({
+                    'watchlist_id': watchlist['watchlist_id'],
+                    'name': watchlist['name'],
+                    'model': model_type,
+                    'threshold': watchlist['threshold'],
+                    'evaluated_nodes': len(keys),
+                    'changed_nodes': len(changes),
+                    'changes': changes,
+                    'generated_at': watchlist['last_evaluated_at']
+                })
+            if evaluated:
+                self._save()
+        return notifications
+    
+    def deliver(self, notifications: List[Dict]) -> List[Dict]:
+        """
+        POST each notification to its watchlist's webhook.
+        
+        Returns:
+            Delivery result per notification ('delivered', 'failed', 'blocked' or 'no_webhook')
+        """
+        results = []
+        for notification in notifications:
+            with self.lock:
+                watchlist = self.watchlists.get(notification['watchlist_id'])
+                url = watchlist['webhook_url'] if watchlist else None
+            
+            result = {
+                'watchlist_id': notification['watchlist_id'],
+                'changed_nodes': notification['changed_nodes'],
+                'status': 'no_webhook',
+                'at': datetime.utcnow().isoformat()
+            }
+            error = webhook_url_error(url) if url else None
+            if error:
+                # Checked again at delivery: the host may resolve differently by now
+                result.update({'status': 'blocked', 'error': error})
+            elif url:
+                request = urllib.request.Request(
+                    url,
+                    data=json.dumps(notification).encode('utf-8'),
+                    headers={'Content-Type': 'application/json'},
+                    method='POST'
+                )
+                try:
+                    with _webhook_opener.open(request, timeout=WEBHOOK_TIMEOUT) as response:
+                        result.update({'status': 'delivered', 'http_status': response.status})
+                except (urllib.error.URLError, OSError) as e:
+                    result.update({'status': 'failed', 'error': str(e)})
+            
+            with self.lock:
+                if notification['watchlist_id'] in self.watchlists:
+                    self.watchlists[notification['watchlist_id']]['last_notification'] = result
+                    self._save()
+            results.append(result)
+        return results
+    
+    def deliver_in_background(self, notifications: List[Dict]):
+        """deliver() in a daemon thread, so refreshes do not wait for webhooks"""
+        if notifications:
+            threading.Thread(target=self.deliver, args=(notifications,), daemon=True).start()
+
+
+# Global watchlist manager instance
+_watchlist_manager = None
+
+def get_watchlist_manager() -> WatchlistManager:
+    """Get or create global watchlist manager instance"""
+    global _watchlist_manager
+    if _watchlist_manager is None:
+        _watchlist_manager = WatchlistManager()
+    return _watchlist_manager